@@ -0,0 +1,58 @@
+"""
+Benchmarks for drawing cards from large decks
+"""
+import random
+from typing import Callable, List
+
+from harness import benchmark
+
+from pyreignslib.deck import CardData, Deck, DeckRun
+
+
+def _create_deck(count: int) -> Deck:
+    """Create a deck where most cards have conditions on a few hundred values
+
+    Every tenth card has no conditions, so a run never runs out of cards.
+    """
+    rng = random.Random(0)
+    cards: List[CardData] = []
+
+    for i in range(count):
+        conditions = []
+        if i % 10:
+            conditions.append(f"stat{rng.randrange(200)} < {rng.randrange(1, 4)}")
+            if rng.random() < 0.3:
+                conditions.append(f"flag{rng.randrange(100)}")
+
+        cards.append(
+            CardData(
+                f"card{i}",
+                "?",
+                conditions=tuple(conditions),
+                accept_effects=(f"stat{rng.randrange(200)} += 1",),
+                reject_effects=(f"flag{rng.randrange(100)}",),
+            )
+        )
+
+    return Deck(cards)
+
+
+def _swipe_benchmark(count: int) -> Callable[[], None]:
+    deck = _create_deck(count)
+    run = DeckRun(deck, random.Random(1))
+    choices = random.Random(2)
+
+    def swipe() -> None:
+        run.swipe(choices.random() < 0.5)
+
+    return swipe
+
+
+@benchmark("DeckRun.swipe.1000")
+def deck_run_swipe_1000() -> Callable[[], None]:
+    return _swipe_benchmark(1000)
+
+
+@benchmark("DeckRun.swipe.50000")
+def deck_run_swipe_50000() -> Callable[[], None]:
+    return _swipe_benchmark(50000)
@@ -0,0 +1,207 @@
+"""
+Benchmarks for text layout, card drawing and full frames
+"""
+import itertools
+import pathlib
+import random
+from typing import Callable, List
+
+import pygame
+from harness import benchmark, init_headless
+
+from pyreignslib.card import Card, CardSpriteGroup, RotationCache
+from pyreignslib.core import Game, GameSettings
+from pyreignslib.fonts import FontManager
+from pyreignslib.main_menu import MainMenuMode
+from pyreignslib.prototype_mode import PrototypeMode
+from pyreignslib.text import TextLayoutCache, WordMetrics, layout_text
+from pyreignslib.utilities import draw_text, load_png
+
+ASSETS_DIR = pathlib.Path(__file__).resolve().parent.parent / "assets"
+CARD_IMAGE_PATH = ASSETS_DIR / "images" / "card-background.png"
+WINDOW_SIZE = (480, 720)
+
+SHORT_PROMPT = "Will you help me eliminate the enemy?"
+LONG_PROMPT = " ".join(
+    [
+        "The harvest failed in the northern valleys and the granaries are",
+        "nearly empty. The guild masters demand that you open the royal",
+        "stores to the merchants first, while the farmers beg you to feed",
+        "their children before winter. Whatever you decide, someone will",
+        "remember it when the snow melts.",
+    ]
+)
+
+
+def _draw_text_benchmark(text: str, cached: bool) -> Callable[[], None]:
+    window = init_headless(WINDOW_SIZE)
+    font = pygame.font.Font(None, 36)
+    color = pygame.Color(0, 0, 0)
+    rect = pygame.Rect(20, 130, WINDOW_SIZE[0] - 40, 400)
+    cache = TextLayoutCache() if cached else None
+
+    def run() -> None:
+        draw_text(window, text, color, rect, font, cache=cache)
+
+    return run
+
+
+@benchmark("draw_text.short.uncached")
+def draw_text_short_uncached() -> Callable[[], None]:
+    return _draw_text_benchmark(SHORT_PROMPT, cached=False)
+
+
+@benchmark("draw_text.short.cached")
+def draw_text_short_cached() -> Callable[[], None]:
+    return _draw_text_benchmark(SHORT_PROMPT, cached=True)
+
+
+@benchmark("draw_text.long.uncached")
+def draw_text_long_uncached() -> Callable[[], None]:
+    return _draw_text_benchmark(LONG_PROMPT, cached=False)
+
+
+@benchmark("draw_text.long.cached")
+def draw_text_long_cached() -> Callable[[], None]:
+    return _draw_text_benchmark(LONG_PROMPT, cached=True)
+
+
+@benchmark("layout_text.long")
+def layout_text_long() -> Callable[[], None]:
+    init_headless(WINDOW_SIZE)
+    font = pygame.font.Font(None, 36)
+    # a fresh word cache each call, so every word is measured again
+    fonts = FontManager()
+
+    def run() -> None:
+        layout_text(
+            LONG_PROMPT,
+            font,
+            WINDOW_SIZE[0] - 40,
+            metrics=WordMetrics(font, fonts=fonts),
+        )
+
+    return run
+
+
+def _create_cards(count: int) -> List[Card]:
+    image = load_png(CARD_IMAGE_PATH)
+    rng = random.Random(count)
+    cards = []
+
+    for _ in range(count):
+        card = Card(image, WINDOW_SIZE, SHORT_PROMPT)
+        card.rect.move_ip(rng.randint(-100, 100), rng.randint(-20, 20))
+        card.rotation = rng.choice([-Card.MAX_TILT, -7, 3, Card.MAX_TILT])
+        cards.append(card)
+
+    return cards
+
+
+def _card_group_benchmark(count: int) -> Callable[[], None]:
+    window = init_headless(WINDOW_SIZE)
+    group = CardSpriteGroup(_create_cards(count), rotation_cache=RotationCache())
+
+    # warm the rotation cache so only blitting is measured
+    group.draw(window)
+
+    def run() -> None:
+        group.draw(window)
+
+    return run
+
+
+@benchmark("CardSpriteGroup.draw.1")
+def card_group_draw_1() -> Callable[[], None]:
+    return _card_group_benchmark(1)
+
+
+@benchmark("CardSpriteGroup.draw.10")
+def card_group_draw_10() -> Callable[[], None]:
+    return _card_group_benchmark(10)
+
+
+@benchmark("CardSpriteGroup.draw.100")
+def card_group_draw_100() -> Callable[[], None]:
+    return _card_group_benchmark(100)
+
+
+@benchmark("Card.update.100")
+def card_update_100() -> Callable[[], None]:
+    init_headless(WINDOW_SIZE)
+    cards = _create_cards(100)
+    offsets = itertools.cycle([(-150, 0), (150, 10), (40, -5)])
+
+    def run() -> None:
+        offset = next(offsets)
+        for card in cards:
+            card.rect.center = (
+                card.reset_pos[0] + offset[0],
+                card.reset_pos[1] + offset[1],
+            )
+            card.update(elapsed_time=1 / 60)
+
+    return run
+
+
+def _card_group_update_benchmark(count: int) -> Callable[[], None]:
+    init_headless(WINDOW_SIZE)
+    group = CardSpriteGroup(_create_cards(count), rotation_cache=RotationCache())
+    offsets = itertools.cycle([(-150, 0), (150, 10), (40, -5)])
+
+    def run() -> None:
+        offset = next(offsets)
+        for card in group.cards:
+            group.move_card(
+                card, (card.reset_pos[0] + offset[0], card.reset_pos[1] + offset[1])
+            )
+        group.update(elapsed_time=1 / 60)
+
+    return run
+
+
+@benchmark("CardSpriteGroup.update.100")
+def card_group_update_100() -> Callable[[], None]:
+    return _card_group_update_benchmark(100)
+
+
+@benchmark("CardSpriteGroup.update.500")
+def card_group_update_500() -> Callable[[], None]:
+    return _card_group_update_benchmark(500)
+
+
+@benchmark("load_png")
+def load_png_throughput() -> Callable[[], None]:
+    init_headless(WINDOW_SIZE)
+
+    def run() -> None:
+        load_png(CARD_IMAGE_PATH)
+
+    return run
+
+
+@benchmark("PrototypeMode.frame")
+def prototype_mode_frame() -> Callable[[], None]:
+    init_headless(WINDOW_SIZE)
+    game = Game(
+        GameSettings(WINDOW_SIZE, 60, "benchmark", "benchmark", headless=True),
+        initial_mode=MainMenuMode,
+    )
+    game.context.images["card-bg"] = load_png(CARD_IMAGE_PATH)
+    game.set_mode(PrototypeMode)
+
+    # drag the card past the accept threshold so the frame includes a
+    # tilted card and the choice text
+    mode = game.mode
+    assert isinstance(mode, PrototypeMode)
+    mode.all_cards.move_card(
+        mode.card, (mode.right_threshold + 20, mode.card.rect.centery)
+    )
+    mode.is_hovering_right = True
+    mode.all_cards.set_dragged(mode.card, True)
+    game.update(1 / 60)
+
+    def run() -> None:
+        game.draw()
+
+    return run
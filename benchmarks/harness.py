@@ -0,0 +1,215 @@
+"""
+A small harness for timing benchmarks and comparing them to a baseline
+
+Benchmarks are registered with the @benchmark decorator. Each one is a
+setup function that prepares whatever it needs and returns the function
+to time, so setup costs never show up in the results.
+"""
+import json
+import os
+import pathlib
+import platform
+import statistics
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import pygame
+
+BenchmarkSetup = Callable[[], Callable[[], None]]
+"""Prepares a benchmark and returns the function to time"""
+
+
+class Benchmark(NamedTuple):
+    """A registered benchmark"""
+
+    name: str
+    setup: BenchmarkSetup
+
+
+class BenchmarkResult(NamedTuple):
+    """Timings of a benchmark, in seconds per call"""
+
+    name: str
+    rounds: int
+    iterations: int
+    """Calls per round"""
+    min: float
+    median: float
+    mean: float
+    max: float
+
+
+class Comparison(NamedTuple):
+    """A benchmark result compared to its baseline"""
+
+    name: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        """How many times slower the current result is than the baseline"""
+        return self.current / self.baseline if self.baseline > 0 else float("inf")
+
+
+_benchmarks: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str) -> Callable[[BenchmarkSetup], BenchmarkSetup]:
+    """Register a benchmark setup function under a name"""
+
+    def decorator(setup: BenchmarkSetup) -> BenchmarkSetup:
+        if name in _benchmarks:
+            raise ValueError(f"A benchmark named {name} already exists")
+        _benchmarks[name] = Benchmark(name, setup)
+        return setup
+
+    return decorator
+
+
+def get_benchmarks(patterns: Iterable[str] = ()) -> List[Benchmark]:
+    """Get the registered benchmarks whose names contain any of the patterns"""
+    patterns = list(patterns)
+    return [
+        bench
+        for name, bench in _benchmarks.items()
+        if not patterns or any(pattern in name for pattern in patterns)
+    ]
+
+
+def init_headless(window_size: Tuple[int, int] = (480, 720)) -> pygame.Surface:
+    """Create an off-screen window using SDL's dummy video driver"""
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.init()
+    return pygame.display.set_mode(window_size)
+
+
+def measure(
+    name: str, func: Callable[[], None], rounds: int = 7, round_time: float = 0.05
+) -> BenchmarkResult:
+    """Time a function
+
+    The number of calls per round is chosen so that each round takes
+    about round_time seconds, which keeps timer resolution from
+    dominating fast benchmarks.
+    """
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= round_time or iterations >= 1_000_000:
+            break
+        iterations *= 2 if elapsed == 0 else max(2, int(round_time / elapsed) + 1)
+
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        times.append((time.perf_counter() - start) / iterations)
+
+    return BenchmarkResult(
+        name=name,
+        rounds=rounds,
+        iterations=iterations,
+        min=min(times),
+        median=statistics.median(times),
+        mean=statistics.fmean(times),
+        max=max(times),
+    )
+
+
+def run_benchmarks(
+    benchmarks: Iterable[Benchmark], rounds: int = 7
+) -> List[BenchmarkResult]:
+    """Set up and time each benchmark"""
+    return [measure(bench.name, bench.setup(), rounds) for bench in benchmarks]
+
+
+def get_machine_info() -> Dict[str, Any]:
+    """Describe the machine the benchmarks ran on"""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "pygame": pygame.version.ver,
+        "sdl": ".".join(str(part) for part in pygame.get_sdl_version()),
+    }
+
+
+def save_results(
+    results: Iterable[BenchmarkResult], filepath: Union[str, pathlib.Path]
+) -> None:
+    """Write results to a JSON file that can be used as a baseline"""
+    data = {
+        "machine": get_machine_info(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "benchmarks": {result.name: result._asdict() for result in results},
+    }
+
+    with open(filepath, "w", encoding="utf-8") as results_file:
+        json.dump(data, results_file, indent=2)
+
+
+def load_baseline(filepath: Union[str, pathlib.Path]) -> Dict[str, float]:
+    """Load the median time of each benchmark from a results file"""
+    with open(filepath, "r", encoding="utf-8") as baseline_file:
+        data = json.load(baseline_file)
+
+    return {
+        name: float(result["median"])
+        for name, result in data.get("benchmarks", {}).items()
+    }
+
+
+def compare(
+    results: Iterable[BenchmarkResult], baseline: Dict[str, float]
+) -> List[Comparison]:
+    """Compare the median time of each result to its baseline"""
+    return [
+        Comparison(result.name, baseline[result.name], result.median)
+        for result in results
+        if result.name in baseline
+    ]
+
+
+def format_time(seconds: float) -> str:
+    """Format a duration with a sensible unit"""
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:8.3f} ms"
+    return f"{seconds * 1e6:8.2f} us"
+
+
+def format_results(
+    results: Iterable[BenchmarkResult],
+    comparisons: Optional[Iterable[Comparison]] = None,
+) -> str:
+    """Format results as a table, with the change from the baseline if given"""
+    ratios = {c.name: c.ratio for c in comparisons} if comparisons else {}
+    results = list(results)
+    width = max((len(result.name) for result in results), default=0)
+    lines = []
+
+    for result in results:
+        line = f"{result.name:<{width}}  {format_time(result.median)}"
+        line += f"  (min {format_time(result.min).strip()})"
+        if result.name in ratios:
+            line += f"  {ratios[result.name]:6.2f}x baseline"
+        lines.append(line)
+
+    return "\n".join(lines)
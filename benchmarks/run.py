@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Run the benchmark suite
+
+Examples
+--------
+Save results to use as a baseline:
+
+    python benchmarks/run.py --output baseline.json
+
+Compare against the baseline, failing if anything got more than 25% slower:
+
+    python benchmarks/run.py --baseline baseline.json --threshold 1.25
+"""
+import argparse
+import sys
+
+import bench_deck  # noqa: F401  (registers benchmarks)
+import bench_rendering  # noqa: F401  (registers benchmarks)
+from harness import (
+    compare,
+    format_results,
+    get_benchmarks,
+    load_baseline,
+    run_benchmarks,
+    save_results,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the PyReigns benchmarks")
+    parser.add_argument(
+        "patterns",
+        nargs="*",
+        help="only run benchmarks whose names contain one of these strings",
+    )
+    parser.add_argument("--output", "-o", help="write results to this JSON file")
+    parser.add_argument(
+        "--baseline", "-b", help="compare results to this JSON results file"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="fail if a benchmark is this many times slower than the baseline",
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=7, help="timing rounds per benchmark"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="list the benchmarks and exit"
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    benchmarks = get_benchmarks(args.patterns)
+
+    if args.list:
+        print("\n".join(bench.name for bench in benchmarks))
+        return 0
+
+    results = run_benchmarks(benchmarks, args.rounds)
+    comparisons = (
+        compare(results, load_baseline(args.baseline)) if args.baseline else []
+    )
+
+    print(format_results(results, comparisons))
+
+    if args.output:
+        save_results(results, args.output)
+
+    regressions = [c for c in comparisons if c.ratio > args.threshold]
+    for regression in regressions:
+        print(
+            f"REGRESSION: {regression.name} is {regression.ratio:.2f}x slower "
+            "than the baseline",
+            file=sys.stderr,
+        )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
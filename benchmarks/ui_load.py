@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Scripted load tests for the pygame_gui layer
+
+Builds a mode with N buttons, labels and progress bars laid out as a
+dense stat panel, then plays a scripted session in a headless game. The
+mouse moves over a different element every frame and clicks a button
+every few frames. The game's FrameProfiler times the UI sections of
+each frame. The report shows how frame time and memory grow with N, and
+the first N whose frames no longer fit the budget.
+
+Examples
+--------
+Sweep the default element counts:
+
+    python benchmarks/ui_load.py
+
+Animate every progress bar, use dirty rectangles and save the results:
+
+    python benchmarks/ui_load.py 50 200 800 --animate --dirty-rects -o ui.json
+"""
+import argparse
+import gc
+import itertools
+import json
+import math
+import sys
+import time
+import tracemalloc
+import warnings
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type
+
+import pygame
+import pygame_gui
+from harness import get_machine_info, init_headless
+from pygame_gui.core import UIElement
+from pygame_gui.elements import UIButton, UILabel, UIProgressBar
+
+from pyreignslib.core import Game, GameContext, GameMode, GameSettings, handles
+from pyreignslib.profiler import FRAME_SECTION, FrameProfiler
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore
+
+WINDOW_SIZE = (480, 720)
+DEFAULT_COUNTS = (10, 50, 100, 200, 400, 800)
+UI_SECTIONS = ("ui.process_events", "ui.update", "ui.draw")
+
+
+class UILoadResult(NamedTuple):
+    """Frame times and memory of one load test, times in milliseconds"""
+
+    element_count: int
+    frames: int
+    frame_p50: float
+    frame_p95: float
+    frame_max: float
+    sections: Dict[str, float]
+    """The median time of each UI section"""
+    allocations: float
+    """Mean net memory blocks allocated per frame"""
+    heap_kb: float
+    """Python memory allocated while building the game and its elements"""
+    surface_kb: float
+    """Memory used by the images of the elements"""
+    max_rss_mb: Optional[float]
+    """The process's peak resident memory so far, if it can be measured"""
+    clicks: int
+    """Button presses the mode received"""
+
+
+class UILoadMode(GameMode):
+    """A stat panel of element_count buttons, labels and progress bars"""
+
+    __slots__ = "buttons", "progress_bars", "targets", "clicks", "animate"
+
+    element_count: int = 0
+
+    def __init__(self, context: GameContext) -> None:
+        super().__init__(context)
+        self.buttons: List[UIButton] = []
+        self.progress_bars: List[UIProgressBar] = []
+        self.targets: List[Tuple[int, int]] = []
+        """The center of every element, in the order the mouse visits them"""
+        self.clicks: int = 0
+        self.animate: bool = False
+
+        for i, rect in enumerate(self.get_layout(context.window.get_size())):
+            element: UIElement
+            kind = i % 3
+
+            if kind == 0:
+                element = UILabel(rect, f"Stat {i}", context.ui_manager)
+            elif kind == 1:
+                element = UIProgressBar(rect, context.ui_manager)
+                element.set_current_progress(i % 100)
+                self.progress_bars.append(element)
+            else:
+                element = UIButton(rect, "+", context.ui_manager)
+                self.buttons.append(element)
+
+            self.targets.append(rect.center)
+
+    @classmethod
+    def get_layout(cls, window_size: Tuple[int, int]) -> List[pygame.Rect]:
+        """Split the window into a grid with a cell for each element"""
+        width, height = window_size
+        columns = max(1, math.ceil(math.sqrt(cls.element_count * width / height)))
+        rows = max(1, math.ceil(cls.element_count / columns))
+        cell_width, cell_height = width // columns, height // rows
+
+        return [
+            pygame.Rect(
+                column * cell_width + 1,
+                row * cell_height + 1,
+                max(4, cell_width - 2),
+                max(4, cell_height - 2),
+            )
+            for row, column in itertools.islice(
+                itertools.product(range(rows), range(columns)), cls.element_count
+            )
+        ]
+
+    @handles(pygame_gui.UI_BUTTON_PRESSED)
+    def on_button_pressed(self, event: pygame.event.Event) -> None:
+        self.clicks += 1
+
+    def update(self, elapsed_time: float) -> None:
+        if self.animate:
+            # a value that changes every frame forces every bar to redraw
+            progress = (pygame.time.get_ticks() // 10) % 100
+            for bar in self.progress_bars:
+                bar.set_current_progress(progress)
+
+    def draw(self) -> None:
+        pass
+
+
+def make_load_mode(element_count: int) -> Type[UILoadMode]:
+    """Create a UILoadMode class that builds the given number of elements"""
+    return type(
+        f"UILoadMode{element_count}", (UILoadMode,), {"element_count": element_count}
+    )
+
+
+def _get_surface_bytes(game: Game) -> int:
+    total = 0
+
+    for sprite in game.context.ui_manager.get_sprite_group().sprites():
+        image = getattr(sprite, "image", None)
+        if image is not None:
+            total += image.get_width() * image.get_height() * image.get_bytesize()
+
+    return total
+
+
+def _get_max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def post_input(mode: UILoadMode, frame: int, click_every: int) -> None:
+    """Post the scripted input for a frame
+
+    The mouse is moved over the next element every frame, so hover
+    states change constantly, and every click_every frames the mouse
+    clicks the next button instead.
+    """
+    if click_every > 0 and mode.buttons and frame % click_every == 0:
+        button = mode.buttons[(frame // click_every) % len(mode.buttons)]
+        position = button.rect.center
+        pygame.mouse.set_pos(position)
+        for event_type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            pygame.event.post(pygame.event.Event(event_type, button=1, pos=position))
+        return
+
+    position = mode.targets[frame % len(mode.targets)]
+    pygame.mouse.set_pos(position)
+    pygame.event.post(
+        pygame.event.Event(
+            pygame.MOUSEMOTION, pos=position, rel=(0, 0), buttons=(0, 0, 0)
+        )
+    )
+
+
+def run_load_test(
+    element_count: int,
+    frames: int = 300,
+    warmup: int = 30,
+    click_every: int = 10,
+    animate: bool = False,
+    dirty_rects: bool = False,
+) -> UILoadResult:
+    """Build a stat panel with element_count elements and time its frames"""
+    init_headless(WINDOW_SIZE)
+    settings = GameSettings(
+        WINDOW_SIZE,
+        60,
+        "UI load test",
+        "UI load test",
+        headless=True,
+        dirty_rects=dirty_rects,
+    )
+
+    # tracing slows every allocation down, so it only covers the build
+    tracemalloc.start()
+    game = Game(settings, initial_mode=make_load_mode(element_count))
+    heap_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    mode = game.mode
+    assert isinstance(mode, UILoadMode)
+    mode.animate = animate
+
+    game.context.profiler = FrameProfiler(window=frames)
+    game.context.is_running = True
+
+    for frame in range(warmup + frames):
+        if frame == warmup:
+            game.context.profiler.frames.clear()
+            mode.clicks = 0
+        post_input(mode, frame, click_every)
+        game.step(settings.frame_time)
+
+    summary = game.context.profiler.summary()
+    frame_stats = summary[FRAME_SECTION]
+
+    result = UILoadResult(
+        element_count=element_count,
+        frames=frame_stats.count,
+        frame_p50=frame_stats.p50,
+        frame_p95=frame_stats.p95,
+        frame_max=frame_stats.max,
+        sections={
+            name: summary[name].p50 if name in summary else 0.0 for name in UI_SECTIONS
+        },
+        allocations=frame_stats.allocations,
+        heap_kb=heap_bytes / 1024,
+        surface_kb=_get_surface_bytes(game) / 1024,
+        max_rss_mb=_get_max_rss_mb(),
+        clicks=mode.clicks,
+    )
+
+    # keep pygame initialized for the next test, since the shared fonts
+    # would not survive pygame.quit()
+    mode.on_exit()
+    game.context.ui_manager.clear_and_reset()
+    del game, mode
+    gc.collect()
+    return result
+
+
+def format_load_results(results: List[UILoadResult], budget: float) -> str:
+    """Format results as a table with one row per element count"""
+    header = (
+        f"{'elements':>8}  {'p50 ms':>7}  {'p95 ms':>7}  {'max ms':>7}  "
+        + "  ".join(f"{name:>17}" for name in UI_SECTIONS)
+        + f"  {'blocks':>7}  {'heap KB':>8}  {'surf KB':>8}  {'rss MB':>7}  clicks"
+    )
+    lines = [header]
+
+    for result in results:
+        max_rss = (
+            f"{result.max_rss_mb:7.1f}" if result.max_rss_mb is not None else "    n/a"
+        )
+        lines.append(
+            f"{result.element_count:>8}  {result.frame_p50:7.2f}  "
+            f"{result.frame_p95:7.2f}  {result.frame_max:7.2f}  "
+            + "  ".join(f"{result.sections[name]:17.2f}" for name in UI_SECTIONS)
+            + f"  {result.allocations:7.0f}  {result.heap_kb:8.0f}  "
+            f"{result.surface_kb:8.0f}  {max_rss}  {result.clicks:>6}"
+        )
+
+    over_budget = [result for result in results if result.frame_p95 > budget]
+    if over_budget:
+        lines.append(
+            f"Frames exceed the {budget:.1f} ms budget at 95th percentile "
+            f"from {over_budget[0].element_count} elements"
+        )
+    else:
+        lines.append(f"All frames fit the {budget:.1f} ms budget at 95th percentile")
+
+    return "\n".join(lines)
+
+
+def save_load_results(results: List[UILoadResult], filepath: str) -> None:
+    """Write results to a JSON file"""
+    data: Dict[str, Any] = {
+        "machine": get_machine_info(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": [result._asdict() for result in results],
+    }
+
+    with open(filepath, "w", encoding="utf-8") as results_file:
+        json.dump(data, results_file, indent=2)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the pygame_gui layer")
+    parser.add_argument(
+        "counts",
+        nargs="*",
+        type=int,
+        default=list(DEFAULT_COUNTS),
+        help="the numbers of UI elements to test",
+    )
+    parser.add_argument(
+        "--frames", type=int, default=300, help="frames timed per element count"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=30, help="untimed frames before timing"
+    )
+    parser.add_argument(
+        "--click-every",
+        type=int,
+        default=10,
+        help="click a button every this many frames, or 0 to never click",
+    )
+    parser.add_argument(
+        "--animate",
+        action="store_true",
+        help="change the value of every progress bar each frame",
+    )
+    parser.add_argument(
+        "--dirty-rects",
+        action="store_true",
+        help="only redraw the parts of the window that changed",
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=1000 / 60,
+        help="the frame time budget in milliseconds",
+    )
+    parser.add_argument("--output", "-o", help="write results to this JSON file")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    # tiny cells are too small for their text, which is expected here
+    warnings.filterwarnings("ignore", category=UserWarning, module="pygame_gui")
+    results = [
+        run_load_test(
+            count,
+            frames=args.frames,
+            warmup=args.warmup,
+            click_every=args.click_every,
+            animate=args.animate,
+            dirty_rects=args.dirty_rects,
+        )
+        for count in sorted(args.counts)
+    ]
+
+    print(format_load_results(results, args.budget))
+
+    if args.output:
+        save_load_results(results, args.output)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,49 +2,138 @@
 
 from __future__ import annotations
 
+import argparse
 import pathlib
 
 import pygame
 
+from pyreignslib.assets import AssetManager, AssetManifest, RawImageCache
+from pyreignslib.card import CARD_SIZE
 from pyreignslib.core.context import GameSettings
 from pyreignslib.core.game import Game
+from pyreignslib.core.replay import ReplayPlayer, ReplayRecorder
+from pyreignslib.deck import Deck
 from pyreignslib.main_menu import MainMenuMode
-from pyreignslib.utilities import load_png
 
 TITLE = "PyReigns"
 ICON_TITLE = "PyReigns"
 WINDOW_WIDTH = 480
 WINDOW_HEIGHT = 720
 FPS = 60
+UPDATE_RATE = 60
 ASSETS_DIR = pathlib.Path("./assets")
-IMAGES_DIR = ASSETS_DIR / "images"
-IMAGE_NAMES = {
-    "card-bg": IMAGES_DIR / "card-background.png",
-    "app-icon": IMAGES_DIR / "card-background.png",
-}
+MANIFEST_PATH = ASSETS_DIR / "manifest.json"
+ASSET_CACHE_DIR = ASSETS_DIR / "cache"
+DECK_PATH = ASSETS_DIR / "decks" / "default.json"
+SAVE_PATH = pathlib.Path("./saves") / "autosave.prs"
 
 
 def load_images(game: Game) -> None:
-    for name, filepath in IMAGE_NAMES.items():
-        game.context.images[name] = load_png(filepath)
+    game.context.assets = AssetManager(
+        AssetManifest.load(MANIFEST_PATH), disk_cache=RawImageCache(ASSET_CACHE_DIR)
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=TITLE)
+    parser.add_argument(
+        "--fps",
+        type=int,
+        default=FPS,
+        help="the maximum frames drawn per second, or 0 for no limit",
+    )
+    parser.add_argument(
+        "--update-rate",
+        type=int,
+        default=UPDATE_RATE,
+        help="the fixed updates per second, or 0 to update once per frame "
+        "by the time it took",
+    )
+    parser.add_argument(
+        "--vsync",
+        action="store_true",
+        help="synchronize drawing with the display's refresh rate",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="show frame timings in an overlay (toggle with F3)",
+    )
+    parser.add_argument(
+        "--profile-output",
+        metavar="FILE",
+        help="write frame timings to a .csv or .json file on exit",
+    )
+    replay = parser.add_mutually_exclusive_group()
+    replay.add_argument(
+        "--record",
+        metavar="FILE",
+        help="record input to a replay file",
+    )
+    replay.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="play back a replay file headless, as fast as possible",
+    )
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="show the replay in a window at the speed it was recorded",
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
     pygame.init()
 
-    game = Game(
-        GameSettings(
-            window_size=(WINDOW_WIDTH, WINDOW_HEIGHT),
-            fps=FPS,
-            title=TITLE,
-            icon_title=ICON_TITLE,
-        ),
-        initial_mode=MainMenuMode,
+    settings = GameSettings(
+        window_size=(WINDOW_WIDTH, WINDOW_HEIGHT),
+        fps=args.fps,
+        update_rate=args.update_rate or None,
+        vsync=args.vsync,
+        title=TITLE,
+        icon_title=ICON_TITLE,
+        profile=args.profile or args.profile_output is not None,
+        profile_output=args.profile_output,
+        save_path=str(SAVE_PATH),
     )
 
+    player = None
+    if args.replay:
+        player = ReplayPlayer(args.replay)
+        settings.seed = player.header.seed
+        settings.update_rate = player.header.update_rate or None
+        settings.window_size = player.header.window_size
+        settings.headless = not args.realtime
+
+    if args.record or args.replay:
+        # an autosaved run would be resumed differently each time
+        settings.save_path = None
+
+    game = Game(settings, initial_mode=MainMenuMode)
+
     load_images(game)
+    game.context.deck = Deck.load(DECK_PATH)
+
+    # decode card art in the background while the main menu is shown. It
+    # is packed into an atlas while the town is generated
+    game.context.assets.preload(
+        {card.image for card in game.context.deck.cards}, CARD_SIZE
+    )
+
+    pygame.display.set_icon(game.context.get_image("app-icon"))
+
+    if player is not None:
+        try:
+            frames = player.play(game, realtime=args.realtime)
+        finally:
+            game.quit()
+        print(f"Replayed {frames} frames")
+        return
 
-    pygame.display.set_icon(game.context.images["app-icon"])
+    if args.record:
+        game.replay = ReplayRecorder(args.record, game)
 
     game.start()
 
@@ -1 +1,2 @@
+python ./scripts/build_asset_cache.py
 pyinstaller ./scripts/PyReigns.spec --noconfirm
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Decode and scale every image the game uses ahead of time
+
+Run this before packaging so the game can map raw pixels straight from
+assets/cache instead of decoding PNGs on its first launch.
+"""
+import pathlib
+import sys
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from pyreigns import ASSET_CACHE_DIR, DECK_PATH, MANIFEST_PATH  # noqa: E402
+
+from pyreignslib.assets import AssetManifest, RawImageCache  # noqa: E402
+from pyreignslib.card import CARD_SIZE  # noqa: E402
+from pyreignslib.deck import Deck  # noqa: E402
+
+
+def main() -> None:
+    manifest = AssetManifest.load(ROOT_DIR / MANIFEST_PATH)
+    deck = Deck.load(ROOT_DIR / DECK_PATH)
+    cache = RawImageCache(ROOT_DIR / ASSET_CACHE_DIR)
+
+    sizes = {name: [None] for name in manifest}
+    for image in {card.image for card in deck.cards}:
+        sizes[image].append(CARD_SIZE)
+
+    stored = cache.build(manifest, sizes)
+    print(f"Stored {stored} images in {cache.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1 @@
-DEL .\build\ .\dist\
+DEL .\build\ .\dist\ .\assets\cache\
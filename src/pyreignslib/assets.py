@@ -0,0 +1,598 @@
+"""
+Manifest-driven, lazily loaded images
+
+Decoding every image when the game starts is slow and keeps images in
+memory that may never be shown. An AssetManager reads the names and
+paths of images from a manifest instead, and only decodes an image the
+first time it is requested. Images that will be needed soon can be
+decoded ahead of time on a pool of background threads.
+
+Images are cached after they are scaled to the size they are drawn at
+and converted to the display's pixel format, so each is only scaled
+once no matter how many sprites use it. The cache evicts the least
+recently used images once it grows past a memory budget.
+
+Manifest files look like this:
+
+    {
+        "images": {
+            "card-bg": "images/card-background.png",
+            "app-icon": {"path": "images/card-background.png", "scale": 1}
+        }
+    }
+
+Paths are relative to the directory containing the manifest.
+
+Decoding PNGs dominates cold starts, so an AssetManager can also be
+given a RawImageCache. It keeps decoded, scaled pixels on disk, and
+loading an image from it only maps the file into memory. The cache is
+filled the first time each image is loaded, or ahead of time with
+scripts/build_asset_cache.py.
+
+Images that are used together, like the card art of a deck, can be
+packed into a TextureAtlas with AssetManager.pack_atlas(). Packed images
+are never evicted.
+"""
+import concurrent.futures
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import pygame
+import pygame.display
+import pygame.image
+import pygame.surface
+import pygame.transform
+
+from .atlas import TextureAtlas
+
+ImageKey = Tuple[str, Optional[Tuple[int, int]]]
+"""The name of an image and the size it was scaled to, if any"""
+
+
+class ImageEntry(NamedTuple):
+    """Where to find an image and how to prepare it"""
+
+    path: pathlib.Path
+    scale: int = 1
+
+
+class AssetManifest:
+    """The names and locations of the images used by the game
+
+    Parameters
+    ----------
+    images : Dict[str, ImageEntry]
+        Image entries by name
+    """
+
+    __slots__ = "images"
+
+    def __init__(self, images: Dict[str, ImageEntry]) -> None:
+        self.images: Dict[str, ImageEntry] = images
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.images)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.images
+
+    def __getitem__(self, name: str) -> ImageEntry:
+        return self.images[name]
+
+    @classmethod
+    def load(cls, filepath: Union[str, pathlib.Path]) -> "AssetManifest":
+        """Load a manifest from a JSON file"""
+        filepath = pathlib.Path(filepath)
+
+        with open(filepath, "r", encoding="utf-8") as manifest_file:
+            data = json.load(manifest_file)
+
+        return cls.from_dict(data, filepath.parent)
+
+    @classmethod
+    def from_dict(
+        cls, data: Dict[str, Any], root: Union[str, pathlib.Path] = "."
+    ) -> "AssetManifest":
+        """Create a manifest from the contents of a manifest file
+
+        Parameters
+        ----------
+        data : Dict[str, Any]
+            The contents of the manifest file
+        root : str or pathlib.Path
+            The directory that image paths are relative to
+        """
+        root = pathlib.Path(root)
+        images: Dict[str, ImageEntry] = {}
+
+        for name, entry in data.get("images", {}).items():
+            if isinstance(entry, str):
+                entry = {"path": entry}
+
+            try:
+                path = root / entry["path"]
+            except KeyError as err:
+                raise ValueError(f"Image {name} is missing a path") from err
+
+            images[name] = ImageEntry(path, int(entry.get("scale", 1)))
+
+        return cls(images)
+
+
+def get_surface_bytes(surface: pygame.surface.Surface) -> int:
+    """Estimate the memory used by the pixels of a surface"""
+    return surface.get_pitch() * surface.get_height()
+
+
+class RawImageCache:
+    """Decoded and scaled images stored on disk as raw pixels
+
+    Each file holds a small header followed by the pixels of one image,
+    in RGB or RGBA order. Files are named by a hash of the source image
+    and the size it was scaled to, so editing an image or changing its
+    size never picks up stale pixels. Loading an image maps the file
+    into memory and wraps it with pygame.image.frombuffer, without
+    decoding or copying the pixels.
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path
+        The directory the raw files are stored in. It is created when the
+        first image is stored.
+    """
+
+    HEADER = struct.Struct("<4sHHII")
+    """Magic bytes, version, pixel format, width and height"""
+
+    MAGIC = b"PRIM"
+    VERSION = 1
+    FORMATS = ("RGB", "RGBA")
+
+    __slots__ = "directory", "_digests"
+
+    def __init__(self, directory: Union[str, pathlib.Path]) -> None:
+        self.directory: pathlib.Path = pathlib.Path(directory)
+        self._digests: Dict[Tuple[pathlib.Path, int, int], str] = {}
+
+    def get_path(
+        self, entry: ImageEntry, size: Optional[Tuple[int, int]]
+    ) -> pathlib.Path:
+        """Get the path of the raw file for an image at a size"""
+        if size is None:
+            variant = f"x{entry.scale}"
+        else:
+            variant = f"{size[0]}x{size[1]}"
+
+        return self.directory / f"{self._get_digest(entry.path)}-{variant}.raw"
+
+    def _get_digest(self, path: pathlib.Path) -> str:
+        """Hash the contents of a source image
+
+        Digests are remembered for as long as the file's size and
+        modification time stay the same, so each source is read once.
+        """
+        stat = path.stat()
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(key)
+
+        if digest is None:
+            digest = hashlib.sha1(path.read_bytes()).hexdigest()
+            self._digests[key] = digest
+
+        return digest
+
+    def load(
+        self, entry: ImageEntry, size: Optional[Tuple[int, int]]
+    ) -> Optional[pygame.surface.Surface]:
+        """Load an image from the cache
+
+        Returns
+        -------
+        pygame.surface.Surface or None
+            A surface backed by the memory-mapped file, or None if the
+            image is not cached or its file is invalid
+        """
+        try:
+            with open(self.get_path(entry, size), "rb") as raw_file:
+                # copy-on-write, so drawing on the surface never changes the file
+                pixels = mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            return None
+
+        if len(pixels) < self.HEADER.size:
+            return None
+
+        magic, version, pixel_format, width, height = self.HEADER.unpack_from(pixels)
+
+        if (
+            magic != self.MAGIC
+            or version != self.VERSION
+            or pixel_format >= len(self.FORMATS)
+        ):
+            return None
+
+        buffer = memoryview(pixels)[self.HEADER.size :]
+        if len(buffer) != width * height * (3 + pixel_format):
+            return None
+
+        return pygame.image.frombuffer(
+            buffer, (width, height), self.FORMATS[pixel_format]
+        )
+
+    def store(
+        self,
+        entry: ImageEntry,
+        size: Optional[Tuple[int, int]],
+        image: pygame.surface.Surface,
+    ) -> None:
+        """Write an image to the cache"""
+        has_alpha = image.get_alpha() is not None or bool(
+            image.get_flags() & pygame.SRCALPHA
+        )
+        pixel_format = 1 if has_alpha else 0
+        header = self.HEADER.pack(
+            self.MAGIC, self.VERSION, pixel_format, *image.get_size()
+        )
+        pixels = pygame.image.tobytes(image, self.FORMATS[pixel_format])
+
+        path = self.get_path(entry, size)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write to a temporary file first so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw_file:
+                raw_file.write(header)
+                raw_file.write(pixels)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def build(
+        self,
+        manifest: AssetManifest,
+        sizes: Dict[str, Sequence[Optional[Tuple[int, int]]]],
+    ) -> int:
+        """Fill the cache ahead of time
+
+        Parameters
+        ----------
+        manifest : AssetManifest
+            The manifest listing the images
+        sizes : Dict[str, Sequence[Optional[Tuple[int, int]]]]
+            The sizes to store each image at, by image name. None stores
+            the image at the scale given in the manifest.
+
+        Returns
+        -------
+        int
+            The number of images that were decoded and stored
+        """
+        stored = 0
+
+        for name, image_sizes in sizes.items():
+            entry = manifest[name]
+            for size in image_sizes:
+                if not self.get_path(entry, size).exists():
+                    self.store(entry, size, _decode_image(entry, size))
+                    stored += 1
+
+        return stored
+
+
+def _decode_image(
+    entry: ImageEntry,
+    size: Optional[Tuple[int, int]],
+    disk_cache: Optional[RawImageCache] = None,
+) -> pygame.surface.Surface:
+    """Decode and scale an image without converting it
+
+    This only touches the image itself, so it is safe to call from a
+    worker thread. If a disk cache is given, the image is loaded from it
+    when possible, and stored in it otherwise.
+    """
+    if disk_cache is not None:
+        image = disk_cache.load(entry, size)
+        if image is not None:
+            return image
+
+        image = _decode_image(entry, size)
+        disk_cache.store(entry, size, image)
+        return image
+
+    image = pygame.image.load(entry.path)
+
+    if size is None and entry.scale != 1:
+        width, height = image.get_size()
+        size = (width * entry.scale, height * entry.scale)
+
+    if size is not None and size != image.get_size():
+        image = pygame.transform.scale(image, size)
+
+    return image
+
+
+def _convert_image(image: pygame.surface.Surface) -> pygame.surface.Surface:
+    """Convert an image to the pixel format of the display, if there is one"""
+    if pygame.display.get_surface() is None:
+        return image
+
+    if image.get_alpha() is None:
+        return image.convert()
+
+    return image.convert_alpha()
+
+
+class AssetManager:
+    """Loads images from a manifest on demand and caches them by size
+
+    Parameters
+    ----------
+    manifest : AssetManifest
+        The images that can be loaded
+    memory_budget : int
+        The number of bytes of pixel data kept in the cache before the
+        least recently used images are evicted
+    workers : int
+        The number of threads used to decode images passed to preload()
+    disk_cache : RawImageCache, optional
+        Where to keep decoded images between runs
+    """
+
+    __slots__ = (
+        "manifest",
+        "disk_cache",
+        "atlas",
+        "memory_budget",
+        "memory_used",
+        "_images",
+        "_pending",
+        "_executor",
+        "_workers",
+        "_lock",
+    )
+
+    def __init__(
+        self,
+        manifest: AssetManifest,
+        memory_budget: int = 64 * 1024 * 1024,
+        workers: int = 2,
+        disk_cache: Optional[RawImageCache] = None,
+    ) -> None:
+        self.manifest: AssetManifest = manifest
+        self.disk_cache: Optional[RawImageCache] = disk_cache
+        self.atlas: Optional[TextureAtlas] = None
+        self.memory_budget: int = memory_budget
+        self.memory_used: int = 0
+        self._images: "OrderedDict[ImageKey, pygame.surface.Surface]" = OrderedDict()
+        self._pending: Dict[ImageKey, concurrent.futures.Future] = {}
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._workers: int = workers
+        self._lock: threading.Lock = threading.Lock()
+
+    def __contains__(self, key: ImageKey) -> bool:
+        return key in self._images or (self.atlas is not None and key in self.atlas)
+
+    def get(
+        self, name: str, size: Optional[Tuple[int, int]] = None
+    ) -> pygame.surface.Surface:
+        """Get an image, loading it if it is not cached
+
+        Parameters
+        ----------
+        name : str
+            The name of the image in the manifest
+        size : Tuple[int, int], optional
+            The size to scale the image to. If None, the image is used at
+            the scale given in the manifest.
+
+        Returns
+        -------
+        pygame.surface.Surface
+            The scaled image, converted to the display's pixel format
+        """
+        key: ImageKey = (name, size)
+
+        if self.atlas is not None and key in self.atlas:
+            return self.atlas.get(key)
+
+        image = self._images.get(key)
+
+        if image is not None:
+            self._images.move_to_end(key)
+            return image
+
+        image = _convert_image(self._take(name, size))
+        self._store(key, image)
+        return image
+
+    def _take(
+        self, name: str, size: Optional[Tuple[int, int]]
+    ) -> pygame.surface.Surface:
+        """Finish loading an image in the background, or load it now"""
+        with self._lock:
+            future = self._pending.pop((name, size), None)
+
+        if future is not None:
+            return future.result()
+
+        return self._load(name, size)
+
+    def _load(
+        self, name: str, size: Optional[Tuple[int, int]]
+    ) -> pygame.surface.Surface:
+        """Decode an image, reusing a cached copy at its full size if possible"""
+        try:
+            entry = self.manifest[name]
+        except KeyError as err:
+            raise KeyError(f"No image named {name} in the asset manifest") from err
+
+        source = self._images.get((name, None))
+
+        if source is not None and size is not None:
+            return pygame.transform.scale(source, size)
+
+        return _decode_image(entry, size, self.disk_cache)
+
+    def preload(
+        self, names: Iterable[str], size: Optional[Tuple[int, int]] = None
+    ) -> None:
+        """Start decoding images on background threads
+
+        The images are finished and cached when they are next requested
+        with get(). Images that are already cached or loading are skipped.
+        """
+        for name in names:
+            key: ImageKey = (name, size)
+
+            if key in self._images:
+                continue
+
+            with self._lock:
+                if key in self._pending:
+                    continue
+
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self._workers,
+                        thread_name_prefix="asset-loader",
+                    )
+
+                self._pending[key] = self._executor.submit(
+                    _decode_image, self.manifest[name], size, self.disk_cache
+                )
+
+    def decode(
+        self, name: str, size: Optional[Tuple[int, int]] = None
+    ) -> pygame.surface.Surface:
+        """Decode and scale an image without caching or converting it
+
+        This only creates a new surface, so it is safe to call from a
+        worker thread. Pass the result to pack_atlas() on the main thread
+        to keep it.
+        """
+        try:
+            entry = self.manifest[name]
+        except KeyError as err:
+            raise KeyError(f"No image named {name} in the asset manifest") from err
+
+        return _decode_image(entry, size, self.disk_cache)
+
+    def pack_atlas(
+        self,
+        names: Iterable[str],
+        size: Optional[Tuple[int, int]] = None,
+        decoded: Optional[Dict[str, pygame.surface.Surface]] = None,
+    ) -> TextureAtlas:
+        """Load images and pack them into the texture atlas
+
+        The atlas is created the first time this is called. Images that
+        are already in the atlas are skipped, and packed images are
+        removed from the regular cache, so get() returns the subsurface
+        of the atlas from then on. Call this from the main thread.
+
+        Parameters
+        ----------
+        names : Iterable[str]
+            The names of the images to pack
+        size : Tuple[int, int], optional
+            The size the images are scaled to
+        decoded : Dict[str, pygame.surface.Surface], optional
+            Images already made by decode(), by name, which are packed
+            instead of loading them again
+
+        Returns
+        -------
+        TextureAtlas
+            The atlas the images were packed into
+        """
+        if self.atlas is None:
+            self.atlas = TextureAtlas()
+
+        decoded = decoded or {}
+        keys = [(name, size) for name in dict.fromkeys(names)]
+        self.preload(
+            (
+                name
+                for name, _ in keys
+                if (name, size) not in self.atlas and name not in decoded
+            ),
+            size,
+        )
+
+        images = []
+        for key in keys:
+            if key in self.atlas:
+                continue
+
+            image = self._images.pop(key, None)
+            if image is not None:
+                self.memory_used -= get_surface_bytes(image)
+            elif key[0] in decoded:
+                image = _convert_image(decoded[key[0]])
+            else:
+                image = self._take(*key)
+            images.append((key, image))
+
+        self.atlas.pack(images)
+        return self.atlas
+
+    def is_loading(self, name: str, size: Optional[Tuple[int, int]] = None) -> bool:
+        """Check if an image is still being decoded in the background"""
+        with self._lock:
+            future = self._pending.get((name, size))
+
+        return future is not None and not future.done()
+
+    def _store(self, key: ImageKey, image: pygame.surface.Surface) -> None:
+        """Add an image to the cache, evicting others to stay within budget"""
+        self._images[key] = image
+        self.memory_used += get_surface_bytes(image)
+
+        # always keep the newest image, even if it is larger than the budget
+        while self.memory_used > self.memory_budget and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self.memory_used -= get_surface_bytes(evicted)
+
+    def evict(self, name: str) -> None:
+        """Remove every cached size of an image"""
+        for key in [key for key in self._images if key[0] == name]:
+            self.memory_used -= get_surface_bytes(self._images.pop(key))
+
+    def clear(self) -> None:
+        """Remove all cached images"""
+        self._images.clear()
+        self.memory_used = 0
+
+    def close(self) -> None:
+        """Stop the background threads and discard pending loads"""
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=True)
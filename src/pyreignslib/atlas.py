@@ -0,0 +1,170 @@
+"""
+Texture atlases for card art and icons
+
+Every pygame Surface carries its own pixel buffer and bookkeeping, which
+adds up when a deck has hundreds of small portraits. A TextureAtlas packs
+many images into a few large page surfaces instead. Sprites then use
+subsurfaces of a page, which share its pixels rather than copying them.
+"""
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+import pygame
+import pygame.display
+import pygame.rect
+import pygame.surface
+
+
+class AtlasRegion(NamedTuple):
+    """Where an image was packed within an atlas"""
+
+    page: int
+    """Index of the page surface that holds the image"""
+
+    rect: pygame.rect.Rect
+    """The area of the page covered by the image"""
+
+
+class _Shelf:
+    """A row of images of similar heights along the width of a page"""
+
+    __slots__ = "y", "height", "x"
+
+    def __init__(self, y: int, height: int) -> None:
+        self.y: int = y
+        self.height: int = height
+        self.x: int = 0
+
+
+class TextureAtlas:
+    """Packs images into a few large surfaces
+
+    Images are placed left to right in shelves, starting a new shelf
+    below the last one when a row fills up and a new page when a page
+    fills up. Packing many images at once with pack() sorts them by
+    height first, which wastes much less space than adding them one at
+    a time.
+
+    Parameters
+    ----------
+    page_size : Tuple[int, int]
+        The size of each page surface. Images larger than a page are
+        given a page of their own.
+    padding : int
+        Transparent pixels left between images, so that filtered
+        transforms of one image never sample its neighbours
+    """
+
+    __slots__ = "page_size", "padding", "pages", "regions", "_shelves", "_images"
+
+    def __init__(
+        self, page_size: Tuple[int, int] = (2048, 2048), padding: int = 1
+    ) -> None:
+        self.page_size: Tuple[int, int] = page_size
+        self.padding: int = padding
+        self.pages: List[pygame.surface.Surface] = []
+        self.regions: Dict[Hashable, AtlasRegion] = {}
+        self._shelves: List[List[_Shelf]] = []
+        self._images: Dict[Hashable, pygame.surface.Surface] = {}
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.regions
+
+    def add(self, key: Hashable, image: pygame.surface.Surface) -> AtlasRegion:
+        """Copy an image into the atlas
+
+        Parameters
+        ----------
+        key : Hashable
+            The key the image is looked up by
+        image : pygame.surface.Surface
+            The image to copy
+
+        Returns
+        -------
+        AtlasRegion
+            Where the image was placed
+        """
+        if key in self.regions:
+            raise KeyError(f"An image with key {key!r} is already in the atlas")
+
+        page, position = self._allocate(image.get_size())
+        rect = pygame.rect.Rect(position, image.get_size())
+
+        self.pages[page].blit(image, rect)
+        region = AtlasRegion(page, rect)
+        # the image goes in first, so a key found in regions can always be got
+        self._images[key] = self.pages[page].subsurface(rect)
+        self.regions[key] = region
+        return region
+
+    def pack(self, images: Iterable[Tuple[Hashable, pygame.surface.Surface]]) -> None:
+        """Copy several images into the atlas, tallest first"""
+        for key, image in sorted(images, key=lambda item: -item[1].get_height()):
+            self.add(key, image)
+
+    def get(self, key: Hashable) -> pygame.surface.Surface:
+        """Get a packed image as a subsurface of its page"""
+        return self._images[key]
+
+    def get_region(self, key: Hashable) -> AtlasRegion:
+        """Get where an image was packed"""
+        return self.regions[key]
+
+    def _allocate(self, size: Tuple[int, int]) -> Tuple[int, Tuple[int, int]]:
+        """Find space for an image, adding a page if none has room"""
+        width, height = size
+        page_width, page_height = self.page_size
+
+        if width > page_width or height > page_height:
+            # the page is marked as full so nothing else is placed on it
+            self._add_page((width, height))
+            full = _Shelf(0, page_height)
+            full.x = page_width
+            self._shelves[-1].append(full)
+            return len(self.pages) - 1, (0, 0)
+
+        for page, shelves in enumerate(self._shelves):
+            position = self._allocate_on_page(shelves, width, height)
+            if position is not None:
+                return page, position
+
+        self._add_page(self.page_size)
+        position = self._allocate_on_page(self._shelves[-1], width, height)
+        assert position is not None
+        return len(self.pages) - 1, position
+
+    def _allocate_on_page(
+        self, shelves: List[_Shelf], width: int, height: int
+    ) -> Optional[Tuple[int, int]]:
+        """Find space for an image on a single page"""
+        page_width, page_height = self.page_size
+        padded_width = width + self.padding
+
+        for shelf in shelves:
+            if height <= shelf.height and shelf.x + width <= page_width:
+                position = (shelf.x, shelf.y)
+                shelf.x += padded_width
+                return position
+
+        y = shelves[-1].y + shelves[-1].height + self.padding if shelves else 0
+
+        if y + height > page_height:
+            return None
+
+        shelf = _Shelf(y, height)
+        shelf.x = padded_width
+        shelves.append(shelf)
+        return (0, y)
+
+    def _add_page(self, size: Tuple[int, int]) -> None:
+        page = pygame.Surface(size, pygame.SRCALPHA)
+
+        if pygame.display.get_surface() is not None:
+            page = page.convert_alpha()
+
+        page.fill((0, 0, 0, 0))
+        self.pages.append(page)
+        self._shelves.append([])
@@ -0,0 +1,167 @@
+"""
+Headless playthroughs of real game modes
+
+A BatchRunner runs a game mode without a visible window and makes
+accept/reject decisions for the player, as fast as possible. It drives
+the mode through a real Game, so it is slower than the Monte Carlo
+simulation in pyreignslib.simulation, but plays exactly what the player
+would see.
+"""
+import dataclasses
+import itertools
+import random
+import time
+from typing import Callable, Iterable, Optional, Protocol, Type, runtime_checkable
+
+import pygame.event
+
+from .card import Card
+from .core.context import GameSettings
+from .core.game import Game
+from .core.mode import GameMode
+
+DecisionPolicy = Callable[[Card], bool]
+"""Decides whether to accept (True) or reject (False) a card"""
+
+
+@runtime_checkable
+class SwipeMode(Protocol):
+    """A game mode that presents a card for the player to accept or reject"""
+
+    card: Card
+
+    def swipe(self, accept: bool) -> None:
+        ...
+
+
+def random_policy(seed: Optional[int] = None) -> DecisionPolicy:
+    """Accept or reject cards at random"""
+    rng = random.Random(seed)
+
+    def policy(card: Card) -> bool:
+        return rng.random() < 0.5
+
+    return policy
+
+
+def scripted_policy(decisions: Iterable[bool], repeat: bool = False) -> DecisionPolicy:
+    """Replay a fixed sequence of decisions
+
+    Parameters
+    ----------
+    decisions : Iterable[bool]
+        The decisions to make, in order
+    repeat : bool
+        Start over from the first decision once all have been made,
+        instead of raising StopIteration
+    """
+    decision_iter = itertools.cycle(decisions) if repeat else iter(decisions)
+
+    def policy(card: Card) -> bool:
+        return next(decision_iter)
+
+    return policy
+
+
+@dataclasses.dataclass
+class BatchResult:
+    swipes: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def swipes_per_second(self) -> float:
+        if self.elapsed_seconds == 0:
+            return 0.0
+        return self.swipes / self.elapsed_seconds
+
+
+class BatchRunner:
+    """Drives a game mode headlessly using a decision policy
+
+    Parameters
+    ----------
+    settings : GameSettings
+        Settings for the game. The game is always run headless.
+    mode : Type[GameMode]
+        The mode to play. It must follow the SwipeMode protocol.
+    policy : DecisionPolicy
+        Makes the accept/reject decisions
+    setup : Callable[[Game], None], optional
+        Called once after the game is created, before the mode is
+        entered. Use it to load images and other resources.
+    steps_per_swipe : int
+        The number of fixed time steps simulated between decisions
+    """
+
+    __slots__ = "game", "policy", "steps_per_swipe"
+
+    def __init__(
+        self,
+        settings: GameSettings,
+        mode: Type[GameMode],
+        policy: DecisionPolicy,
+        setup: Optional[Callable[[Game], None]] = None,
+        steps_per_swipe: int = 1,
+    ) -> None:
+        settings = dataclasses.replace(settings, headless=True)
+        self.game: Game = Game(settings, initial_mode=_IdleMode)
+
+        if setup is not None:
+            setup(self.game)
+
+        self.game.set_mode(mode)
+        self.policy: DecisionPolicy = policy
+        self.steps_per_swipe: int = steps_per_swipe
+
+    def run(self, swipes: int) -> BatchResult:
+        """Make up to the given number of decisions
+
+        The run stops early when a scripted policy runs out of decisions.
+        """
+        result = BatchResult()
+        elapsed_time = self.game.context.settings.frame_time
+        start_time = time.perf_counter()
+
+        for _ in range(swipes):
+            mode = self.game.mode
+
+            if not isinstance(mode, SwipeMode):
+                raise TypeError(f"{type(mode).__name__} does not support swiping")
+
+            try:
+                accept = self.policy(mode.card)
+            except StopIteration:
+                break
+
+            mode.swipe(accept)
+
+            result.swipes += 1
+            if accept:
+                result.accepted += 1
+            else:
+                result.rejected += 1
+
+            for _ in range(self.steps_per_swipe):
+                self.game.update(elapsed_time)
+                self.game.handle_events()
+
+        result.elapsed_seconds = time.perf_counter() - start_time
+        return result
+
+    def close(self) -> None:
+        self.game.quit()
+
+
+class _IdleMode(GameMode):
+    """Placeholder mode used while a BatchRunner sets up the game"""
+
+    def update(self, elapsed_time: float) -> None:
+        pass
+
+    def handle_event(self, event: pygame.event.Event) -> None:
+        pass
+
+    def draw(self) -> None:
+        pass
@@ -1,5 +1,7 @@
-from typing import Any, List, Sequence, Tuple, Union
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import pygame
 import pygame.color
 import pygame.math
@@ -8,6 +10,13 @@ import pygame.sprite
 import pygame.surface
 import pygame.transform
 
+CARD_SIZE: Tuple[int, int] = (380, 380)
+
+RotatedFrame = Tuple[pygame.surface.Surface, pygame.rect.Rect]
+
+# Scaled copies of card images, keyed by the source image
+_scaled_card_images: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
 
 def get_sign(value: int):
     if value > 0:
@@ -18,6 +27,188 @@ def get_sign(value: int):
         return 0
 
 
+def get_card_image(image: pygame.surface.Surface) -> pygame.surface.Surface:
+    """Get a copy of an image scaled to the size of a card
+
+    Cards created from the same image share a single scaled copy, which
+    lets them share rotated frames in a RotationCache too.
+    """
+    if image.get_size() == CARD_SIZE:
+        return image
+
+    scaled = _scaled_card_images.get(image)
+
+    if scaled is None:
+        scaled = scale_card_image(image)
+        _scaled_card_images[image] = scaled
+
+    return scaled
+
+
+def find_card_image(
+    image: pygame.surface.Surface,
+) -> Optional[pygame.surface.Surface]:
+    """Get the cached copy of an image scaled to the size of a card
+
+    Returns
+    -------
+    pygame.surface.Surface or None
+        The copy get_card_image() would return, or None if the image has
+        not been scaled yet
+    """
+    if image.get_size() == CARD_SIZE:
+        return image
+
+    return _scaled_card_images.get(image)
+
+
+def scale_card_image(image: pygame.surface.Surface) -> pygame.surface.Surface:
+    """Scale an image to the size of a card without caching it"""
+    if image.get_size() == CARD_SIZE:
+        return image
+
+    return pygame.transform.scale(image, CARD_SIZE)
+
+
+def add_card_image(
+    image: pygame.surface.Surface, scaled: pygame.surface.Surface
+) -> pygame.surface.Surface:
+    """Make get_card_image() return a copy of an image scaled elsewhere
+
+    Lets a worker thread scale images with scale_card_image() without
+    touching the shared cache, which is only changed from the main
+    thread. A copy that is already cached is kept, since cards and
+    rotated frames may be using it.
+
+    Returns
+    -------
+    pygame.surface.Surface
+        The copy get_card_image() now returns
+    """
+    if image.get_size() == CARD_SIZE:
+        return image
+
+    return _scaled_card_images.setdefault(image, scaled)
+
+
+class RotationCache:
+    """Memoizes rotated copies of card images
+
+    Card rotations are always whole degrees between -Card.MAX_TILT and
+    Card.MAX_TILT, so each image only ever needs a few dozen frames.
+    Frames are rendered the first time they are needed, or up front
+    with prerender(), and are shared by every card using the same image.
+
+    Parameters
+    ----------
+    smooth : bool
+        Use pygame.transform.rotozoom to produce filtered frames instead
+        of pygame.transform.rotate
+    """
+
+    __slots__ = "smooth", "_frames"
+
+    def __init__(self, smooth: bool = False) -> None:
+        self.smooth: bool = smooth
+        # Rotated frames of each image, keyed by the rotation angle
+        self._frames: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def __contains__(self, image: pygame.surface.Surface) -> bool:
+        return image in self._frames
+
+    def get(self, image: pygame.surface.Surface, angle: int) -> RotatedFrame:
+        """Get an image rotated by the given angle
+
+        Returns
+        -------
+        RotatedFrame
+            The rotated image and its rect, centered on (0, 0)
+        """
+        frames: Optional[Dict[int, RotatedFrame]] = self._frames.get(image)
+
+        if frames is None:
+            frames = {}
+            self._frames[image] = frames
+
+        frame = frames.get(angle)
+
+        if frame is None:
+            frame = self.rotate(image, angle)
+            frames[angle] = frame
+
+        return frame
+
+    def rotate(self, image: pygame.surface.Surface, angle: int) -> RotatedFrame:
+        """Render a rotated frame without caching it"""
+        if self.smooth:
+            rotated = pygame.transform.rotozoom(image, angle, 1.0)
+        else:
+            rotated = pygame.transform.rotate(image, angle)
+
+        return rotated, rotated.get_rect(center=(0, 0))
+
+    def render_frames(
+        self,
+        image: pygame.surface.Surface,
+        max_angle: int,
+        pixel_format: Optional[pygame.surface.Surface] = None,
+    ) -> Dict[int, RotatedFrame]:
+        """Render every frame between -max_angle and max_angle, uncached
+
+        This only reads the image and creates new surfaces, so it is safe
+        to call from a worker thread. Pass the frames to add_frames() on
+        the main thread to cache them.
+
+        Parameters
+        ----------
+        image : pygame.surface.Surface
+            The image to rotate
+        max_angle : int
+            The largest angle to rotate by, in degrees
+        pixel_format : pygame.surface.Surface, optional
+            A surface with the pixel format to convert the frames to,
+            usually a converted one from the main thread. Converting to
+            it does not use the display, unlike convert_alpha().
+        """
+        frames = {}
+
+        for angle in range(-max_angle, max_angle + 1):
+            if angle == 0:
+                continue
+
+            rotated, rect = self.rotate(image, angle)
+            if pixel_format is not None:
+                rotated = rotated.convert(pixel_format)
+            frames[angle] = rotated, rect
+
+        return frames
+
+    def add_frames(
+        self, image: pygame.surface.Surface, frames: Dict[int, RotatedFrame]
+    ) -> None:
+        """Cache frames made by render_frames(), keeping any already cached"""
+        cached: Optional[Dict[int, RotatedFrame]] = self._frames.get(image)
+
+        if cached is None:
+            self._frames[image] = dict(frames)
+        else:
+            for angle, frame in frames.items():
+                cached.setdefault(angle, frame)
+
+    def prerender(self, image: pygame.surface.Surface, max_angle: int) -> None:
+        """Render every frame of an image between -max_angle and max_angle"""
+        for angle in range(-max_angle, max_angle + 1):
+            if angle != 0:
+                self.get(image, angle)
+
+    def clear(self) -> None:
+        """Remove all frames"""
+        self._frames.clear()
+
+
+default_rotation_cache = RotationCache()
+
+
 class Card(pygame.sprite.Sprite):
     """
     Cards are what get dragged left or right by
@@ -25,7 +216,7 @@ class Card(pygame.sprite.Sprite):
     """
 
     reset_speed: float = 10.0
-    MAX_TILT: float = 15
+    MAX_TILT: int = 15
 
     def __init__(
         self,
@@ -37,18 +228,22 @@ class Card(pygame.sprite.Sprite):
     ) -> None:
         super().__init__()
         self.background_color: pygame.color.Color = pygame.color.Color(173, 173, 173)
-        self.image: pygame.surface.Surface = pygame.transform.scale(image, (380, 380))
+        self.image: pygame.surface.Surface = get_card_image(image)
         self.rect: pygame.rect.Rect = self.image.get_rect()
         self.reset_pos: Tuple[int, int] = window_size[0] // 2, window_size[1] // 2 + 50
         self.rect.center = self.reset_pos
         self.dragged: bool = False
         self.rotation: int = 0
+        self.previous_center: Tuple[int, int] = self.rect.center
+        self.previous_rotation: int = 0
         self.prompt_text: str = prompt_text
         self.accept_text: str = accept_text
         self.reject_text: str = reject_text
 
     def update(self, *args: Any, **kwargs: Any) -> None:
         elapsed_time: float = kwargs["elapsed_time"]
+        self.previous_center = self.rect.center
+        self.previous_rotation = self.rotation
 
         toward_center = pygame.math.Vector2(self.reset_pos) - pygame.math.Vector2(
             self.rect.center
@@ -78,33 +273,257 @@ class Card(pygame.sprite.Sprite):
 
     def on_accept(self) -> None:
         """Perform an operation when the user accepts this choice"""
-        print("YES SWIPE!")
 
     def on_reject(self) -> None:
         """Perform an operation when the user rejects this choice"""
-        print("NO SWIPE!")
 
 
 class CardSpriteGroup(pygame.sprite.Group):
-    __slots__ = "cards"
+    """Draws cards in order and moves them back toward their targets
+
+    Cards that use the default Card.update are updated together in one
+    vectorized step. Their positions, targets, return speeds and whether
+    they are dragged are kept in NumPy arrays, and each update only
+    writes back to the cards that moved. Cards with their own update
+    method are updated one at a time.
+
+    Move cards and start or stop dragging them with move_card() and
+    set_dragged(), rather than through their rect and dragged
+    attributes, so that the arrays stay in sync.
+
+    Parameters
+    ----------
+    *sprites : Card or Sequence[Card]
+        The cards in the group, from bottom to top
+    rotation_cache : RotationCache, optional
+        Where rotated card frames are kept. Defaults to a shared cache.
+    batched : bool
+        Update cards with the vectorized step instead of calling
+        Card.update on each
+    """
 
-    def __init__(self, *sprites: Union[Card, Sequence[Card]]) -> None:
+    __slots__ = (
+        "cards",
+        "rotation_cache",
+        "last_drawn_rects",
+        "interpolation",
+        "batched",
+        "_batch",
+        "_batch_index",
+        "_targets",
+        "_speeds",
+        "_centers",
+        "_dragged",
+        "_rotations",
+        "_changed",
+    )
+
+    def __init__(
+        self,
+        *sprites: Union[Card, Sequence[Card]],
+        rotation_cache: Optional[RotationCache] = None,
+        batched: bool = True,
+    ) -> None:
         super().__init__(*sprites)
         self.cards: List[Card] = []
+        self.rotation_cache: RotationCache = (
+            rotation_cache if rotation_cache is not None else default_rotation_cache
+        )
+        self.last_drawn_rects: List[pygame.rect.Rect] = []
+        self.interpolation: float = 1.0
+        self.batched: bool = batched
+        self._batch: Optional[List[Card]] = None
+        self._batch_index: Dict[Card, int] = {}
+        self._targets: np.ndarray = np.zeros((0, 2))
+        self._speeds: np.ndarray = np.zeros(0)
+        self._centers: np.ndarray = np.zeros((0, 2))
+        self._dragged: np.ndarray = np.zeros(0, dtype=bool)
+        self._rotations: np.ndarray = np.zeros(0)
+        # whether each card's previous position is out of date
+        self._changed: np.ndarray = np.zeros(0, dtype=bool)
 
         if isinstance(sprites, Card):
             self.cards.append(sprites)
         else:
             self.cards = list(*sprites)
 
+    def add_card(self, card: Card) -> None:
+        """Add a card, drawing it on top of the others"""
+        self.add(card)
+        self.cards.append(card)
+        self._batch = None
+
+    def remove_card(self, card: Card) -> None:
+        """Remove a card from the group"""
+        self.remove(card)
+        self.cards.remove(card)
+        self._batch = None
+
+    def set_target(self, card: Card, position: Tuple[int, int]) -> None:
+        """Change where a card returns to when it is not being dragged"""
+        card.reset_pos = position
+
+        index = self._batch_index.get(card) if self._batch is not None else None
+        if index is not None:
+            self._targets[index] = position
+
+    def move_card(self, card: Card, center: Tuple[int, int]) -> None:
+        """Move a card, such as to follow the mouse while it is dragged"""
+        card.rect.center = center
+        self._sync_card(card)
+
+    def set_dragged(self, card: Card, dragged: bool) -> None:
+        """Start or stop dragging a card
+
+        Dragged cards stay where they are put instead of returning to
+        their targets.
+        """
+        card.dragged = dragged
+        self._sync_card(card)
+
+    def _sync_card(self, card: Card) -> None:
+        """Copy a card's position and dragged state into the batch"""
+        index = self._batch_index.get(card) if self._batch is not None else None
+
+        if index is not None:
+            self._centers[index] = card.rect.center
+            self._dragged[index] = card.dragged
+            self._changed[index] = True
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        if not self.batched:
+            super().update(*args, **kwargs)
+            return
+
+        if self._batch is None:
+            self._build_batch()
+        assert self._batch is not None
+
+        for card in self.cards:
+            if type(card).update is not Card.update:
+                card.update(*args, **kwargs)
+
+        if self._batch:
+            self._update_batch(kwargs["elapsed_time"])
+
+    def _build_batch(self) -> None:
+        """Gather the cards that use the default update and their state"""
+        self._batch = [card for card in self.cards if type(card).update is Card.update]
+        self._batch_index = {card: i for i, card in enumerate(self._batch)}
+        self._targets = np.array(
+            [card.reset_pos for card in self._batch], dtype=np.float64
+        ).reshape(-1, 2)
+        self._speeds = np.array(
+            [card.reset_speed for card in self._batch], dtype=np.float64
+        )
+        self._centers = np.array(
+            [card.rect.center for card in self._batch], dtype=np.float64
+        ).reshape(-1, 2)
+        self._dragged = np.array([card.dragged for card in self._batch], dtype=bool)
+        self._rotations = np.array(
+            [card.rotation for card in self._batch], dtype=np.float64
+        )
+        self._changed = np.ones(len(self._batch), dtype=bool)
+
+    def _update_batch(self, elapsed_time: float) -> None:
+        """Update every batched card at once, the same way Card.update does"""
+        assert self._batch is not None
+        centers = self._centers
+
+        toward_center = self._targets - centers
+        distance = np.hypot(toward_center[:, 0], toward_center[:, 1])
+        x_sign = np.sign(centers[:, 0] - self._targets[:, 0])
+
+        rotations = np.round(
+            Card.MAX_TILT * np.minimum(distance / 50.0, 1) * x_sign * -1
+        )
+
+        moving = ~self._dragged
+        snapped = moving & (distance <= 3)
+        returning = moving & ~snapped
+
+        new_centers = centers.copy()
+        new_centers[returning] = np.round(
+            centers[returning]
+            + toward_center[returning]
+            * (self._speeds[returning] * elapsed_time)[:, None]
+        )
+        new_centers[snapped] = self._targets[snapped]
+        rotations[snapped] = 0
+
+        # only touch cards that changed in this update or the one before,
+        # since every other card's previous position is already its current
+        changed = np.any(new_centers != centers, axis=1) | (
+            rotations != self._rotations
+        )
+        touched = np.flatnonzero(changed | self._changed)
+        self._centers = new_centers
+        self._rotations = rotations
+        self._changed = changed
+
+        if not len(touched):
+            return
+
+        new_centers_list = new_centers[touched].astype(int).tolist()
+        rotations_list = rotations[touched].astype(int).tolist()
+
+        for i, center, rotation in zip(
+            touched.tolist(), new_centers_list, rotations_list
+        ):
+            card = self._batch[i]
+            card.previous_center = card.rect.center
+            card.previous_rotation = card.rotation
+            card.rect.center = center
+            card.rotation = rotation
+
+    def get_frame(self, card: Card) -> RotatedFrame:
+        """Get the image of a card as it will be drawn and where it goes
+
+        Cards that are not being dragged are drawn between their previous
+        and current positions according to the group's interpolation.
+        Dragged cards follow the mouse without any delay.
+        """
+        center = card.rect.center
+        rotation = card.rotation
+        t = self.interpolation
+
+        if t < 1.0 and not card.dragged:
+            x, y = card.previous_center
+            center = (round(x + (center[0] - x) * t), round(y + (center[1] - y) * t))
+            rotation = round(
+                card.previous_rotation + (rotation - card.previous_rotation) * t
+            )
+
+        if rotation == 0:
+            return card.image, card.image.get_rect(center=center)
+
+        rot_image, rot_rect = self.rotation_cache.get(card.image, rotation)
+        return rot_image, rot_rect.move(center)
+
+    def get_dirty_rects(self) -> List[pygame.rect.Rect]:
+        """Get the areas that changed since the cards were last drawn"""
+        rects = [self.get_frame(card)[1] for card in self.cards]
+
+        if rects == self.last_drawn_rects:
+            return []
+
+        return self.last_drawn_rects + rects
+
     def draw(self, surface: pygame.surface.Surface) -> List[pygame.rect.Rect]:
         drawn_rects: List[pygame.rect.Rect] = []
+        self.last_drawn_rects = []
+
         for card in self.cards:
-            if card.rotation == 0:
-                drawn_rects.append(surface.blit(card.image, card.rect))
+            image, rect = self.get_frame(card)
+            page = image.get_parent()
+
+            # blit images packed in a texture atlas straight from the page
+            if page is not None:
+                area = pygame.rect.Rect(image.get_offset(), image.get_size())
+                drawn_rects.append(surface.blit(page, rect, area))
             else:
-                rot_image = pygame.transform.rotate(card.image, card.rotation)
-                rot_rect = rot_image.get_rect(center=card.rect.center)
-                drawn_rects.append(surface.blit(rot_image, rot_rect))
+                drawn_rects.append(surface.blit(image, rect))
+
+            self.last_drawn_rects.append(rect)
 
         return drawn_rects
@@ -1,5 +1,18 @@
 from .context import GameContext, GameSettings
+from .events import handles
 from .game import Game
-from .mode import CHANGE_MODE_EVENT, GameMode
+from .mode import CHANGE_MODE_EVENT, PRELOAD_MODE_EVENT, GameMode
+from .replay import ReplayError, ReplayPlayer, ReplayRecorder
 
-__all__ = ["GameContext", "GameSettings", "Game", "GameMode", "CHANGE_MODE_EVENT"]
+__all__ = [
+    "GameContext",
+    "GameSettings",
+    "Game",
+    "GameMode",
+    "CHANGE_MODE_EVENT",
+    "PRELOAD_MODE_EVENT",
+    "ReplayError",
+    "ReplayPlayer",
+    "ReplayRecorder",
+    "handles",
+]
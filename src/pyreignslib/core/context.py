@@ -1,18 +1,69 @@
+import contextlib
 import dataclasses
-from typing import Dict, Tuple
+import random
+from typing import ClassVar, ContextManager, Dict, List, Optional, Tuple
 
 import pygame.font
+import pygame.rect
 import pygame.surface
 import pygame_gui
 
+from ..assets import AssetManager
+from ..deck import Deck
+from ..fonts import FontManager, default_font_manager
+from ..profiler import FrameProfiler
+
+_NOT_PROFILING = contextlib.nullcontext()
+
 
 @dataclasses.dataclass
 class GameSettings:
     window_size: Tuple[int, int]
     fps: int
+    """The most frames drawn per second, or 0 for no limit"""
     title: str
     icon_title: str
     show_debug: bool = False
+    dirty_rects: bool = False
+    """Only redraw and update the parts of the window that changed"""
+    headless: bool = False
+    """Run without a visible window using a fixed, uncapped time step"""
+    update_rate: Optional[int] = None
+    """Simulation steps per second. If set, modes are updated with a fixed
+    time step, independent of the render rate given by fps"""
+    max_updates_per_frame: int = 5
+    """The most fixed steps run before a frame is drawn, so that a slow
+    frame does not make the next one even slower"""
+    vsync: bool = False
+    """Wait for the display's vertical sync before showing each frame"""
+    profile: bool = False
+    """Time each frame and show the profiler overlay, which F3 toggles"""
+    profile_output: Optional[str] = None
+    """A .csv or .json file the profiler's samples are written to on exit"""
+    save_path: Optional[str] = None
+    """The file the current run is autosaved to after every swipe, and
+    resumed from when the game starts again"""
+    seed: Optional[int] = None
+    """The seed of GameContext.rng. A random seed is used if None"""
+
+    DEFAULT_FPS: ClassVar[int] = 60
+    """The frame rate assumed for timing when fps is 0"""
+
+    def __post_init__(self) -> None:
+        if self.fps < 0:
+            raise ValueError(f"fps must be 0 or more, not {self.fps}")
+        if self.update_rate is not None and self.update_rate <= 0:
+            raise ValueError(f"update_rate must be positive, not {self.update_rate}")
+
+    @property
+    def frame_time(self) -> float:
+        """The seconds between frames at the target frame rate
+
+        Headless games advance by this much every frame instead of
+        measuring time. When fps is 0 there is no target, so DEFAULT_FPS
+        is used.
+        """
+        return 1.0 / (self.fps or self.DEFAULT_FPS)
 
 
 @dataclasses.dataclass
@@ -23,4 +74,54 @@ class GameContext:
     settings: GameSettings
     default_font: pygame.font.Font
     ui_manager: pygame_gui.UIManager
+    fonts: FontManager = dataclasses.field(default=default_font_manager)
+    """Loads fonts once and measures and renders text. Shared with the text
+    helpers in pyreignslib.text by default"""
     images: Dict[str, pygame.surface.Surface] = dataclasses.field(default_factory=dict)
+    assets: Optional[AssetManager] = None
+    deck: Optional[Deck] = None
+    dirty_rects: List[pygame.rect.Rect] = dataclasses.field(default_factory=list)
+    profiler: Optional[FrameProfiler] = None
+    interpolation: float = 1.0
+    """How far the current frame is between the previous and the latest
+    fixed update, from 0.0 to 1.0. Always 1.0 without a fixed time step"""
+    seed: int = 0
+    """The seed rng was created with"""
+    rng: random.Random = dataclasses.field(default_factory=random.Random)
+    """The source of randomness for game logic, so that sessions can be
+    replayed exactly"""
+
+    def mark_dirty(self, rect: Optional[pygame.rect.Rect] = None) -> None:
+        """Request that an area of the window be redrawn next frame
+
+        Only used when GameSettings.dirty_rects is enabled. If no rect is
+        given, the whole window is redrawn.
+        """
+        if rect is None:
+            rect = self.window.get_rect()
+        self.dirty_rects.append(pygame.rect.Rect(rect))
+
+    def profile(self, name: str) -> ContextManager[None]:
+        """Time a section of the current frame if profiling is enabled"""
+        if self.profiler is None:
+            return _NOT_PROFILING
+
+        return self.profiler.section(name)
+
+    def get_image(
+        self, name: str, size: Optional[Tuple[int, int]] = None
+    ) -> pygame.surface.Surface:
+        """Get an image from the asset manager, or from images if there is none
+
+        Parameters
+        ----------
+        name : str
+            The name of the image
+        size : Tuple[int, int], optional
+            The size the image will be drawn at. The asset manager caches
+            scaled copies, so sprites that share a size share one image.
+        """
+        if self.assets is not None:
+            return self.assets.get(name, size)
+
+        return self.images[name]
@@ -0,0 +1,94 @@
+"""
+Event dispatch and filtering helpers
+
+Modes register methods as handlers for event types with the @handles
+decorator, and GameMode.handle_event looks handlers up in a table
+instead of checking event.type in a chain of if statements.
+
+High polling rate mice can add hundreds of MOUSEMOTION events to the
+queue each frame. coalesce_motion merges runs of them into a single
+event carrying the total movement, so modes handle one motion per
+frame however fast the mouse reports.
+"""
+from typing import Callable, Dict, Iterable, List, Tuple, TypeVar
+
+import pygame
+import pygame.constants
+import pygame.event
+
+EventHandler = TypeVar("EventHandler", bound=Callable[..., None])
+
+HANDLED_EVENTS_ATTR = "_handled_event_types"
+"""Attribute @handles stores the event types of a handler in"""
+
+ALWAYS_ALLOWED_EVENTS: Tuple[int, ...] = (
+    pygame.constants.QUIT,
+    pygame.constants.WINDOWCLOSE,
+    pygame.constants.WINDOWFOCUSLOST,
+    pygame.constants.WINDOWFOCUSGAINED,
+    pygame.constants.WINDOWSHOWN,
+    pygame.constants.WINDOWEXPOSED,
+    pygame.constants.VIDEORESIZE,
+    pygame.constants.VIDEOEXPOSE,
+)
+"""Events the game needs no matter which mode is active"""
+
+
+def handles(*event_types: int) -> Callable[[EventHandler], EventHandler]:
+    """Register a GameMode method as the handler for event types"""
+
+    def decorator(handler: EventHandler) -> EventHandler:
+        setattr(handler, HANDLED_EVENTS_ATTR, event_types)
+        return handler
+
+    return decorator
+
+
+def collect_handlers(cls: type) -> Dict[int, str]:
+    """Find the handler method name for each event type in a class
+
+    Handlers defined in subclasses replace those of their base classes.
+    """
+    handlers: Dict[int, str] = {}
+
+    for klass in reversed(cls.__mro__):
+        for name, value in vars(klass).items():
+            for event_type in getattr(value, HANDLED_EVENTS_ATTR, ()):
+                handlers[event_type] = name
+
+    return handlers
+
+
+def coalesce_motion(events: Iterable[pygame.event.Event]) -> List[pygame.event.Event]:
+    """Merge consecutive MOUSEMOTION events into one
+
+    The merged event has the position and buttons of the last event in
+    the run and the sum of their relative movements. Runs are broken by
+    any other event, so motion is never reordered around a click.
+    """
+    merged: List[pygame.event.Event] = []
+    motion_run: List[pygame.event.Event] = []
+
+    def flush() -> None:
+        if len(motion_run) == 1:
+            merged.append(motion_run[0])
+        elif motion_run:
+            last = motion_run[-1]
+            rel = (
+                sum(event.rel[0] for event in motion_run),
+                sum(event.rel[1] for event in motion_run),
+            )
+            attributes = dict(last.dict)
+            attributes["rel"] = rel
+            merged.append(pygame.event.Event(pygame.constants.MOUSEMOTION, attributes))
+        motion_run.clear()
+
+    for event in events:
+        if event.type == pygame.constants.MOUSEMOTION:
+            motion_run.append(event)
+        else:
+            flush()
+            merged.append(event)
+
+    flush()
+    return merged
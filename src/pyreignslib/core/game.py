@@ -1,16 +1,68 @@
-from typing import Type
+import os
+import random
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple, Type
 
 import pygame
+import pygame.rect
 import pygame.surface
 import pygame.time
 import pygame_gui
+from pygame_gui.core.interfaces import IContainerLikeInterface
 
+from ..fonts import default_font_manager
+from ..profiler import FrameProfiler, ProfilerOverlay
 from .context import GameContext, GameSettings
-from .mode import CHANGE_MODE_EVENT, GameMode
+from .events import ALWAYS_ALLOWED_EVENTS, coalesce_motion
+from .mode import CHANGE_MODE_EVENT, PRELOAD_MODE_EVENT, GameMode
+from .replay import Replay
+
+TIMESTEP_TOLERANCE = 1e-9
+"""Seconds a fixed step may be short by and still run, to allow for rounding"""
+
+
+class UIElementSnapshot(NamedTuple):
+    """How a UI element was drawn in the last frame"""
+
+    image: pygame.surface.Surface
+    rect: pygame.rect.Rect
+    state: Hashable
+    """State that changes what the element draws into its current image"""
+
+
+def _get_ui_element_state(element: Any) -> Hashable:
+    """Get the state a UI element redraws its image in place for
+
+    pygame_gui redraws clipped elements into the image they have, and
+    may keep the image of an element whose hover state changes.
+    Containers look the same whether they are hovered or not, and the
+    root container covers the whole window, so their hover state is
+    ignored.
+    """
+    clip = None
+    if hasattr(element, "get_image_clipping_rect"):
+        clip_rect = element.get_image_clipping_rect()
+        if clip_rect is not None:
+            clip = tuple(clip_rect)
+
+    if isinstance(element, IContainerLikeInterface):
+        return clip, False
+
+    return clip, getattr(element, "hovered", False)
 
 
 class Game:
-    __slots__ = "context", "clock", "mode"
+    __slots__ = (
+        "context",
+        "clock",
+        "mode",
+        "mode_stack",
+        "overlay",
+        "accumulator",
+        "replay",
+        "_suspended_modes",
+        "_preloaded_modes",
+        "_ui_snapshot",
+    )
 
     def __init__(self, settings: GameSettings, initial_mode: Type[GameMode]) -> None:
         self.context: GameContext = GameContext(
@@ -22,15 +74,50 @@ class Game:
             ui_manager=pygame_gui.UIManager(settings.window_size),
         )
         self.clock: pygame.time.Clock = pygame.time.Clock()
-        self.mode: GameMode = initial_mode(self.context)
         self.context.ui_manager.set_visual_debug_mode(settings.show_debug)
+        self.context.seed = (
+            settings.seed if settings.seed is not None else random.getrandbits(32)
+        )
+        self.context.rng.seed(self.context.seed)
+        self.accumulator: float = 0.0
+        self.replay: Optional[Replay] = None
+        self.overlay: Optional[ProfilerOverlay] = None
+        if settings.profile:
+            self.context.profiler = FrameProfiler()
+            self.overlay = ProfilerOverlay(
+                self.context.profiler,
+                self.context.fonts.get_font(None, 20),
+                1000 * settings.frame_time,
+            )
+        self._suspended_modes: Dict[Type[GameMode], GameMode] = {}
+        self._preloaded_modes: Dict[Type[GameMode], GameMode] = {}
+        self._ui_snapshot: List[UIElementSnapshot] = []
+        self.mode: GameMode = self._get_mode(initial_mode)
+        self.mode_stack: List[GameMode] = [self.mode]
+        self._activate(self.mode)
 
     @staticmethod
     def initialize_window(settings: GameSettings) -> pygame.surface.Surface:
-        window = pygame.display.set_mode(settings.window_size, pygame.constants.SCALED)
+        if settings.headless:
+            return Game.initialize_headless_window(settings)
+
+        window = pygame.display.set_mode(
+            settings.window_size, pygame.constants.SCALED, vsync=int(settings.vsync)
+        )
         pygame.display.set_caption(settings.title, settings.icon_title)
         return window
 
+    @staticmethod
+    def initialize_headless_window(settings: GameSettings) -> pygame.surface.Surface:
+        """Create an off-screen window using SDL's dummy video driver"""
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+
+        if pygame.display.get_init() and pygame.display.get_driver() != "dummy":
+            pygame.display.quit()
+
+        pygame.display.init()
+        return pygame.display.set_mode(settings.window_size)
+
     @staticmethod
     def initialize_background() -> pygame.surface.Surface:
         background = pygame.Surface(pygame.display.get_surface().get_size())
@@ -40,17 +127,27 @@ class Game:
 
     @staticmethod
     def initialize_default_font() -> pygame.font.Font:
-        return pygame.font.Font(None, 36)
+        return default_font_manager.get_font(None, 36)
 
     def start(self) -> None:
         self.context.is_running = True
 
+        settings = self.context.settings
+        fixed_timestep = settings.update_rate is not None
+
         try:
             while self.context.is_running:
-                elapsed_time = self.clock.tick(self.context.settings.fps) / 1000.0
-                self.draw()
-                self.update(elapsed_time)
-                self.handle_events()
+                if settings.headless and fixed_timestep:
+                    elapsed_time = 1.0 / settings.update_rate
+                elif settings.headless:
+                    elapsed_time = settings.frame_time
+                else:
+                    elapsed_time = self.clock.tick(settings.fps) / 1000.0
+
+                if fixed_timestep:
+                    self.advance(elapsed_time)
+                else:
+                    self.step(elapsed_time)
         except SystemExit:
             pass
         except KeyboardInterrupt:
@@ -58,31 +155,335 @@ class Game:
 
         self.quit()
 
+    def step(self, elapsed_time: float) -> None:
+        """Advance the game by a single frame"""
+        profiler = self.context.profiler
+
+        if profiler is not None:
+            profiler.begin_frame()
+
+        with self.context.profile("draw"):
+            self.draw()
+        with self.context.profile("update"):
+            self.update(elapsed_time)
+        with self.context.profile("handle_events"):
+            self.handle_events()
+
+        if self.replay is not None:
+            self.replay.end_frame(self, elapsed_time)
+
+        if profiler is not None:
+            profiler.end_frame()
+
+    def advance(self, frame_time: float) -> None:
+        """Advance the game by a single frame using a fixed time step
+
+        Input is handled first, then the mode is updated in fixed steps
+        of 1 / GameSettings.update_rate seconds for as many steps as fit
+        in the time that has passed. Leftover time carries over to the
+        next frame, and the fraction of a step it represents is stored in
+        GameContext.interpolation so modes can draw between the last two
+        steps. This keeps the simulation deterministic however fast or
+        slow frames are drawn.
+        """
+        settings = self.context.settings
+        assert settings.update_rate is not None
+        timestep = 1.0 / settings.update_rate
+        profiler = self.context.profiler
+
+        if profiler is not None:
+            profiler.begin_frame()
+
+        with self.context.profile("handle_events"):
+            self.handle_events()
+
+        self.accumulator += min(frame_time, timestep * settings.max_updates_per_frame)
+
+        with self.context.profile("update"):
+            # allow for rounding, so that time for a whole number of steps
+            # is never a step short
+            while self.accumulator >= timestep - TIMESTEP_TOLERANCE:
+                self.update(timestep)
+                self.accumulator = max(self.accumulator - timestep, 0.0)
+
+        self.context.interpolation = self.accumulator / timestep
+
+        with self.context.profile("draw"):
+            self.draw()
+
+        if self.replay is not None:
+            self.replay.end_frame(self, frame_time)
+
+        if profiler is not None:
+            profiler.end_frame()
+
     def update(self, elapsed_time: float) -> None:
-        self.context.ui_manager.update(elapsed_time)
-        self.mode.update(elapsed_time)
+        with self.context.profile("ui.update"):
+            self.context.ui_manager.update(elapsed_time)
+        with self.context.profile("mode.update"):
+            self.mode.update(elapsed_time)
 
     def handle_events(self) -> None:
-        for event in pygame.event.get():
-            self.mode.handle_event(event)
-            self.context.ui_manager.process_events(event)
+        events = coalesce_motion(pygame.event.get())
+
+        if self.replay is not None:
+            events = self.replay.filter_events(self, events)
+
+        for event in events:
+            with self.context.profile("mode.handle_event"):
+                self.mode.handle_event(event)
+            with self.context.profile("ui.process_events"):
+                self.context.ui_manager.process_events(event)
 
             if event.type == pygame.constants.QUIT:
                 self.context.is_running = False
 
+            if (
+                self.overlay is not None
+                and event.type == pygame.constants.KEYDOWN
+                and event.key == pygame.constants.K_F3
+            ):
+                self.overlay.toggle()
+
             if event.type == CHANGE_MODE_EVENT:
-                self.set_mode(event.mode)
+                if getattr(event, "pop", False):
+                    self.pop_mode()
+                elif getattr(event, "push", False):
+                    self.push_mode(event.mode)
+                else:
+                    self.set_mode(event.mode)
+
+            if event.type == PRELOAD_MODE_EVENT:
+                self.preload_mode(event.mode)
         pygame.event.pump()
 
     def draw(self) -> None:
+        if self.context.settings.dirty_rects:
+            self._draw_dirty()
+            return
+
         self.context.window.blit(self.context.background, (0, 0))
-        self.mode.draw()
-        self.context.ui_manager.draw_ui(self.context.window)
-        pygame.display.flip()
+        with self.context.profile("mode.draw"):
+            self.mode.draw()
+        with self.context.profile("ui.draw"):
+            self.context.ui_manager.draw_ui(self.context.window)
+
+        if self.overlay is not None:
+            self.overlay.draw(self.context.window)
+
+        if not self.context.settings.headless:
+            pygame.display.flip()
+
+    def _draw_dirty(self) -> None:
+        """Redraw and update only the parts of the window that changed"""
+        window = self.context.window
+
+        dirty_rects = self.context.dirty_rects
+        dirty_rects.extend(self.mode.get_dirty_rects())
+        dirty_rects.extend(self._get_ui_dirty_rects())
+
+        if self.overlay is not None:
+            dirty_rects.extend(self.overlay.get_dirty_rects())
+
+        if not dirty_rects:
+            return
+
+        clip_rect = dirty_rects[0].unionall(dirty_rects[1:]).clip(window.get_rect())
+
+        window.set_clip(clip_rect)
+        window.blit(self.context.background, clip_rect, clip_rect)
+        with self.context.profile("mode.draw"):
+            self.mode.draw()
+        with self.context.profile("ui.draw"):
+            self.context.ui_manager.draw_ui(window)
+        if self.overlay is not None:
+            self.overlay.draw(window)
+        window.set_clip(None)
+
+        if not self.context.settings.headless:
+            pygame.display.update(dirty_rects)
+
+        dirty_rects.clear()
+
+    def _get_ui_dirty_rects(self) -> List[pygame.rect.Rect]:
+        """Get the areas covered by UI elements that changed since last frame
+
+        Most elements show a change by swapping in a new image, so the
+        images of the elements are compared. Some redraw into the image
+        they already have instead, like elements clipped by a scrolling
+        container, so the state those redraws depend on is compared too.
+        Modes that draw into a UI element's image themselves should mark
+        it dirty with GameContext.mark_dirty().
+        """
+        snapshot = [
+            UIElementSnapshot(
+                sprite.blit_data[0],
+                pygame.rect.Rect(sprite.blit_data[1]),
+                _get_ui_element_state(sprite),
+            )
+            for sprite in self.context.ui_manager.get_sprite_group().sprites()
+            if sprite.image is not None and sprite.visible
+        ]
+
+        if len(snapshot) != len(self._ui_snapshot):
+            dirty_rects = [last.rect for last in self._ui_snapshot]
+            dirty_rects.extend(element.rect for element in snapshot)
+        else:
+            dirty_rects = []
+            for element, last in zip(snapshot, self._ui_snapshot):
+                if (
+                    element.image is not last.image
+                    or element.rect != last.rect
+                    or element.state != last.state
+                ):
+                    dirty_rects.append(last.rect)
+                    dirty_rects.append(element.rect)
+
+        self._ui_snapshot = snapshot
+        return dirty_rects
+
+    def filter_events(self) -> None:
+        """Only let events the current mode handles into the event queue
+
+        Modes that do not filter events receive every event.
+        """
+        allowed = self.mode.get_allowed_events()
+
+        if allowed is None:
+            pygame.event.set_allowed(None)
+            return
+
+        required = {CHANGE_MODE_EVENT, PRELOAD_MODE_EVENT, *ALWAYS_ALLOWED_EVENTS}
+        if self.overlay is not None:
+            required.add(pygame.constants.KEYDOWN)
+
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(list(allowed | required))
 
     def quit(self) -> None:
+        self.mode.on_exit()
+
+        profile_output = self.context.settings.profile_output
+        if self.context.profiler is not None and profile_output:
+            self.context.profiler.dump(profile_output)
+
+        if self.replay is not None:
+            self.replay.close()
+
+        if self.context.assets is not None:
+            self.context.assets.close()
         pygame.quit()
+        self.context.fonts.close()
 
     def set_mode(self, mode: Type[GameMode]) -> None:
-        self.context.ui_manager.clear_and_reset()
-        self.mode = mode(self.context)
+        """Replace every mode on the stack with a mode of the given class
+
+        Persistent modes that are replaced are kept, hidden, and resumed
+        the next time the game switches to their class.
+        """
+        while self.mode_stack:
+            old_mode = self.mode_stack.pop()
+            if old_mode is self.mode:
+                self._deactivate(old_mode)
+            self._release(old_mode)
+
+        self.mode = self._get_mode(mode)
+        self.mode_stack.append(self.mode)
+        self._activate(self.mode)
+
+    def push_mode(self, mode: Type[GameMode]) -> None:
+        """Suspend the current mode and switch to a mode of the given class
+
+        The suspended mode keeps its state and UI elements, and resumes
+        when pop_mode() is called. Use this for screens like pause menus.
+        """
+        self._deactivate(self.mode)
+        self.mode = self._get_mode(mode)
+        self.mode_stack.append(self.mode)
+        self._activate(self.mode)
+
+    def pop_mode(self) -> None:
+        """Leave the current mode and resume the one suspended below it"""
+        if len(self.mode_stack) < 2:
+            raise RuntimeError("There is no suspended mode to return to")
+
+        old_mode = self.mode_stack.pop()
+        self._deactivate(old_mode)
+        self._release(old_mode)
+
+        self.mode = self.mode_stack[-1]
+        self._activate(self.mode)
+
+    def preload_mode(self, mode: Type[GameMode]) -> None:
+        """Construct a mode ahead of time so switching to it is instant
+
+        The mode's UI elements are hidden until it is switched to. Modes
+        that are already preloaded or suspended are left as they are.
+        """
+        if mode in self._preloaded_modes or mode in self._suspended_modes:
+            return
+
+        if any(type(active) is mode for active in self.mode_stack):
+            return
+
+        preloaded = self._create_mode(mode)
+        self._set_ui_visible(preloaded, False)
+        self._preloaded_modes[mode] = preloaded
+
+    def _get_mode(self, mode: Type[GameMode]) -> GameMode:
+        """Get a preloaded or suspended mode, or construct a new one"""
+        existing = self._preloaded_modes.pop(mode, None)
+
+        if existing is None:
+            existing = self._suspended_modes.pop(mode, None)
+
+        if existing is not None:
+            return existing
+
+        return self._create_mode(mode)
+
+    def _create_mode(self, mode: Type[GameMode]) -> GameMode:
+        """Construct a mode and record the UI elements it creates"""
+        root_container = self.context.ui_manager.get_root_container()
+        existing_elements = set(root_container.elements)
+
+        new_mode = mode(self.context)
+        new_mode.ui_elements = [
+            element
+            for element in root_container.elements
+            if element not in existing_elements
+        ]
+
+        return new_mode
+
+    def _activate(self, mode: GameMode) -> None:
+        """Make a mode the active mode"""
+        self._set_ui_visible(mode, True)
+        self.filter_events()
+        self.accumulator = 0.0
+        self.context.interpolation = 1.0
+        mode.on_enter()
+        self.context.mark_dirty()
+
+    def _deactivate(self, mode: GameMode) -> None:
+        """Stop a mode from being the active mode"""
+        mode.on_exit()
+        self._set_ui_visible(mode, False)
+
+    def _release(self, mode: GameMode) -> None:
+        """Keep a mode that has left the stack if it is persistent"""
+        if mode.persistent:
+            self._suspended_modes[type(mode)] = mode
+            return
+
+        for element in mode.ui_elements:
+            element.kill()
+        mode.ui_elements.clear()
+
+    @staticmethod
+    def _set_ui_visible(mode: GameMode, visible: bool) -> None:
+        for element in mode.ui_elements:
+            if visible:
+                element.show()
+            else:
+                element.hide()
@@ -1,27 +1,125 @@
 from abc import ABC, abstractmethod
+from typing import ClassVar, Dict, FrozenSet, List, Optional, Type
 
 import pygame.event
+import pygame.rect
+from pygame_gui.core import UIElement
 
 from .context import GameContext
+from .events import collect_handlers
 
 CHANGE_MODE_EVENT = pygame.event.custom_type()
+"""Switch modes. The event's mode attribute is the GameMode class to
+switch to. Set push=True to suspend the current mode and return to it
+later, or pop=True (with no mode) to return to the suspended mode."""
+
+PRELOAD_MODE_EVENT = pygame.event.custom_type()
+"""Construct the GameMode class given by the event's mode attribute ahead
+of time, so that switching to it later is instant"""
+
+_mode_classes: Dict[str, Type["GameMode"]] = {}
+"""Every GameMode subclass, by the name get_mode_name() gives it"""
+
+
+def get_mode_name(mode_class: type) -> str:
+    """Get the name a GameMode class is registered under"""
+    return f"{mode_class.__module__}:{mode_class.__qualname__}"
+
+
+def get_mode_class(name: str) -> Optional[Type["GameMode"]]:
+    """Find a GameMode subclass by the name get_mode_name() gives it
+
+    Only classes that have already been defined are found, so looking up
+    a name never imports anything.
+    """
+    return _mode_classes.get(name)
 
 
 class GameMode(ABC):
-    __slots__ = "context"
+    """A screen of the game, such as a menu or the card table
+
+    Modes handle events by decorating methods with @handles(event_type).
+    The default handle_event looks handlers up in a table built once per
+    class, and modes may still override handle_event instead.
+
+    A mode may be constructed well before it is shown, and may be
+    suspended and resumed many times, so drawing to shared state like the
+    background belongs in on_enter rather than __init__.
+    """
+
+    __slots__ = "context", "ui_elements"
+
+    filter_events: ClassVar[bool] = False
+    """Only let the event types this mode has handlers for into the event
+    queue while it is active. Modes with pygame_gui elements should leave
+    this off, since the UI needs mouse and keyboard events."""
+
+    persistent: ClassVar[bool] = False
+    """Keep this mode, along with its UI elements and caches, after the game
+    switches away from it, and resume it the next time it is switched to
+    instead of constructing a new one"""
+
+    _event_handlers: ClassVar[Dict[int, str]] = {}
+
+    def __init_subclass__(cls, **kwargs: object) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._event_handlers = collect_handlers(cls)
+        _mode_classes[get_mode_name(cls)] = cls
 
     def __init__(self, context: GameContext) -> None:
         super().__init__()
         self.context: GameContext = context
+        # The pygame_gui elements created by this mode, filled in by the game
+        self.ui_elements: List[UIElement] = []
+
+    def on_enter(self) -> None:
+        """Called each time this mode becomes the active mode"""
+
+    def on_exit(self) -> None:
+        """Called each time this mode stops being the active mode"""
 
     @abstractmethod
     def update(self, elapsed_time: float) -> None:
         raise NotImplementedError
 
-    @abstractmethod
     def handle_event(self, event: pygame.event.Event) -> None:
-        raise NotImplementedError
+        """Pass an event to the handler registered for its type, if any"""
+        handler_name = self._event_handlers.get(event.type)
+
+        if handler_name is not None:
+            getattr(self, handler_name)(event)
+
+    def get_allowed_events(self) -> Optional[FrozenSet[int]]:
+        """Get the event types this mode needs in the event queue
+
+        Returns
+        -------
+        FrozenSet[int] or None
+            The event types, or None if all events should be allowed
+        """
+        if not self.filter_events:
+            return None
+
+        return frozenset(self._event_handlers)
 
     @abstractmethod
     def draw(self) -> None:
         raise NotImplementedError
+
+    def get_replay_state(self) -> bytes:
+        """Describe the state a replay of this mode must reproduce
+
+        Replays compare a hash of this at checkpoints, so it should cover
+        the game logic the player's input affects, but not anything that
+        depends on timing outside the game, like background loading.
+        """
+        return b""
+
+    def get_dirty_rects(self) -> List[pygame.rect.Rect]:
+        """Get the areas of the window that changed since the last draw
+
+        Only used when GameSettings.dirty_rects is enabled. Modes that
+        animate should report the areas they will draw over. Returning
+        an empty list lets the game skip drawing while nothing changes.
+        """
+        return []
@@ -0,0 +1,493 @@
+"""
+Recording and playing back sessions
+
+A ReplayRecorder logs the events handled each frame, along with how much
+time the frame advanced the game by, to a gzip-compressed stream. Every
+few frames it also stores a hash of the game state. A ReplayPlayer feeds
+the recorded events and frame times back into a game in place of real
+input, either at the speed they were recorded or as fast as the game can
+run, and checks that the game reaches the same state hashes.
+
+Replays are only exact when the game is deterministic. The seed of
+GameContext.rng is stored in the recording, so modes should draw
+their randomness from it, and they describe the state a replay must
+reproduce with GameMode.get_replay_state().
+
+Event attributes are stored when they are plain data. GameMode classes,
+like the mode of CHANGE_MODE_EVENT, are stored by name, and pygame_gui
+elements by their object ID. Other attributes, such as window objects,
+are dropped.
+
+Replay files are shared in bug reports, so they are treated as untrusted.
+Frames are plain JSON, and mode names are only looked up among the
+GameMode subclasses that are already defined, never imported. A file
+that cannot be decoded raises ReplayError.
+
+Replay files look like this, all inside the gzip stream:
+
+    header  "<4sHQIHH"  magic, version, seed, update rate, window size
+    frame   "<I" size, then a UTF-8 JSON array of the frame time, the
+            events and the state hash (or null)
+    ...
+"""
+import gzip
+import hashlib
+import json
+import pathlib
+import struct
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import pygame
+import pygame.event
+from pygame_gui.core import UIElement
+
+from .mode import get_mode_class, get_mode_name
+
+if TYPE_CHECKING:
+    from .game import Game
+
+HEADER = struct.Struct("<4sHQIHH")
+FRAME_SIZE = struct.Struct("<I")
+
+MAGIC = b"PRRP"
+VERSION = 2
+
+MAX_FRAME_SIZE = 1 << 20
+"""The largest frame a replay may contain, in bytes"""
+
+_PLAIN_TYPES = (type(None), bool, int, float, str)
+"""Checked in order, so that bools stay bools"""
+
+EncodedEvent = Tuple[int, Dict[str, Any], Dict[str, str], Dict[str, str]]
+"""An event's type, plain attributes, class attributes and UI element
+attributes"""
+
+
+class ReplayError(Exception):
+    """Raised when a replay cannot be played back exactly"""
+
+
+class ReplayHeader(NamedTuple):
+    """The settings a replay was recorded with"""
+
+    version: int
+    seed: int
+    update_rate: int
+    """The fixed updates per second, or 0 if the game used variable steps"""
+    window_size: Tuple[int, int]
+
+
+class ReplayFrame(NamedTuple):
+    """The input to a single frame of a replay"""
+
+    frame_time: float
+    events: List[EncodedEvent]
+    state_hash: Optional[int]
+
+
+def get_state_hash(game: "Game") -> int:
+    """Hash the state a replay must reproduce
+
+    Covers the classes of the modes on the stack and whatever the active
+    mode reports from get_replay_state().
+    """
+    state_hash = hashlib.blake2b(digest_size=8)
+
+    for mode in game.mode_stack:
+        state_hash.update(type(mode).__qualname__.encode("utf-8"))
+        state_hash.update(b"\0")
+
+    state_hash.update(game.mode.get_replay_state())
+    return int.from_bytes(state_hash.digest(), "little")
+
+
+_NOT_PLAIN = object()
+
+
+def _to_plain(value: Any) -> Any:
+    """Convert a value to types JSON can store, or return _NOT_PLAIN
+
+    Subclasses of plain types, like the event type constants of
+    pygame_gui, are converted to their base type.
+    """
+    if isinstance(value, (tuple, list)):
+        items = [_to_plain(item) for item in value]
+        if any(item is _NOT_PLAIN for item in items):
+            return _NOT_PLAIN
+        return tuple(items)
+
+    for plain_type in _PLAIN_TYPES:
+        if isinstance(value, plain_type):
+            return value if type(value) is plain_type else plain_type(value)
+
+    return _NOT_PLAIN
+
+
+def encode_event(event: pygame.event.Event) -> EncodedEvent:
+    """Convert an event to data that can be stored as JSON"""
+    plain: Dict[str, Any] = {}
+    classes: Dict[str, str] = {}
+    elements: Dict[str, str] = {}
+
+    for name, value in event.dict.items():
+        if isinstance(value, type):
+            if get_mode_class(get_mode_name(value)) is value:
+                classes[name] = get_mode_name(value)
+        elif isinstance(value, UIElement):
+            elements[name] = value.get_most_specific_combined_id()
+        else:
+            value = _to_plain(value)
+            if value is not _NOT_PLAIN:
+                plain[name] = value
+
+    return event.type, plain, classes, elements
+
+
+def _resolve_class(name: str) -> type:
+    mode_class = get_mode_class(name)
+
+    if mode_class is None:
+        raise ReplayError(f"Cannot find the game mode {name} to replay")
+
+    return mode_class
+
+
+def _to_tuples(value: Any) -> Any:
+    """Turn the lists JSON gives back into the tuples they were stored as"""
+    if isinstance(value, list):
+        return tuple(_to_tuples(item) for item in value)
+    return value
+
+
+def _is_string_dict(value: Any) -> bool:
+    return isinstance(value, dict) and all(isinstance(key, str) for key in value)
+
+
+def encode_frame(frame: ReplayFrame) -> bytes:
+    """Convert a frame to the JSON stored in replay files"""
+    return json.dumps(list(frame), separators=(",", ":")).encode("utf-8")
+
+
+def decode_frame(data: bytes) -> ReplayFrame:
+    """Read a frame stored by encode_frame()
+
+    Raises
+    ------
+    ReplayError
+        If the data is not a valid frame
+    """
+    try:
+        frame_time, raw_events, state_hash = json.loads(data.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError, TypeError, RecursionError) as err:
+        raise ReplayError("Replay frame is corrupt") from err
+
+    if (
+        not isinstance(frame_time, (int, float))
+        or isinstance(frame_time, bool)
+        or not isinstance(raw_events, list)
+        or not (state_hash is None or type(state_hash) is int)
+    ):
+        raise ReplayError("Replay frame is corrupt")
+
+    events: List[EncodedEvent] = []
+    for raw_event in raw_events:
+        if (
+            not isinstance(raw_event, list)
+            or len(raw_event) != 4
+            or type(raw_event[0]) is not int
+            or not all(_is_string_dict(part) for part in raw_event[1:])
+            or not all(isinstance(v, str) for v in raw_event[2].values())
+            or not all(isinstance(v, str) for v in raw_event[3].values())
+        ):
+            raise ReplayError("Replay frame contains a corrupt event")
+
+        event_type, plain, classes, elements = raw_event
+        plain = {name: _to_tuples(value) for name, value in plain.items()}
+        events.append((event_type, plain, classes, elements))
+
+    return ReplayFrame(float(frame_time), events, state_hash)
+
+
+class Replay(ABC):
+    """Records or replaces the events handled by a game each frame"""
+
+    @abstractmethod
+    def filter_events(
+        self, game: "Game", events: List[pygame.event.Event]
+    ) -> List[pygame.event.Event]:
+        """Get the events the game should handle this frame
+
+        Parameters
+        ----------
+        game : Game
+            The game handling the events
+        events : List[pygame.event.Event]
+            The events taken from pygame's event queue
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def end_frame(self, game: "Game", frame_time: float) -> None:
+        """Called once a frame has been updated and drawn"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release any files held by the replay"""
+
+
+class ReplayRecorder(Replay):
+    """Records the events and frame times of a game
+
+    Set Game.replay to a recorder to start recording. The file is closed
+    by Game.quit().
+
+    Parameters
+    ----------
+    filepath : str or pathlib.Path
+        The replay file to write
+    game : Game
+        The game being recorded
+    checkpoint_interval : int
+        The number of frames between state hashes
+    """
+
+    __slots__ = "checkpoint_interval", "frame_count", "_file", "_events"
+
+    def __init__(
+        self,
+        filepath: Union[str, pathlib.Path],
+        game: "Game",
+        checkpoint_interval: int = 60,
+    ) -> None:
+        self.checkpoint_interval: int = checkpoint_interval
+        self.frame_count: int = 0
+        self._events: List[EncodedEvent] = []
+        self._file: IO[bytes] = gzip.open(filepath, "wb", compresslevel=6)
+
+        settings = game.context.settings
+        self._file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                game.context.seed,
+                settings.update_rate or 0,
+                *settings.window_size,
+            )
+        )
+
+    def filter_events(
+        self, game: "Game", events: List[pygame.event.Event]
+    ) -> List[pygame.event.Event]:
+        self._events.extend(encode_event(event) for event in events)
+        return events
+
+    def end_frame(self, game: "Game", frame_time: float) -> None:
+        state_hash: Optional[int] = None
+        if self.frame_count % self.checkpoint_interval == 0:
+            state_hash = get_state_hash(game)
+
+        data = encode_frame(ReplayFrame(frame_time, self._events, state_hash))
+        self._file.write(FRAME_SIZE.pack(len(data)))
+        self._file.write(data)
+
+        self._events = []
+        self.frame_count += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ReplayPlayer(Replay):
+    """Plays a recorded replay back into a game
+
+    The game must be created with the seed and settings in the replay's
+    header, and start in the same mode as the recorded game.
+
+    Parameters
+    ----------
+    filepath : str or pathlib.Path
+        The replay file to read
+    """
+
+    __slots__ = "filepath", "frame_count", "_header", "_frame"
+
+    def __init__(self, filepath: Union[str, pathlib.Path]) -> None:
+        self.filepath: pathlib.Path = pathlib.Path(filepath)
+        self.frame_count: int = 0
+        self._header: Optional[ReplayHeader] = None
+        self._frame: Optional[ReplayFrame] = None
+
+    @property
+    def header(self) -> ReplayHeader:
+        """The settings the replay was recorded with"""
+        if self._header is None:
+            with gzip.open(self.filepath, "rb") as replay_file:
+                self._header = self._read_header(replay_file)
+
+        return self._header
+
+    def play(self, game: "Game", realtime: bool = False) -> int:
+        """Play the replay until it ends or the game quits
+
+        Parameters
+        ----------
+        game : Game
+            The game to play the replay in
+        realtime : bool
+            Wait between frames so the replay runs at the speed it was
+            recorded at. Otherwise frames run back to back.
+
+        Returns
+        -------
+        int
+            The number of frames played
+
+        Raises
+        ------
+        ReplayError
+            If the game does not match the replay's settings, or reaches
+            a different state than the recorded game
+        """
+        header = self.header
+        settings = game.context.settings
+
+        if game.context.seed != header.seed:
+            raise ReplayError("The game's seed does not match the replay")
+
+        if (settings.update_rate or 0) != header.update_rate:
+            raise ReplayError("The game's update rate does not match the replay")
+
+        game.replay = self
+        game.context.is_running = True
+        self.frame_count = 0
+        next_frame = time.perf_counter()
+
+        try:
+            for frame in self._read_frames():
+                self._frame = frame
+
+                if header.update_rate:
+                    game.advance(frame.frame_time)
+                else:
+                    game.step(frame.frame_time)
+
+                if not game.context.is_running:
+                    break
+
+                if realtime:
+                    next_frame += frame.frame_time
+                    time.sleep(max(0.0, next_frame - time.perf_counter()))
+        finally:
+            game.replay = None
+            self._frame = None
+
+        return self.frame_count
+
+    def filter_events(
+        self, game: "Game", events: List[pygame.event.Event]
+    ) -> List[pygame.event.Event]:
+        # events posted by the game itself are in the recording too, so
+        # the live queue is dropped rather than merged
+        if self._frame is None:
+            return events
+
+        return [self._decode_event(game, event) for event in self._frame.events]
+
+    def end_frame(self, game: "Game", frame_time: float) -> None:
+        if self._frame is None:
+            return
+
+        expected = self._frame.state_hash
+        if expected is not None and get_state_hash(game) != expected:
+            raise ReplayError(
+                f"Game state differs from the recording at frame {self.frame_count}"
+            )
+
+        self.frame_count += 1
+
+    def _decode_event(self, game: "Game", encoded: EncodedEvent) -> pygame.event.Event:
+        event_type, plain, classes, elements = encoded
+        attributes = dict(plain)
+
+        for name, mode_name in classes.items():
+            attributes[name] = _resolve_class(mode_name)
+
+        for name, object_id in elements.items():
+            attributes[name] = self._find_element(game, object_id)
+
+        try:
+            return pygame.event.Event(event_type, attributes)
+        except (ValueError, TypeError) as err:
+            raise ReplayError("Replay contains an invalid event") from err
+
+    @staticmethod
+    def _find_element(game: "Game", object_id: str) -> Optional[UIElement]:
+        """Find the UI element an event refers to, preferring visible ones"""
+        found: Optional[UIElement] = None
+
+        for sprite in game.context.ui_manager.get_sprite_group().sprites():
+            if (
+                isinstance(sprite, UIElement)
+                and sprite.get_most_specific_combined_id() == object_id
+            ):
+                if sprite.visible:
+                    return sprite
+                found = found or sprite
+
+        return found
+
+    def _read_frames(self) -> Iterator[ReplayFrame]:
+        with gzip.open(self.filepath, "rb") as replay_file:
+            self._header = self._read_header(replay_file)
+
+            while True:
+                try:
+                    size_data = replay_file.read(FRAME_SIZE.size)
+                    if len(size_data) < FRAME_SIZE.size:
+                        return
+
+                    (size,) = FRAME_SIZE.unpack(size_data)
+                    if size > MAX_FRAME_SIZE:
+                        raise ReplayError("Replay frame is too large")
+
+                    data = replay_file.read(size)
+                    if len(data) < size:
+                        return
+                except EOFError:
+                    # the recording was cut short, e.g. by a crash
+                    return
+                except (OSError, zlib.error) as err:
+                    raise ReplayError("Replay file is corrupt") from err
+
+                yield decode_frame(data)
+
+    @staticmethod
+    def _read_header(replay_file: IO[bytes]) -> ReplayHeader:
+        try:
+            data = replay_file.read(HEADER.size)
+        except (OSError, EOFError, zlib.error) as err:
+            raise ReplayError("Not a replay file") from err
+
+        if len(data) < HEADER.size:
+            raise ReplayError("Replay file is too short")
+
+        magic, version, seed, update_rate, width, height = HEADER.unpack(data)
+
+        if magic != MAGIC or version != VERSION:
+            raise ReplayError("Not a replay file, or recorded by another version")
+
+        return ReplayHeader(version, seed, update_rate, (width, height))
@@ -0,0 +1,652 @@
+"""
+Data-driven decks of decision cards
+
+Cards are loaded from JSON files into a Deck, which indexes them by tag
+and by the values their conditions read. A run keeps a DrawIndex of
+which cards are eligible, and after each swipe it only checks the cards
+whose conditions read a value that changed, so drawing the next card
+does not require checking every card.
+
+Deck files look like this:
+
+    {
+        "cards": [
+            {
+                "id": "enemy-at-the-gates",
+                "prompt": "Will you help me eliminate the enemy?",
+                "accept": "Of course",
+                "reject": "Never",
+                "image": "card-bg",
+                "tags": ["war"],
+                "conditions": ["met_general", "gold >= 10"],
+                "on_accept": ["at_war", "gold -= 10"],
+                "on_reject": ["!met_general"],
+                "weight": 1.0
+            }
+        ]
+    }
+
+Only "id" and "prompt" are required. A card may only be drawn while all
+of its conditions hold, and its on_accept or on_reject effects are
+applied to the game state when the player makes that choice. See
+pyreignslib.expressions for the syntax of conditions and effects. Cards
+tagged "ending" end the run once the player responds to them.
+"""
+import bisect
+import itertools
+import json
+import pathlib
+import random
+import sys
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from .expressions import EffectFunction, ExpressionCompiler, ExpressionFunction
+from .state import Condition, ConditionTable, GameState, SymbolTable
+
+ENDING_TAG = "ending"
+"""Tag marking cards that end the run after the player responds"""
+
+NO_CARDS_ENDING = "no_cards"
+"""Ending reached when no card in the deck can be drawn"""
+
+DRAW_BLOCK_SIZE = 256
+"""Number of cards in each block of a DrawIndex's weights"""
+
+
+class CardData(NamedTuple):
+    """The content and rules of a single card"""
+
+    card_id: str
+    prompt: str
+    accept_text: str = "yes"
+    reject_text: str = "no"
+    image: str = "card-bg"
+    tags: Tuple[str, ...] = ()
+    conditions: Tuple[str, ...] = ()
+    accept_effects: Tuple[str, ...] = ()
+    reject_effects: Tuple[str, ...] = ()
+    weight: float = 1.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CardData":
+        """Create a card from its entry in a deck file"""
+        try:
+            card_id = str(data["id"])
+            prompt = str(data["prompt"])
+        except KeyError as err:
+            raise ValueError(f"Card is missing required field {err}: {data}") from err
+
+        return cls(
+            card_id=sys.intern(card_id),
+            prompt=prompt,
+            accept_text=str(data.get("accept", "yes")),
+            reject_text=str(data.get("reject", "no")),
+            image=sys.intern(str(data.get("image", "card-bg"))),
+            tags=_intern_all(data.get("tags", ())),
+            conditions=_intern_all(data.get("conditions", ())),
+            accept_effects=_intern_all(data.get("on_accept", ())),
+            reject_effects=_intern_all(data.get("on_reject", ())),
+            weight=float(data.get("weight", 1.0)),
+        )
+
+
+def _intern_all(values: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(sys.intern(str(value)) for value in values)
+
+
+class Deck:
+    """An indexed collection of cards
+
+    Conditions and effects are compiled once, when the deck is created.
+    Cards without conditions are kept in a list with cumulative weights
+    so a weighted draw from them is a binary search. The conditions of
+    every other card are stored in a ConditionTable, and indexed by the
+    symbols they read, so that a DrawIndex can check only the cards a
+    change to the state may affect. Only conditions that cannot be
+    vectorized are evaluated card by card, and only for cards that passed
+    the vectorized checks.
+
+    Parameters
+    ----------
+    cards : Sequence[CardData]
+        The cards in the deck
+    symbols : SymbolTable, optional
+        The table used to intern the names in conditions and effects
+    """
+
+    __slots__ = (
+        "cards",
+        "symbols",
+        "_index_by_id",
+        "_by_tag",
+        "_effects",
+        "_unconditional",
+        "_unconditional_weights",
+        "_conditional",
+        "_conditional_weights",
+        "_conditions",
+        "_residuals",
+        "_reader_offsets",
+        "_readers",
+    )
+
+    def __init__(
+        self, cards: Sequence[CardData], symbols: Optional[SymbolTable] = None
+    ) -> None:
+        self.cards: Tuple[CardData, ...] = tuple(cards)
+        self.symbols: SymbolTable = symbols if symbols is not None else SymbolTable()
+        self._index_by_id: Dict[str, int] = {}
+        self._by_tag: Dict[str, List[int]] = {}
+        self._effects: List[
+            Tuple[Tuple[EffectFunction, ...], Tuple[EffectFunction, ...]]
+        ] = []
+        self._unconditional: List[int] = []
+        self._residuals: Dict[int, Tuple[ExpressionFunction, ...]] = {}
+
+        compiler = ExpressionCompiler(self.symbols)
+        conditional: List[int] = []
+        conditions: List[List[Condition]] = []
+        readers: Dict[int, List[int]] = {}
+
+        for index, card in enumerate(self.cards):
+            if card.card_id in self._index_by_id:
+                raise ValueError(f"Duplicate card ID: {card.card_id}")
+            self._index_by_id[card.card_id] = index
+
+            for tag in card.tags:
+                self._by_tag.setdefault(tag, []).append(index)
+
+            self._effects.append(
+                (
+                    tuple(compiler.compile_effect(e) for e in card.accept_effects),
+                    tuple(compiler.compile_effect(e) for e in card.reject_effects),
+                )
+            )
+
+            if not card.conditions:
+                self._unconditional.append(index)
+                continue
+
+            position = len(conditional)
+            clauses: List[Condition] = []
+            residuals: List[ExpressionFunction] = []
+            symbols = set()
+            for source in card.conditions:
+                compiled = compiler.compile_condition(source)
+                clauses.extend(compiled.clauses)
+                symbols.update(compiled.symbols)
+                if compiled.residual is not None:
+                    residuals.append(compiled.residual)
+
+            if residuals:
+                self._residuals[position] = tuple(residuals)
+
+            for symbol in symbols:
+                readers.setdefault(symbol, []).append(position)
+
+            conditional.append(index)
+            conditions.append(clauses)
+
+        self._unconditional_weights: List[float] = list(
+            itertools.accumulate(self.cards[i].weight for i in self._unconditional)
+        )
+        self._conditional: np.ndarray = np.array(conditional, dtype=np.intp)
+        self._conditional_weights: np.ndarray = np.array(
+            [self.cards[i].weight for i in conditional], dtype=np.float64
+        )
+        self._conditions: ConditionTable = ConditionTable(conditions)
+
+        # the positions of the conditional cards that read each symbol, in
+        # one array, with the range of each symbol given by its offsets
+        self._reader_offsets: np.ndarray = np.zeros(
+            len(self.symbols) + 1, dtype=np.intp
+        )
+        np.cumsum(
+            [len(readers.get(s, ())) for s in range(len(self.symbols))],
+            out=self._reader_offsets[1:],
+        )
+        self._readers: np.ndarray = np.array(
+            [p for s in range(len(self.symbols)) for p in readers.get(s, ())],
+            dtype=np.intp,
+        )
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Compiled conditions and effects are closures, which cannot be
+        # pickled, so decks are recompiled from their cards when unpickled
+        return Deck, (self.cards, self.symbols)
+
+    @classmethod
+    def load(cls, filepath: Union[str, pathlib.Path]) -> "Deck":
+        """Load a deck from a JSON file"""
+        with open(filepath, "r", encoding="utf-8") as deck_file:
+            data = json.load(deck_file)
+
+        return cls.from_dict(data)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Deck":
+        """Create a deck from the contents of a deck file"""
+        return cls([CardData.from_dict(entry) for entry in data.get("cards", [])])
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __getitem__(self, index: int) -> CardData:
+        return self.cards[index]
+
+    def index_of(self, card_id: str) -> int:
+        """Get the index of the card with the given ID"""
+        return self._index_by_id[card_id]
+
+    def get(self, card_id: str) -> CardData:
+        """Get the card with the given ID"""
+        return self.cards[self._index_by_id[card_id]]
+
+    def with_tag(self, tag: str) -> Sequence[int]:
+        """Get the indices of all cards with the given tag"""
+        return self._by_tag.get(tag, ())
+
+    def get_effects(self, index: int, accept: bool) -> Tuple[EffectFunction, ...]:
+        """Get the compiled effects of accepting or rejecting a card"""
+        return self._effects[index][0 if accept else 1]
+
+    def create_state(self) -> GameState:
+        """Create an empty game state for a run through this deck"""
+        return GameState(self.symbols)
+
+    def evaluate_conditions(self, state: GameState) -> np.ndarray:
+        """Check the conditions of every card against the state at once
+
+        Returns
+        -------
+        np.ndarray
+            A boolean array with one entry per card in the deck
+        """
+        eligible = np.ones(len(self.cards), dtype=bool)
+        eligible[self._conditional] = self._evaluate_conditional(state)
+        return eligible
+
+    def create_index(self, state: GameState) -> "DrawIndex":
+        """Create an index of the cards that may be drawn in a run
+
+        This checks the conditions of every card once. Use the index's
+        draw() for each draw of the run, so later draws only check the
+        cards whose conditions read a value that changed.
+        """
+        return DrawIndex(self, state)
+
+    def _evaluate_conditional(self, state: GameState) -> np.ndarray:
+        """Check the conditions of the cards that have them"""
+        eligible = self._conditions.evaluate(state)
+        values = state.values
+
+        for position, residuals in self._residuals.items():
+            if eligible[position]:
+                eligible[position] = all(residual(values) for residual in residuals)
+
+        return eligible
+
+    def _evaluate_positions(
+        self, state: GameState, positions: np.ndarray
+    ) -> np.ndarray:
+        """Check the conditions of some of the cards that have them
+
+        Parameters
+        ----------
+        state : GameState
+            The state to check the conditions against
+        positions : np.ndarray
+            The positions of the cards among the conditional cards
+
+        Returns
+        -------
+        np.ndarray
+            A boolean array with one entry per position
+        """
+        eligible = self._conditions.evaluate_cards(state, positions)
+        values = state.values
+
+        if self._residuals:
+            for i in np.flatnonzero(eligible).tolist():
+                residuals = self._residuals.get(int(positions[i]))
+                if residuals is not None:
+                    eligible[i] = all(residual(values) for residual in residuals)
+
+        return eligible
+
+    def _get_readers(self, symbols: np.ndarray) -> np.ndarray:
+        """Get the positions of the conditional cards that read any symbol"""
+        symbols = symbols[symbols < len(self._reader_offsets) - 1]
+        starts = self._reader_offsets[symbols]
+        counts = self._reader_offsets[symbols + 1] - starts
+        firsts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return np.unique(self._readers[firsts + np.arange(int(counts.sum()))])
+
+    def eligible(self, state: GameState) -> List[int]:
+        """Get the indices of all cards that may be drawn"""
+        conditional = self._conditional[self._evaluate_conditional(state)]
+        return self._unconditional + conditional.tolist()
+
+    def draw(
+        self,
+        state: GameState,
+        rng: random.Random,
+        exclude: Optional[int] = None,
+    ) -> Optional[int]:
+        """Pick a random eligible card, weighted by card weight
+
+        This checks the conditions of every card. Runs should draw from a
+        DrawIndex instead, see create_index().
+
+        Parameters
+        ----------
+        state : GameState
+            The current state of the run
+        rng : random.Random
+            The source of randomness
+        exclude : int, optional
+            The index of a card that should not be drawn, such as the
+            card the player just responded to
+
+        Returns
+        -------
+        int or None
+            The index of the drawn card, or None if no card is eligible
+        """
+        return DrawIndex(self, state).draw(state, rng, exclude)
+
+    def _get_unconditional_span(self, index: Optional[int]) -> Tuple[float, float]:
+        """Get where a card's weight starts and ends among unconditional cards
+
+        Cards that have conditions have an empty span at the end.
+        """
+        end = self._unconditional_weights[-1] if self._unconditional_weights else 0.0
+
+        if index is None:
+            return end, end
+
+        position = bisect.bisect_left(self._unconditional, index)
+        if (
+            position < len(self._unconditional)
+            and self._unconditional[position] == index
+        ):
+            start = self._unconditional_weights[position - 1] if position else 0.0
+            return start, self._unconditional_weights[position]
+
+        return end, end
+
+    def _get_conditional_position(self, index: Optional[int]) -> int:
+        """Get the position of a card among the conditional cards, or -1"""
+        if index is None:
+            return -1
+
+        position = int(np.searchsorted(self._conditional, index))
+        if position < len(self._conditional) and self._conditional[position] == index:
+            return position
+
+        return -1
+
+
+class DrawIndex:
+    """Which cards of a deck may be drawn, kept up to date with a state
+
+    The index remembers the state values it last saw. Before each draw
+    it finds the values that changed since then and checks only the
+    conditions of the cards that read them, so a swipe whose effects
+    touch a few values costs in proportion to the cards that read those
+    values, not to the size of the deck.
+
+    The weights of the eligible cards are kept in blocks of
+    DRAW_BLOCK_SIZE cards with a running total for each block, so a
+    weighted draw searches the block totals and then a single block.
+
+    Parameters
+    ----------
+    deck : Deck
+        The deck to draw from
+    state : GameState
+        The state to check conditions against. It may be changed in any
+        way between draws.
+    """
+
+    __slots__ = "deck", "eligible", "_values", "_weights", "_block_weights"
+
+    def __init__(self, deck: Deck, state: GameState) -> None:
+        self.deck: Deck = deck
+        self.eligible: np.ndarray = deck._evaluate_conditional(state)
+        """Whether each conditional card may be drawn"""
+        self._values: np.ndarray = state.values.copy()
+
+        # padded to a whole number of blocks with zero weights
+        blocks = -(-len(self.eligible) // DRAW_BLOCK_SIZE)
+        self._weights: np.ndarray = np.zeros(blocks * DRAW_BLOCK_SIZE, dtype=np.float64)
+        self._weights[: len(self.eligible)] = np.where(
+            self.eligible, deck._conditional_weights, 0.0
+        )
+        self._block_weights: np.ndarray = self._weights.reshape(
+            blocks, DRAW_BLOCK_SIZE
+        ).sum(axis=1)
+
+    def copy(self) -> "DrawIndex":
+        """Create an independent copy of this index"""
+        index = DrawIndex.__new__(DrawIndex)
+        index.deck = self.deck
+        index.eligible = self.eligible.copy()
+        index._values = self._values.copy()
+        index._weights = self._weights.copy()
+        index._block_weights = self._block_weights.copy()
+        return index
+
+    def update(self, state: GameState) -> None:
+        """Check the cards whose conditions read values that changed"""
+        values = state.values
+
+        if len(values) != len(self._values):
+            # the state grew, and new values start at zero
+            grown = np.zeros(len(values), dtype=np.float64)
+            grown[: min(len(values), len(self._values))] = self._values[: len(values)]
+            self._values = grown
+
+        changed = np.flatnonzero(values != self._values)
+        if not len(changed):
+            return
+
+        self._values[changed] = values[changed]
+        positions = self.deck._get_readers(changed)
+        if not len(positions):
+            return
+
+        eligible = self.deck._evaluate_positions(state, positions)
+        self.eligible[positions] = eligible
+        self._weights[positions] = np.where(
+            eligible, self.deck._conditional_weights[positions], 0.0
+        )
+
+        # block totals are summed again rather than adjusted, so rounding
+        # errors cannot build up over a run
+        blocks = np.unique(positions // DRAW_BLOCK_SIZE)
+        self._block_weights[blocks] = self._weights.reshape(-1, DRAW_BLOCK_SIZE)[
+            blocks
+        ].sum(axis=1)
+
+    def draw(
+        self,
+        state: GameState,
+        rng: random.Random,
+        exclude: Optional[int] = None,
+    ) -> Optional[int]:
+        """Pick a random eligible card, weighted by card weight
+
+        Parameters
+        ----------
+        state : GameState
+            The current state of the run
+        rng : random.Random
+            The source of randomness
+        exclude : int, optional
+            The index of a card that should not be drawn, such as the
+            card the player just responded to
+
+        Returns
+        -------
+        int or None
+            The index of the drawn card, or None if no card is eligible
+        """
+        self.update(state)
+        deck = self.deck
+
+        # The excluded card's weight is left out, so it is never drawn and
+        # the other cards keep their relative odds
+        skip_start, skip_end = deck._get_unconditional_span(exclude)
+        unconditional_total = (
+            deck._unconditional_weights[-1] if deck._unconditional_weights else 0.0
+        )
+
+        excluded = deck._get_conditional_position(exclude)
+        block_weights = self._block_weights
+        if excluded >= 0 and self._weights[excluded]:
+            block_weights = block_weights.copy()
+            block_weights[excluded // DRAW_BLOCK_SIZE] -= self._weights[excluded]
+
+        block_totals = np.cumsum(block_weights)
+        conditional_total = float(block_totals[-1]) if len(block_totals) else 0.0
+        total = unconditional_total + conditional_total - (skip_end - skip_start)
+
+        if total <= 0:
+            return None
+
+        target = rng.random() * total
+        if target >= skip_start:
+            target = skip_end + (target - skip_start)
+
+        if target < unconditional_total:
+            position = bisect.bisect_right(deck._unconditional_weights, target)
+            return deck._unconditional[min(position, len(deck._unconditional) - 1)]
+
+        target -= unconditional_total
+        block = _search_weights(block_totals, block_weights, target)
+        start = block * DRAW_BLOCK_SIZE
+        weights = self._weights[start : start + DRAW_BLOCK_SIZE].copy()
+        if excluded // DRAW_BLOCK_SIZE == block:
+            weights[excluded - start] = 0.0
+
+        target -= float(block_totals[block - 1]) if block else 0.0
+        position = _search_weights(np.cumsum(weights), weights, target)
+        return int(deck._conditional[start + position])
+
+
+def _search_weights(totals: np.ndarray, weights: np.ndarray, target: float) -> int:
+    """Find where a target falls in the running totals of some weights
+
+    Rounding can put the target past the last total, in which case the
+    last entry with any weight is used.
+    """
+    position = int(np.searchsorted(totals, target, "right"))
+
+    if position >= len(totals):
+        position = int(np.flatnonzero(weights)[-1])
+
+    return position
+
+
+class DeckRun:
+    """A single run through a deck
+
+    Tracks the game state, which card is being shown and whether an
+    ending has been reached. This holds only game logic, so it can be
+    shared by the interactive game and by headless simulations.
+
+    Parameters
+    ----------
+    deck : Deck
+        The deck to draw cards from
+    rng : random.Random
+        The source of randomness for drawing cards
+    """
+
+    __slots__ = "deck", "rng", "state", "index", "card_index", "ending", "history"
+
+    def __init__(self, deck: Deck, rng: random.Random) -> None:
+        self.deck: Deck = deck
+        self.rng: random.Random = rng
+        self.state: GameState = deck.create_state()
+        self.index: DrawIndex = deck.create_index(self.state)
+        self.card_index: int = -1
+        self.ending: Optional[str] = None
+        self.history: List[Tuple[int, bool]] = []
+        self._draw_next_card()
+
+    @property
+    def card(self) -> CardData:
+        """The card being shown to the player
+
+        Raises
+        ------
+        RuntimeError
+            If no card was eligible when the run started, so the run
+            ended without showing one
+        """
+        if self.card_index < 0:
+            raise RuntimeError("The run ended before any card could be drawn")
+
+        return self.deck[self.card_index]
+
+    def swipe(self, accept: bool) -> None:
+        """Respond to the current card and draw the next one"""
+        if self.ending is not None:
+            raise RuntimeError("Cannot swipe after the run has ended")
+
+        card = self.card
+        self.history.append((self.card_index, accept))
+        for effect in self.deck.get_effects(self.card_index, accept):
+            effect(self.state)
+
+        if ENDING_TAG in card.tags:
+            self.ending = card.card_id
+            return
+
+        self._draw_next_card()
+
+    def peek(self, accept: bool) -> Optional[int]:
+        """Find the card a swipe would draw, without changing the run
+
+        The draw is made from copies of the state and random generator,
+        so it is the card that swipe() will actually draw next.
+
+        Returns
+        -------
+        int or None
+            The index of the next card, or None if the swipe would end
+            the run
+        """
+        if self.ending is not None or ENDING_TAG in self.card.tags:
+            return None
+
+        state = self.state.copy()
+        for effect in self.deck.get_effects(self.card_index, accept):
+            effect(state)
+
+        rng = random.Random()
+        rng.setstate(self.rng.getstate())
+        return self.index.copy().draw(state, rng, exclude=self.card_index)
+
+    def _draw_next_card(self) -> None:
+        exclude = self.card_index if self.card_index >= 0 else None
+        index = self.index.draw(self.state, self.rng, exclude=exclude)
+
+        if index is None:
+            self.ending = NO_CARDS_ENDING
+        else:
+            self.card_index = index
@@ -0,0 +1,550 @@
+"""
+A small expression language for card conditions and effects
+
+Conditions are boolean expressions over the values in the game state:
+
+    met_king
+    !met_king
+    gold >= 10 and (army > 5 or not at_war)
+    max(gold, food) < 2 * population
+
+Effects are statements that change the state:
+
+    met_king            set the flag
+    !met_king           clear the flag
+    gold += 10          also -=, *= and /=
+    gold = gold / 2
+
+Expressions support numbers, true and false, names of values in the
+state, arithmetic (+ - * / %), comparisons (< <= > >= == !=), the
+logical operators and, or and not (also written &&, || and !), and the
+functions min, max and abs. min and max take one or more arguments and
+abs takes exactly one. Dividing by zero, with / or %, gives 0 rather than
+an error, so an effect like "gold = gold / population" cannot end a run
+early when the population is 0.
+
+Sources are parsed once, when a deck is loaded, and compiled into
+Python closures after folding constant sub-expressions. Conditions
+that only compare single values to constants are instead lowered to
+Condition records, so that a ConditionTable can check them for a whole
+deck at once.
+"""
+import operator
+import re
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from .state import Condition, GameState, SymbolTable
+
+ExpressionFunction = Callable[[np.ndarray], float]
+"""A compiled expression. Takes the values array of a GameState."""
+
+EffectFunction = Callable[[GameState], None]
+"""A compiled effect statement"""
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression cannot be parsed"""
+
+
+class Number(NamedTuple):
+    value: float
+
+
+class Name(NamedTuple):
+    name: str
+
+
+class Unary(NamedTuple):
+    op: str
+    operand: "Node"
+
+
+class Binary(NamedTuple):
+    op: str
+    left: "Node"
+    right: "Node"
+
+
+class Call(NamedTuple):
+    function: str
+    args: Tuple["Node", ...]
+
+
+Node = Union[Number, Name, Unary, Binary, Call]
+
+
+class Statement(NamedTuple):
+    """A parsed effect statement"""
+
+    target: str
+    op: str
+    value: Node
+
+
+def _divide(left: float, right: float) -> float:
+    return left / right if right else 0.0
+
+
+def _modulo(left: float, right: float) -> float:
+    return left % right if right else 0.0
+
+
+def _min(*args: float) -> float:
+    return min(args)
+
+
+def _max(*args: float) -> float:
+    return max(args)
+
+
+BINARY_OPERATORS: Dict[str, Callable[[float, float], float]] = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": _divide,
+    "%": _modulo,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+FUNCTIONS: Dict[str, Callable[..., float]] = {
+    "min": _min,
+    "max": _max,
+    "abs": abs,
+}
+
+FUNCTION_ARITY: Dict[str, Tuple[int, Optional[int]]] = {
+    "min": (1, None),
+    "max": (1, None),
+    "abs": (1, 1),
+}
+"""The fewest and most arguments of each function, None for no limit"""
+
+ASSIGNMENT_OPERATORS = ("=", "+=", "-=", "*=", "/=")
+
+COMPARISON_OPERATORS = ("<", "<=", ">", ">=", "==", "!=")
+
+# Comparison used when the operands of a comparison are swapped
+_FLIPPED_COMPARISONS = {
+    "<": ">",
+    "<=": ">=",
+    ">": "<",
+    ">=": "<=",
+    "==": "==",
+    "!=": "!=",
+}
+
+_BINARY_PRECEDENCE = {
+    "or": 1,
+    "and": 2,
+    "<": 4,
+    "<=": 4,
+    ">": 4,
+    ">=": 4,
+    "==": 4,
+    "!=": 4,
+    "+": 5,
+    "-": 5,
+    "*": 6,
+    "/": 6,
+    "%": 6,
+}
+
+_NOT_PRECEDENCE = 3
+_NEGATE_PRECEDENCE = 7
+
+_ALIASES = {"&&": "and", "||": "or", "!": "not"}
+
+_TOKEN_PATTERN = re.compile(
+    r"\s*(?:"
+    r"(?P<number>\d+(?:\.\d*)?|\.\d+)"
+    r"|(?P<name>[A-Za-z_][\w.]*)"
+    r"|(?P<op>\+=|-=|\*=|/=|<=|>=|==|!=|&&|\|\||[-+*/%()<>!=,])"
+    r")"
+)
+
+
+def _tokenize(source: str) -> Iterator[Tuple[str, str]]:
+    position = 0
+    source = source.rstrip()
+
+    while position < len(source):
+        match = _TOKEN_PATTERN.match(source, position)
+
+        if match is None or match.end() == position:
+            raise ExpressionError(f"Unexpected character in {source!r} at {position}")
+
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+
+        if kind == "name" and text in ("and", "or", "not", "true", "false"):
+            kind = "op" if text in ("and", "or", "not") else "number"
+            text = {"true": "1", "false": "0"}.get(text, text)
+
+        yield kind, _ALIASES.get(text, text)
+
+
+class _Parser:
+    """Pratt parser over the tokens of a single source string"""
+
+    __slots__ = "source", "tokens", "position"
+
+    def __init__(self, source: str) -> None:
+        self.source: str = source
+        self.tokens: List[Tuple[str, str]] = list(_tokenize(source))
+        self.position: int = 0
+
+    def peek(self) -> Tuple[str, str]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return "end", ""
+
+    def advance(self) -> Tuple[str, str]:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def expect(self, text: str) -> None:
+        kind, token_text = self.advance()
+        if token_text != text or kind != "op":
+            raise ExpressionError(f"Expected {text!r} in {self.source!r}")
+
+    def at_end(self) -> bool:
+        return self.position >= len(self.tokens)
+
+    def parse_expression(self, min_precedence: int = 0) -> Node:
+        left = self.parse_prefix()
+
+        while True:
+            kind, text = self.peek()
+            precedence = _BINARY_PRECEDENCE.get(text, -1) if kind == "op" else -1
+
+            if precedence <= min_precedence:
+                return left
+
+            self.advance()
+            right = self.parse_expression(precedence)
+
+            if text in COMPARISON_OPERATORS and isinstance(left, Binary):
+                if left.op in COMPARISON_OPERATORS:
+                    raise ExpressionError(
+                        f"Comparisons cannot be chained in {self.source!r}"
+                    )
+
+            left = Binary(text, left, right)
+
+    def parse_prefix(self) -> Node:
+        kind, text = self.advance()
+
+        if kind == "number":
+            return Number(float(text))
+
+        if kind == "name":
+            if self.peek() == ("op", "("):
+                return self.parse_call(text)
+            return Name(text)
+
+        if text == "(":
+            node = self.parse_expression()
+            self.expect(")")
+            return node
+
+        if text == "not":
+            return Unary("not", self.parse_expression(_NOT_PRECEDENCE))
+
+        if text == "-":
+            return Unary("-", self.parse_expression(_NEGATE_PRECEDENCE))
+
+        if text == "+":
+            return self.parse_expression(_NEGATE_PRECEDENCE)
+
+        raise ExpressionError(f"Unexpected {text or 'end'!r} in {self.source!r}")
+
+    def parse_call(self, function: str) -> Node:
+        if function not in FUNCTIONS:
+            raise ExpressionError(f"Unknown function {function!r} in {self.source!r}")
+
+        self.expect("(")
+        args: List[Node] = []
+
+        if self.peek() != ("op", ")"):
+            args.append(self.parse_expression())
+            while self.peek() == ("op", ","):
+                self.advance()
+                args.append(self.parse_expression())
+
+        self.expect(")")
+
+        fewest, most = FUNCTION_ARITY[function]
+        if len(args) < fewest or (most is not None and len(args) > most):
+            expected = f"{fewest}" if fewest == most else f"at least {fewest}"
+            raise ExpressionError(
+                f"{function}() takes {expected} argument(s), not {len(args)},"
+                f" in {self.source!r}"
+            )
+
+        return Call(function, tuple(args))
+
+
+def parse_expression(source: str) -> Node:
+    """Parse an expression into a syntax tree"""
+    parser = _Parser(source)
+    node = parser.parse_expression()
+
+    if not parser.at_end():
+        raise ExpressionError(f"Unexpected {parser.peek()[1]!r} in {source!r}")
+
+    return node
+
+
+def parse_statement(source: str) -> Statement:
+    """Parse an effect statement into its target, operator and value"""
+    parser = _Parser(source)
+    kind, text = parser.advance()
+
+    if text == "not":
+        kind, text = parser.advance()
+        if kind != "name" or not parser.at_end():
+            raise ExpressionError(f"Invalid effect {source!r}")
+        return Statement(text, "=", Number(0.0))
+
+    if kind != "name":
+        raise ExpressionError(f"Effects must start with a name: {source!r}")
+
+    if parser.at_end():
+        return Statement(text, "=", Number(1.0))
+
+    _, op = parser.advance()
+
+    if op not in ASSIGNMENT_OPERATORS:
+        raise ExpressionError(f"Expected an assignment in {source!r}")
+
+    value = parser.parse_expression()
+
+    if not parser.at_end():
+        raise ExpressionError(f"Unexpected {parser.peek()[1]!r} in {source!r}")
+
+    return Statement(text, op, value)
+
+
+def fold_constants(node: Node) -> Node:
+    """Evaluate every sub-expression that does not depend on the state"""
+    if isinstance(node, (Number, Name)):
+        return node
+
+    if isinstance(node, Unary):
+        operand = fold_constants(node.operand)
+        if isinstance(operand, Number):
+            if node.op == "not":
+                return Number(float(not operand.value))
+            return Number(-operand.value)
+        return Unary(node.op, operand)
+
+    if isinstance(node, Call):
+        args = tuple(fold_constants(arg) for arg in node.args)
+        if all(isinstance(arg, Number) for arg in args):
+            return Number(float(FUNCTIONS[node.function](*(a.value for a in args))))
+        return Call(node.function, args)
+
+    left = fold_constants(node.left)
+    right = fold_constants(node.right)
+
+    if node.op in ("and", "or"):
+        for constant, other in ((left, right), (right, left)):
+            if isinstance(constant, Number):
+                # "x and true" is "x", "x and false" is false, and so on
+                if bool(constant.value) == (node.op == "and"):
+                    return other
+                return Number(float(node.op == "or"))
+        return Binary(node.op, left, right)
+
+    if isinstance(left, Number) and isinstance(right, Number):
+        return Number(float(BINARY_OPERATORS[node.op](left.value, right.value)))
+
+    return Binary(node.op, left, right)
+
+
+def iter_names(node: Node) -> Iterator[str]:
+    """Get the name of every value in the state an expression reads"""
+    if isinstance(node, Name):
+        yield node.name
+    elif isinstance(node, Unary):
+        yield from iter_names(node.operand)
+    elif isinstance(node, Call):
+        for arg in node.args:
+            yield from iter_names(arg)
+    elif isinstance(node, Binary):
+        yield from iter_names(node.left)
+        yield from iter_names(node.right)
+
+
+class CompiledCondition(NamedTuple):
+    """A condition split into vectorizable clauses and anything else"""
+
+    clauses: Tuple[Condition, ...]
+    """Comparisons between single values and constants that must all hold"""
+
+    residual: Optional[ExpressionFunction]
+    """The rest of the condition, which must also hold, if any"""
+
+    symbols: Tuple[int, ...] = ()
+    """The symbols of every value the condition reads"""
+
+
+class ExpressionCompiler:
+    """Compiles expressions and caches the results by source
+
+    Parameters
+    ----------
+    symbols : SymbolTable
+        The table used to intern the names of values in the state
+    """
+
+    __slots__ = "symbols", "_expressions", "_conditions", "_effects"
+
+    def __init__(self, symbols: SymbolTable) -> None:
+        self.symbols: SymbolTable = symbols
+        self._expressions: Dict[str, ExpressionFunction] = {}
+        self._conditions: Dict[str, CompiledCondition] = {}
+        self._effects: Dict[str, EffectFunction] = {}
+
+    def compile_expression(self, source: str) -> ExpressionFunction:
+        """Compile an expression into a function of the state values"""
+        function = self._expressions.get(source)
+
+        if function is None:
+            function = self._compile_node(fold_constants(parse_expression(source)))
+            self._expressions[source] = function
+
+        return function
+
+    def compile_condition(self, source: str) -> CompiledCondition:
+        """Compile a condition, splitting off the parts that can be vectorized"""
+        compiled = self._conditions.get(source)
+
+        if compiled is not None:
+            return compiled
+
+        clauses: List[Condition] = []
+        residuals: List[Node] = []
+        node = fold_constants(parse_expression(source))
+        symbols = tuple(sorted({self.symbols.intern(n) for n in iter_names(node)}))
+
+        for term in self._split_conjunction(node):
+            clause = self._lower_clause(term)
+            if clause is not None:
+                clauses.append(clause)
+            else:
+                residuals.append(term)
+
+        residual: Optional[ExpressionFunction] = None
+        if residuals:
+            node = residuals[0]
+            for term in residuals[1:]:
+                node = Binary("and", node, term)
+            residual = self._compile_node(node)
+
+        compiled = CompiledCondition(tuple(clauses), residual, symbols)
+        self._conditions[source] = compiled
+        return compiled
+
+    def compile_effect(self, source: str) -> EffectFunction:
+        """Compile an effect statement into a function that updates a state"""
+        effect = self._effects.get(source)
+
+        if effect is None:
+            effect = self._compile_statement(parse_statement(source))
+            self._effects[source] = effect
+
+        return effect
+
+    def _split_conjunction(self, node: Node) -> List[Node]:
+        if isinstance(node, Binary) and node.op == "and":
+            return self._split_conjunction(node.left) + self._split_conjunction(
+                node.right
+            )
+        return [node]
+
+    def _lower_clause(self, node: Node) -> Optional[Condition]:
+        """Convert a comparison of one value and a constant to a Condition"""
+        if isinstance(node, Name):
+            return Condition(self.symbols.intern(node.name), "!=", 0.0)
+
+        if isinstance(node, Unary) and node.op == "not":
+            if isinstance(node.operand, Name):
+                return Condition(self.symbols.intern(node.operand.name), "==", 0.0)
+
+        if isinstance(node, Binary) and node.op in COMPARISON_OPERATORS:
+            if isinstance(node.left, Name) and isinstance(node.right, Number):
+                symbol = self.symbols.intern(node.left.name)
+                return Condition(symbol, node.op, node.right.value)
+            if isinstance(node.left, Number) and isinstance(node.right, Name):
+                symbol = self.symbols.intern(node.right.name)
+                return Condition(symbol, _FLIPPED_COMPARISONS[node.op], node.left.value)
+
+        return None
+
+    def _compile_node(self, node: Node) -> ExpressionFunction:
+        if isinstance(node, Number):
+            value = node.value
+            return lambda values: value
+
+        if isinstance(node, Name):
+            symbol = self.symbols.intern(node.name)
+            return lambda values: values[symbol] if symbol < len(values) else 0.0
+
+        if isinstance(node, Unary):
+            operand = self._compile_node(node.operand)
+            if node.op == "not":
+                return lambda values: not operand(values)
+            return lambda values: -operand(values)
+
+        if isinstance(node, Call):
+            function = FUNCTIONS[node.function]
+            args = [self._compile_node(arg) for arg in node.args]
+            return lambda values: function(*(arg(values) for arg in args))
+
+        left = self._compile_node(node.left)
+        right = self._compile_node(node.right)
+
+        if node.op == "and":
+            return lambda values: bool(left(values)) and bool(right(values))
+
+        if node.op == "or":
+            return lambda values: bool(left(values)) or bool(right(values))
+
+        binary = BINARY_OPERATORS[node.op]
+        return lambda values: binary(left(values), right(values))
+
+    def _compile_statement(self, statement: Statement) -> EffectFunction:
+        symbol = self.symbols.intern(statement.target)
+        value = fold_constants(statement.value)
+
+        if statement.op != "=":
+            value = fold_constants(
+                Binary(statement.op[0], Name(statement.target), value)
+            )
+
+        if isinstance(value, Number):
+            constant = value.value
+
+            def assign_constant(state: GameState) -> None:
+                state.reserve(symbol)
+                state.values[symbol] = constant
+
+            return assign_constant
+
+        function = self._compile_node(value)
+
+        def assign(state: GameState) -> None:
+            state.reserve(symbol)
+            state.values[symbol] = function(state.values)
+
+        return assign
@@ -0,0 +1,305 @@
+"""
+Shared fonts, text measurement and rendered glyphs
+
+Loading a font from disk is slow, and pygame fonts are not safe to use
+from several threads at once. A FontManager loads each font once per
+face and size, and measures and renders text with it while holding a
+lock, so text can be laid out on a worker thread while the main thread
+draws.
+
+Lines are measured with Font.size and rendered whole with Font.render,
+so they keep the font's kerning. Composing a line from cached glyphs
+was measured to be slower than rendering it, except for single
+characters drawn straight to a surface. Those are drawn from an image of
+the glyph packed into a TextureAtlas.
+"""
+import pathlib
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+import pygame
+import pygame.color
+import pygame.font
+import pygame.rect
+import pygame.surface
+
+from .atlas import TextureAtlas
+
+FontFace = Optional[Union[str, pathlib.Path]]
+"""The path of a font file, or None for pygame's default font"""
+
+GlyphStyle = Tuple[pygame.font.Font, Tuple[int, int, int, int], bool]
+"""A font, color and whether the glyphs are antialiased"""
+
+
+class Glyph(NamedTuple):
+    """The visible part of a rendered character"""
+
+    image: pygame.surface.Surface
+    """A subsurface of the glyph atlas, cropped to the character's pixels"""
+
+    offset: Tuple[int, int]
+    """Where the image goes relative to the pen position and top of the line"""
+
+
+_NOT_CACHED = object()
+
+
+class FontMetrics:
+    """Measures text in a single font
+
+    Widths come from Font.size, so they include kerning and are the
+    widths of the lines FontManager.render_line() renders.
+
+    Parameters
+    ----------
+    font : pygame.font.Font
+        The font to measure
+    lock : threading.RLock, optional
+        Held while the font is asked for metrics. Fonts are not safe to
+        use from several threads at once, so anything else that renders
+        with the font should hold the same lock.
+    """
+
+    __slots__ = "font", "line_height", "_lock"
+
+    def __init__(
+        self, font: pygame.font.Font, lock: Optional[threading.RLock] = None
+    ) -> None:
+        self._lock: threading.RLock = lock if lock is not None else threading.RLock()
+        self.font: pygame.font.Font = font
+        with self._lock:
+            self.line_height: int = font.size("Tg")[1]
+
+    def width(self, text: str) -> int:
+        """Get the width of a line of text in pixels"""
+        with self._lock:
+            return self.font.size(text)[0]
+
+    def fit(self, text: str, width: int) -> int:
+        """Count the leading characters of text that fit within a width
+
+        At least one character is always counted, so that text too wide
+        for any line still makes progress when it is broken up.
+        """
+        low, high = 1, len(text)
+
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.width(text[:mid]) < width:
+                low = mid
+            else:
+                high = mid - 1
+
+        return low
+
+
+class FontManager:
+    """Loads fonts once, and measures and renders text with them
+
+    Glyphs are cached per font, color and antialiasing, and packed into
+    atlas pages so many glyphs share a few surfaces. Text in many styles
+    would fill page after page, so once the atlas needs more than
+    max_glyph_pages pages every glyph is dropped, and glyphs are
+    rendered again as they are used.
+
+    Parameters
+    ----------
+    glyph_page_size : Tuple[int, int]
+        The size of each page of the glyph atlas
+    max_glyph_pages : int
+        The most pages the glyph atlas may use
+    """
+
+    __slots__ = (
+        "atlas",
+        "max_glyph_pages",
+        "_fonts",
+        "_metrics",
+        "_glyphs",
+        "_lock",
+        "__weakref__",
+    )
+
+    def __init__(
+        self, glyph_page_size: Tuple[int, int] = (1024, 1024), max_glyph_pages: int = 4
+    ) -> None:
+        self.atlas: TextureAtlas = TextureAtlas(glyph_page_size)
+        self.max_glyph_pages: int = max_glyph_pages
+        self._fonts: Dict[Tuple[FontFace, int], pygame.font.Font] = {}
+        self._metrics: Dict[pygame.font.Font, FontMetrics] = {}
+        self._glyphs: Dict[GlyphStyle, Dict[str, Optional[Glyph]]] = {}
+        # reentrant, since drawing a line can measure its font first
+        self._lock: threading.RLock = threading.RLock()
+
+    def get_font(self, face: FontFace = None, size: int = 36) -> pygame.font.Font:
+        """Get a font, loading it the first time a face and size is requested"""
+        key = (str(face) if face is not None else None, size)
+        font = self._fonts.get(key)
+
+        if font is None:
+            with self._lock:
+                font = self._fonts.get(key)
+                if font is None:
+                    font = pygame.font.Font(key[0], size)
+                    self._fonts[key] = font
+
+        return font
+
+    def get_metrics(self, font: pygame.font.Font) -> FontMetrics:
+        """Get the object that measures text in a font"""
+        metrics = self._metrics.get(font)
+
+        if metrics is None:
+            with self._lock:
+                metrics = self._metrics.setdefault(font, FontMetrics(font, self._lock))
+
+        return metrics
+
+    def measure(self, text: str, font: pygame.font.Font) -> Tuple[int, int]:
+        """Get the size of a line of text, like Font.size"""
+        metrics = self.get_metrics(font)
+        return metrics.width(text), metrics.line_height
+
+    def get_glyph(
+        self,
+        font: pygame.font.Font,
+        char: str,
+        color: pygame.color.Color,
+        antialias: bool = False,
+    ) -> Optional[Glyph]:
+        """Get the image of a character
+
+        Returns
+        -------
+        Glyph or None
+            The glyph, or None for characters that draw nothing, like spaces
+        """
+        style = (font, tuple(pygame.Color(color)), antialias)
+        glyph = self._glyphs.get(style, {}).get(char, _NOT_CACHED)
+
+        if glyph is _NOT_CACHED:
+            glyph = self._render_glyph(style, char)
+
+        return glyph
+
+    def _render_glyph(self, style: GlyphStyle, char: str) -> Optional[Glyph]:
+        with self._lock:
+            glyphs = self._glyphs.setdefault(style, {})
+            if char in glyphs:
+                return glyphs[char]
+
+            glyph = self._draw_glyph(style, char)
+
+            # only the visible pixels are packed, so blits touch less memory
+            if glyph is not None:
+                key = (style, char)
+                self.atlas.add(key, glyph.image)
+
+                if len(self.atlas.pages) > self.max_glyph_pages:
+                    # images already taken from the old pages stay valid
+                    self.clear()
+                    glyphs = self._glyphs.setdefault(style, {})
+                    self.atlas.add(key, glyph.image)
+
+                glyph = Glyph(self.atlas.get(key), glyph.offset)
+
+            glyphs[char] = glyph
+
+        return glyph
+
+    @staticmethod
+    def _draw_glyph(style: GlyphStyle, char: str) -> Optional[Glyph]:
+        """Render a character to its own surface, cropped to its pixels"""
+        font, color, antialias = style
+        image = font.render(char, antialias, color)
+        bounds = image.get_bounding_rect()
+
+        if bounds.width == 0:
+            return None
+
+        return Glyph(image.subsurface(bounds), bounds.topleft)
+
+    def draw_line(
+        self,
+        surface: pygame.surface.Surface,
+        text: str,
+        position: Tuple[int, int],
+        font: pygame.font.Font,
+        color: pygame.color.Color,
+        antialias: bool = False,
+    ) -> pygame.rect.Rect:
+        """Draw a line of text
+
+        Single characters are blitted from the glyph atlas, and longer
+        lines are rendered with render_line().
+
+        Returns
+        -------
+        pygame.rect.Rect
+            The area the line takes up in the layout
+        """
+        metrics = self.get_metrics(font)
+        rect = pygame.rect.Rect(position, (metrics.width(text), metrics.line_height))
+
+        if len(text) == 1:
+            glyph = self.get_glyph(font, text, color, antialias)
+            if glyph is not None:
+                x, y = position
+                surface.blit(glyph.image, (x + glyph.offset[0], y + glyph.offset[1]))
+        elif text:
+            surface.blit(self.render_line(text, font, color, antialias), position)
+
+        return rect
+
+    def render_line(
+        self,
+        text: str,
+        font: pygame.font.Font,
+        color: pygame.color.Color,
+        antialias: bool = False,
+        background: Optional[pygame.color.Color] = None,
+    ) -> pygame.surface.Surface:
+        """Render a line of text with Font.render, holding the manager's lock
+
+        If a background is given, the line is drawn over it with
+        antialiasing and the background is set as the colorkey, which
+        is faster to blit than per-pixel alpha. Other lines are copied to
+        a surface with per-pixel alpha, since the palette surfaces
+        Font.render makes without antialiasing are slow to blit.
+        """
+        with self._lock:
+            if background:
+                image = font.render(text, True, color, background)
+                image.set_colorkey(background)
+                return image
+
+            image = font.render(text, antialias, color)
+
+        if image.get_bitsize() == 8:
+            line = pygame.Surface(image.get_size(), pygame.SRCALPHA)
+            line.blit(image, (0, 0))
+            image = line
+
+        return image
+
+    def clear(self) -> None:
+        """Drop every cached glyph, for example after changing language"""
+        with self._lock:
+            self.atlas = TextureAtlas(self.atlas.page_size)
+            self._glyphs.clear()
+
+    def close(self) -> None:
+        """Forget every font, which pygame.quit() makes unusable
+
+        Fonts, metrics and glyphs are loaded again on demand, so the
+        manager can still be used once pygame is initialized again.
+        """
+        with self._lock:
+            self.clear()
+            self._fonts.clear()
+            self._metrics.clear()
+
+
+default_font_manager = FontManager()
+"""The font manager shared by the game and the text helpers"""
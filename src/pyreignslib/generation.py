@@ -0,0 +1,168 @@
+"""
+Background preparation work with progress reporting
+
+Loading screens run a GenerationPipeline, which does its steps on a
+worker thread and reports progress through a queue. The game mode
+showing the loading screen polls the pipeline once a frame, so the UI
+keeps drawing at a steady rate however long the work takes, and moves
+on as soon as the last step finishes.
+
+Steps must not change state the main thread uses, like the image and
+text caches, since it keeps drawing while they run. A step that makes
+something the game keeps builds it privately, and gives the pipeline a
+finish callback that hands it over. Polling the pipeline calls those
+callbacks on the main thread, in order, as their steps complete.
+"""
+import queue
+import threading
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+ProgressCallback = Callable[[float], None]
+"""Reports how much of a step is done, from 0.0 to 1.0"""
+
+
+class GenerationStep(NamedTuple):
+    """A single piece of work done by a GenerationPipeline"""
+
+    label: str
+    """Describes the work to the player"""
+
+    run: Callable[[ProgressCallback], None]
+    """Does the work, reporting progress through the given callback"""
+
+    weight: float = 1.0
+    """How long this step takes relative to the other steps"""
+
+    finish: Optional[Callable[[], None]] = None
+    """Adds what run made to shared state, called on the main thread"""
+
+
+class GenerationProgress(NamedTuple):
+    """A progress update sent from the worker thread"""
+
+    label: str
+    """The label of the step being worked on"""
+
+    progress: float
+    """How much of all the work is done, from 0.0 to 1.0"""
+
+
+class GenerationPipeline:
+    """Runs a sequence of steps on a background thread
+
+    Parameters
+    ----------
+    steps : Sequence[GenerationStep]
+        The work to do, in order
+    """
+
+    __slots__ = (
+        "steps",
+        "label",
+        "progress",
+        "error",
+        "_updates",
+        "_completed",
+        "_thread",
+        "_finished",
+    )
+
+    def __init__(self, steps: Sequence[GenerationStep]) -> None:
+        self.steps: List[GenerationStep] = list(steps)
+        self.label: str = self.steps[0].label if self.steps else ""
+        self.progress: float = 0.0
+        self.error: Optional[BaseException] = None
+        self._updates: "queue.Queue[GenerationProgress]" = queue.Queue()
+        self._completed: "queue.Queue[GenerationStep]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._finished: threading.Event = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        """True once every step has finished and been polled, or one has failed
+
+        The finish callbacks of the steps have all been called by then.
+        """
+        return self._finished.is_set() and self._completed.empty()
+
+    def start(self) -> None:
+        """Start running the steps on a worker thread"""
+        if self._thread is not None:
+            raise RuntimeError("Generation has already started")
+
+        self._thread = threading.Thread(
+            target=self._run, name="generation", daemon=True
+        )
+        self._thread.start()
+
+    def run(self) -> None:
+        """Run every step on the calling thread"""
+        self._run()
+        self.poll()
+
+    def poll(self) -> GenerationProgress:
+        """Apply the progress updates sent since the last poll
+
+        Call this from the main thread. The finish callbacks of steps
+        that have completed since the last poll are called here. If a
+        step failed, its exception is raised afterwards.
+
+        Returns
+        -------
+        GenerationProgress
+            The latest progress update
+        """
+        while True:
+            try:
+                update = self._updates.get_nowait()
+            except queue.Empty:
+                break
+            self.label, self.progress = update
+
+        while True:
+            try:
+                step = self._completed.get_nowait()
+            except queue.Empty:
+                break
+            if step.finish is not None:
+                step.finish()
+
+        if self.error is not None:
+            raise self.error
+
+        return GenerationProgress(self.label, self.progress)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every step has finished
+
+        Returns
+        -------
+        bool
+            True if the work finished before the timeout
+        """
+        return self._finished.wait(timeout)
+
+    def _run(self) -> None:
+        total_weight = sum(step.weight for step in self.steps) or 1.0
+        completed = 0.0
+
+        try:
+            for step in self.steps:
+
+                def report(fraction: float, step: GenerationStep = step) -> None:
+                    fraction = min(max(fraction, 0.0), 1.0)
+                    progress = (completed + step.weight * fraction) / total_weight
+                    self._updates.put(GenerationProgress(step.label, progress))
+
+                report(0.0)
+                step.run(report)
+                completed += step.weight
+                self._completed.put(step)
+        except BaseException as err:  # handed to the main thread by poll()
+            self.error = err
+        else:
+            self._updates.put(
+                GenerationProgress(self.steps[-1].label if self.steps else "", 1.0)
+            )
+        finally:
+            self._finished.set()
@@ -2,17 +2,28 @@ import pygame
 import pygame_gui
 from pygame_gui.elements import UIButton, UILabel, UIProgressBar
 
-from pyreignslib.core import CHANGE_MODE_EVENT, GameContext, GameMode
+from pyreignslib.core import (
+    CHANGE_MODE_EVENT,
+    PRELOAD_MODE_EVENT,
+    GameContext,
+    GameMode,
+    handles,
+)
+from pyreignslib.generation import GenerationPipeline
 from pyreignslib.prototype_mode import PrototypeMode
 
 
 class MainMenuMode(GameMode):
-    """Presents the user with the main menu"""
+    """Presents the user with the main menu
+
+    The menu is persistent, so returning to it later reuses its buttons.
+    """
+
+    persistent = True
 
     def __init__(self, ctx: GameContext) -> None:
         super().__init__(ctx)
         self.options = ["Play", "Quit"]
-        ctx.background.fill((224, 197, 123))
 
         UIButton(
             pygame.Rect(
@@ -32,18 +43,24 @@ class MainMenuMode(GameMode):
             object_id="#exit_game_btn",
         )
 
-    def handle_event(self, event: pygame.event.Event) -> None:
-        """Handle PyGame events while active"""
+    def on_enter(self) -> None:
+        self.context.background.fill((224, 197, 123))
+        # build the loading screen while the player looks at the menu
+        pygame.event.post(
+            pygame.event.Event(PRELOAD_MODE_EVENT, mode=GeneratingTownMode)
+        )
 
-        if event.type == pygame.USEREVENT:
-            if event.user_type == pygame_gui.UI_BUTTON_PRESSED:
-                if event.ui_object_id == "#play_btn":
-                    pygame.event.post(
-                        pygame.event.Event(CHANGE_MODE_EVENT, mode=GeneratingTownMode)
-                    )
+    @handles(pygame.USEREVENT)
+    def on_user_event(self, event: pygame.event.Event) -> None:
+        """Handle button presses"""
+        if event.user_type == pygame_gui.UI_BUTTON_PRESSED:
+            if event.ui_object_id == "#play_btn":
+                pygame.event.post(
+                    pygame.event.Event(CHANGE_MODE_EVENT, mode=GeneratingTownMode)
+                )
 
-                if event.ui_object_id == "#exit_game_btn":
-                    pygame.event.post(pygame.event.Event(pygame.QUIT))
+            if event.ui_object_id == "#exit_game_btn":
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
 
     def update(self, elapsed_time: float) -> None:
         """Update the state of the mode"""
@@ -55,11 +72,15 @@ class MainMenuMode(GameMode):
 
 
 class GeneratingTownMode(GameMode):
+    """Shows a progress bar while the game prepares a new town
+
+    The preparation runs on a background thread, so the progress bar
+    keeps animating smoothly, and the game starts as soon as it is done.
+    """
+
     def __init__(self, ctx: GameContext) -> None:
         super().__init__(ctx)
-        self._generation_time: float = 0
-
-        ctx.background.fill((74, 99, 99))
+        self.pipeline = GenerationPipeline(PrototypeMode.get_preparation_steps(ctx))
 
         self.label = UILabel(
             pygame.Rect(
@@ -79,17 +100,30 @@ class GeneratingTownMode(GameMode):
         )
 
         self.progress_bar.set_current_progress(0)
+        self._finished = False
 
-    def handle_event(self, event: pygame.event.Event) -> None:
-        """Handle PyGame events while active"""
-        pass
+    def on_enter(self) -> None:
+        self.context.background.fill((74, 99, 99))
+        self.pipeline.start()
+
+    def on_exit(self) -> None:
+        # a replay may switch modes before the work is done, and the next
+        # mode must not race the worker for the assets, or miss its results
+        self.pipeline.wait()
+        self.pipeline.poll()
 
     def update(self, elapsed_time: float) -> None:
         """Update the state of the mode"""
-        self._generation_time += elapsed_time
-        self.progress_bar.set_current_progress(100 * (self._generation_time / 10))
+        label, progress = self.pipeline.poll()
+        self.progress_bar.set_current_progress(100 * progress)
+
+        if label and self.label.text != f"{label}...":
+            self.label.set_text(f"{label}...")
 
-        if self._generation_time >= 10:
+        if self.pipeline.done and not self._finished:
+            # a slow frame runs several updates before the event is handled,
+            # and each extra event would start another run
+            self._finished = True
             pygame.event.post(pygame.event.Event(CHANGE_MODE_EVENT, mode=PrototypeMode))
 
     def draw(self) -> None:
@@ -0,0 +1,103 @@
+"""
+Preparing values on a worker thread before they are needed
+
+A Prefetcher runs a preparation function for keys that are likely to be
+requested soon, such as the cards that may follow the one the player is
+holding. Taking a value that has been prepared is free. Taking one that
+is not ready yet never waits for it, so the caller can prepare it itself
+or try again next frame, instead of stalling the frame.
+"""
+import concurrent.futures
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class Prefetcher(Generic[K, V]):
+    """Prepares values for keys on a background thread
+
+    Parameters
+    ----------
+    prepare : Callable[..., V]
+        Creates the value for a key, from the key and the arguments given
+        to prefetch(). It runs on the worker thread, so it
+        should only create new objects, and leave adding them to shared
+        caches to the main thread.
+    workers : int
+        The number of worker threads. They are started by the first
+        prefetch() and stopped by close().
+    """
+
+    __slots__ = "prepare", "workers", "_executor", "_pending"
+
+    def __init__(self, prepare: Callable[..., V], workers: int = 1) -> None:
+        self.prepare: Callable[..., V] = prepare
+        self.workers: int = workers
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._pending: Dict[K, "concurrent.futures.Future[V]"] = {}
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._pending
+
+    def prefetch(self, key: K, *args: Any) -> None:
+        """Start preparing the value for a key, unless it is already
+
+        The key and args are passed to prepare. Pass the arguments
+        prepare needs from the main thread's state here, rather than
+        having prepare read that state itself.
+        """
+        if key in self._pending:
+            return
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="prefetch"
+            )
+
+        self._pending[key] = self._executor.submit(self.prepare, key, *args)
+
+    def take(self, key: K) -> Optional[V]:
+        """Get the prepared value for a key, if it is ready
+
+        Preparation that has not finished is cancelled, or left to finish
+        and be discarded if it is already running.
+
+        Returns
+        -------
+        V or None
+            The value, or None if it was never prefetched, is not ready
+            yet or could not be prepared
+        """
+        future = self._pending.pop(key, None)
+
+        if future is None:
+            return None
+
+        if not future.done():
+            future.cancel()
+            return None
+
+        if future.cancelled() or future.exception() is not None:
+            return None
+
+        return future.result()
+
+    def cancel(self) -> None:
+        """Forget every key, cancelling preparation that has not started"""
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    def close(self) -> None:
+        """Cancel pending work and stop the worker threads
+
+        Waits for work that is already running, so nothing the workers
+        use, like pygame itself, is shut down while they run. The
+        prefetcher can still be used afterwards, and starts new threads
+        when it is next given keys.
+        """
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,370 @@
+"""
+Frame-time instrumentation
+
+A FrameProfiler times named sections of each frame, such as the update,
+event handling and drawing done by the game and by each mode. It keeps
+the samples of the most recent frames so it can report rolling
+percentiles, along with how many memory blocks each section allocated.
+
+Sections are timed with a context manager:
+
+    with context.profile("cards"):
+        self.all_cards.draw(self.context.window)
+
+When profiling is disabled GameContext.profile() returns a shared no-op
+context manager, so instrumented code costs almost nothing.
+
+The ProfilerOverlay draws the slowest sections on top of the game, and
+the samples can be written to CSV or JSON for comparing machines.
+"""
+import csv
+import json
+import pathlib
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pygame
+import pygame.font
+import pygame.rect
+import pygame.surface
+
+FRAME_SECTION = "frame"
+"""The name of the section covering a whole frame"""
+
+
+class FrameSample(NamedTuple):
+    """The sections timed during a single frame"""
+
+    index: int
+    """The number of frames profiled before this one"""
+
+    times: Dict[str, float]
+    """Time spent in each section in milliseconds"""
+
+    allocations: Dict[str, int]
+    """Net memory blocks allocated by each section"""
+
+
+class SectionStats(NamedTuple):
+    """Statistics for a section over the profiler's rolling window"""
+
+    count: int
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+    allocations: float
+    """Mean net memory blocks allocated per call"""
+
+
+class _SectionTimer:
+    """Times one named section of a frame"""
+
+    __slots__ = "profiler", "name", "start", "blocks"
+
+    def __init__(self, profiler: "FrameProfiler", name: str) -> None:
+        self.profiler: FrameProfiler = profiler
+        self.name: str = name
+        self.start: int = 0
+        self.blocks: int = 0
+
+    def __enter__(self) -> None:
+        self.blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *args: Any) -> None:
+        elapsed = time.perf_counter_ns() - self.start
+        blocks = sys.getallocatedblocks() - self.blocks
+        self.profiler.record(self.name, elapsed / 1e6, blocks)
+
+
+class FrameProfiler:
+    """Collects per-section frame times over a rolling window
+
+    Parameters
+    ----------
+    window : int
+        The number of recent frames used to compute statistics
+    """
+
+    __slots__ = (
+        "window",
+        "frames",
+        "frame_count",
+        "_timers",
+        "_times",
+        "_allocations",
+        "_frame_timer",
+    )
+
+    def __init__(self, window: int = 600) -> None:
+        self.window: int = window
+        self.frames: Deque[FrameSample] = deque(maxlen=window)
+        self.frame_count: int = 0
+        self._timers: Dict[str, _SectionTimer] = {}
+        self._times: Dict[str, float] = {}
+        self._allocations: Dict[str, int] = {}
+        self._frame_timer: _SectionTimer = _SectionTimer(self, FRAME_SECTION)
+
+    def section(self, name: str) -> _SectionTimer:
+        """Get a context manager that times a section of the current frame
+
+        Sections with the same name are timed by a shared timer, so a
+        section must not be nested inside itself.
+        """
+        timer = self._timers.get(name)
+
+        if timer is None:
+            timer = _SectionTimer(self, name)
+            self._timers[name] = timer
+
+        return timer
+
+    def record(self, name: str, milliseconds: float, allocations: int = 0) -> None:
+        """Add time to a section of the current frame"""
+        self._times[name] = self._times.get(name, 0.0) + milliseconds
+        self._allocations[name] = self._allocations.get(name, 0) + allocations
+
+    def begin_frame(self) -> None:
+        """Start timing a new frame"""
+        self._times = {}
+        self._allocations = {}
+        self._frame_timer.__enter__()
+
+    def end_frame(self) -> None:
+        """Finish timing the current frame and add it to the window"""
+        self._frame_timer.__exit__()
+        self.frames.append(
+            FrameSample(self.frame_count, self._times, self._allocations)
+        )
+        self.frame_count += 1
+
+    def get_section_names(self) -> List[str]:
+        """Get the names of all sections in the window, in order of first use"""
+        names: Dict[str, None] = {}
+        for frame in self.frames:
+            names.update(dict.fromkeys(frame.times))
+        return list(names)
+
+    def get_stats(self, name: str) -> Optional[SectionStats]:
+        """Get statistics for a section over the window
+
+        Returns
+        -------
+        SectionStats or None
+            The statistics, or None if the section was not timed in any
+            frame in the window
+        """
+        times = [frame.times[name] for frame in self.frames if name in frame.times]
+
+        if not times:
+            return None
+
+        allocations = [
+            frame.allocations[name] for frame in self.frames if name in frame.times
+        ]
+        p50, p95, p99 = np.percentile(times, (50, 95, 99))
+
+        return SectionStats(
+            count=len(times),
+            mean=float(np.mean(times)),
+            p50=float(p50),
+            p95=float(p95),
+            p99=float(p99),
+            max=max(times),
+            allocations=float(np.mean(allocations)),
+        )
+
+    def summary(self) -> Dict[str, SectionStats]:
+        """Get statistics for every section in the window"""
+        summary: Dict[str, SectionStats] = {}
+
+        for name in self.get_section_names():
+            stats = self.get_stats(name)
+            if stats is not None:
+                summary[name] = stats
+
+        return summary
+
+    def dump(self, filepath: Union[str, pathlib.Path]) -> None:
+        """Write the frames in the window to a CSV or JSON file
+
+        The format is chosen by the file extension. CSV files have one row
+        per frame and a column per section. JSON files also include the
+        summary statistics of each section.
+        """
+        filepath = pathlib.Path(filepath)
+        names = self.get_section_names()
+
+        if filepath.suffix.lower() == ".csv":
+            with open(filepath, "w", newline="", encoding="utf-8") as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(
+                    ["frame"]
+                    + [f"{name} (ms)" for name in names]
+                    + [f"{name} (blocks)" for name in names]
+                )
+                for frame in self.frames:
+                    writer.writerow(
+                        [frame.index]
+                        + [frame.times.get(name, "") for name in names]
+                        + [frame.allocations.get(name, "") for name in names]
+                    )
+            return
+
+        data = {
+            "summary": {
+                name: stats._asdict() for name, stats in self.summary().items()
+            },
+            "frames": [frame._asdict() for frame in self.frames],
+        }
+
+        with open(filepath, "w", encoding="utf-8") as json_file:
+            json.dump(data, json_file, indent=2)
+
+
+class ProfilerOverlay:
+    """Draws the slowest sections of recent frames on top of the game
+
+    The text is only re-rendered every refresh_interval seconds, so the
+    overlay itself barely shows up in the profile.
+
+    Parameters
+    ----------
+    profiler : FrameProfiler
+        The profiler to show statistics from
+    font : pygame.font.Font
+        The font used for the overlay text
+    budget : float
+        The frame budget in milliseconds. Sections whose p95 exceeds it
+        are highlighted.
+    max_sections : int
+        The number of sections shown
+    refresh_interval : float
+        Seconds between updates of the text
+    """
+
+    __slots__ = (
+        "profiler",
+        "font",
+        "budget",
+        "max_sections",
+        "refresh_interval",
+        "visible",
+        "image",
+        "rect",
+        "_last_refresh",
+        "_changed",
+    )
+
+    TEXT_COLOR = pygame.Color(255, 255, 255)
+    OVER_BUDGET_COLOR = pygame.Color(255, 96, 96)
+    BACKGROUND_COLOR = pygame.Color(0, 0, 0, 180)
+
+    def __init__(
+        self,
+        profiler: FrameProfiler,
+        font: pygame.font.Font,
+        budget: float,
+        max_sections: int = 8,
+        refresh_interval: float = 0.5,
+    ) -> None:
+        self.profiler: FrameProfiler = profiler
+        self.font: pygame.font.Font = font
+        self.budget: float = budget
+        self.max_sections: int = max_sections
+        self.refresh_interval: float = refresh_interval
+        self.visible: bool = True
+        self.image: Optional[pygame.surface.Surface] = None
+        self.rect: pygame.rect.Rect = pygame.rect.Rect(0, 0, 0, 0)
+        self._last_refresh: float = float("-inf")
+        self._changed: bool = False
+
+    def toggle(self) -> None:
+        """Show or hide the overlay"""
+        self.visible = not self.visible
+        self._changed = True
+
+    def get_dirty_rects(self) -> List[pygame.rect.Rect]:
+        """Get the area covered by the overlay if it changed"""
+        if self.visible:
+            self._refresh()
+
+        if not self._changed:
+            return []
+
+        self._changed = False
+        return [self.rect.copy()]
+
+    def draw(self, surface: pygame.surface.Surface) -> None:
+        """Draw the overlay in the top-left corner of a surface"""
+        if not self.visible:
+            return
+
+        self._refresh()
+
+        if self.image is not None:
+            surface.blit(self.image, self.rect)
+
+    def _refresh(self) -> None:
+        """Re-render the text if it is older than the refresh interval"""
+        now = time.perf_counter()
+
+        if now - self._last_refresh < self.refresh_interval:
+            return
+
+        self._last_refresh = now
+        lines = self._get_lines()
+
+        if not lines:
+            return
+
+        images = [self.font.render(text, True, color) for text, color in lines]
+        line_height = self.font.get_linesize()
+        width = max(image.get_width() for image in images) + 8
+        height = line_height * len(images) + 8
+
+        image = pygame.Surface((width, height), pygame.SRCALPHA)
+        image.fill(self.BACKGROUND_COLOR)
+        for i, line_image in enumerate(images):
+            image.blit(line_image, (4, 4 + i * line_height))
+
+        old_rect = self.rect
+        self.image = image
+        self.rect = image.get_rect()
+        self.rect.union_ip(old_rect)
+        self._changed = True
+
+    def _get_lines(self) -> List[Tuple[str, pygame.Color]]:
+        summary = self.profiler.summary()
+        frame = summary.pop(FRAME_SECTION, None)
+
+        if frame is None:
+            return []
+
+        lines = [
+            (
+                f"frame  p50 {frame.p50:5.1f}  p95 {frame.p95:5.1f}  "
+                f"p99 {frame.p99:5.1f} ms",
+                self._get_color(frame.p95),
+            )
+        ]
+
+        slowest = sorted(summary.items(), key=lambda item: -item[1].p95)
+        for name, stats in slowest[: self.max_sections]:
+            lines.append(
+                (
+                    f"{name}  p50 {stats.p50:5.2f}  p95 {stats.p95:5.2f}  "
+                    f"blocks {stats.allocations:+.0f}",
+                    self._get_color(stats.p95),
+                )
+            )
+
+        return lines
+
+    def _get_color(self, milliseconds: float) -> pygame.Color:
+        return self.OVER_BUDGET_COLOR if milliseconds > self.budget else self.TEXT_COLOR
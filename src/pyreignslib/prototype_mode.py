@@ -1,38 +1,120 @@
-from typing import Tuple
+import random
+import struct
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 import pygame
 import pygame.constants
 import pygame.event
+import pygame.rect
 import pygame.sprite
+import pygame.surface
 
-from .card import Card, CardSpriteGroup
+from .card import (
+    CARD_SIZE,
+    Card,
+    CardSpriteGroup,
+    RotatedFrame,
+    add_card_image,
+    default_rotation_cache,
+    find_card_image,
+    get_card_image,
+    scale_card_image,
+)
 from .core.context import GameContext
-from .core.mode import GameMode
+from .core.events import handles
+from .core.mode import CHANGE_MODE_EVENT, GameMode
+from .deck import NO_CARDS_ENDING, CardData, Deck, DeckRun
+from .generation import GenerationStep, ProgressCallback
+from .prefetch import Prefetcher
+from .saves import SaveError, SaveReader, SaveWriter
+from .text import (
+    RenderedText,
+    TextLayoutKey,
+    WordMetrics,
+    default_layout_cache,
+    get_word_metrics,
+    make_layout_key,
+    render_text,
+)
 from .utilities import draw_text
 
 LEFT_MOUSE_BTN = 1
 SHOW_DEBUG = False
+PROMPT_COLOR = pygame.Color(0, 0, 0)
+CHOICE_COLOR = pygame.Color(255, 255, 255)
+
+PLACEHOLDER_DECK = Deck(
+    [
+        CardData(
+            "placeholder",
+            "Will you help me eliminate the enemy? Or will you die at my feet?",
+        )
+    ]
+)
+"""Deck used when no deck has been loaded into the game context"""
+
+NO_CARDS_CARD = CardData(NO_CARDS_ENDING, "There is nothing left for you to decide.")
+"""Card shown when a run ends before any card in its deck could be drawn"""
+
+REPLAY_STATE = struct.Struct("<iIiii?")
+"""Card index, swipe count, card center and rotation, and whether the card
+is being dragged"""
+
+
+class PreparedCard(NamedTuple):
+    """Everything needed to show a card, made ahead of time
+
+    Nothing in it is in a shared cache yet. The main thread adds it to
+    the caches when the card is shown.
+    """
+
+    index: int
+    """The index of the card in the deck"""
+
+    source: Optional[pygame.surface.Surface]
+    """The card art the image was made from, or None if it was not loaded"""
+
+    image: Optional[pygame.surface.Surface]
+    """The card art scaled to the size of a card"""
+
+    frames: Dict[int, RotatedFrame]
+    """Rotated frames of the image, if they were not cached already"""
+
+    texts: List[Tuple[TextLayoutKey, RenderedText]]
+    """The rendered prompt and choices"""
+
+    metrics: WordMetrics
+    """The widths of the words measured while laying out the text"""
 
 
 class PrototypeMode(GameMode):
     __slots__ = (
         "all_cards",
         "card",
+        "run",
+        "autosave",
+        "prefetcher",
         "last_drag_pos",
         "right_threshold",
         "left_threshold",
         "is_hovering_left",
         "is_hovering_right",
+        "_drawn_hover_state",
+        "_static_layer_key",
     )
 
     THRESHOLD_WIDTH: int = 125
+    filter_events = True
 
     def __init__(self, context: GameContext) -> None:
         super().__init__(context)
-        self.card: Card = Card(
-            self.context.images["card-bg"],
-            self.context.window.get_size(),
-            prompt_text="Will you help me eliminate the enemy? Or will you die at my feet?",
+        deck = self.context.deck if self.context.deck is not None else PLACEHOLDER_DECK
+        self.autosave: Optional[SaveWriter] = None
+        self.prefetcher: Prefetcher[int, PreparedCard] = Prefetcher(self._prepare_card)
+        self.run: DeckRun = self._start_run(deck)
+        # a run can end before it starts, when no card's conditions hold
+        self.card: Card = self._create_card(
+            self.run.card if self.run.ending is None else NO_CARDS_CARD
         )
         self.all_cards: CardSpriteGroup = CardSpriteGroup([self.card])
         self.last_drag_pos: Tuple[int, int] = (0, 0)
@@ -42,165 +124,559 @@ class PrototypeMode(GameMode):
         self.left_threshold: int = self.THRESHOLD_WIDTH
         self.is_hovering_left: bool = False
         self.is_hovering_right: bool = False
+        self._drawn_hover_state: Tuple[bool, bool] = (False, False)
+        self._static_layer_key: Optional[Tuple[str, Tuple[int, int]]] = None
+
+    def on_enter(self) -> None:
+        # another mode may have drawn over the shared background
+        self._static_layer_key = None
+        self._refresh_static_layer()
+
+        # the autosave is closed whenever the mode is left, for example for
+        # a pause menu, so pick up where it stopped
+        if self.autosave is None and self.run.ending is None:
+            self.autosave = self._reopen_autosave()
+
+    def on_exit(self) -> None:
+        self.prefetcher.close()
+
+        if self.autosave is not None:
+            self._stop_autosave()
 
     def update(self, elapsed_time: float) -> None:
-        self.all_cards.update(elapsed_time=elapsed_time)
-
-    def handle_event(self, event: pygame.event.Event) -> None:
-        if event.type == pygame.constants.MOUSEBUTTONDOWN:
-            mouse_pos = pygame.mouse.get_pos()
-            if event.button == LEFT_MOUSE_BTN:
-                if self.card.rect.collidepoint(mouse_pos):
-                    self.card.dragged = True
-                    self.last_drag_pos = mouse_pos
-
-        if event.type == pygame.constants.MOUSEMOTION:
-            if self.card.dragged:
-                mouse_pos = pygame.mouse.get_pos()
-                dx = mouse_pos[0] - self.last_drag_pos[0]
-                dy = mouse_pos[1] - self.last_drag_pos[1]
-                self.last_drag_pos = mouse_pos
-                self.card.rect.x += dx
-                self.card.rect.y += dy
-
-                # Show or hide option prompts
-                self.is_hovering_right = self.card.rect.centerx > self.right_threshold
-                self.is_hovering_left = self.card.rect.centerx < self.left_threshold
-
-        if event.type == pygame.constants.MOUSEBUTTONUP:
-            self.card.dragged = False
-            self.is_hovering_left = False
-            self.is_hovering_right = False
-            if self.card.rect.centerx > self.right_threshold:
-                self.card.on_accept()
-            elif self.card.rect.centerx < self.left_threshold:
-                self.card.on_reject()
+        self._refresh_static_layer()
+        with self.context.profile("prototype.card_physics"):
+            self.all_cards.update(elapsed_time=elapsed_time)
 
-    def draw(self) -> None:
-        self.context.background.fill((224, 197, 123))
+    @handles(pygame.constants.MOUSEBUTTONDOWN)
+    def on_mouse_down(self, event: pygame.event.Event) -> None:
+        if event.button == LEFT_MOUSE_BTN:
+            if self.card.rect.collidepoint(event.pos):
+                self.all_cards.set_dragged(self.card, True)
+                self.last_drag_pos = event.pos
+
+                # prepare both possible next cards while the player decides
+                for index in {self.run.peek(True), self.run.peek(False)}:
+                    if index is not None:
+                        self._prefetch_card(index)
+
+    @handles(pygame.constants.MOUSEMOTION)
+    def on_mouse_motion(self, event: pygame.event.Event) -> None:
+        if self.card.dragged:
+            dx = event.pos[0] - self.last_drag_pos[0]
+            dy = event.pos[1] - self.last_drag_pos[1]
+            self.last_drag_pos = event.pos
+            self.all_cards.move_card(
+                self.card, (self.card.rect.centerx + dx, self.card.rect.centery + dy)
+            )
+
+            # Show or hide option prompts
+            self.is_hovering_right = self.card.rect.centerx > self.right_threshold
+            self.is_hovering_left = self.card.rect.centerx < self.left_threshold
+
+    @handles(pygame.constants.MOUSEBUTTONUP)
+    def on_mouse_up(self, event: pygame.event.Event) -> None:
+        self.all_cards.set_dragged(self.card, False)
+        self.is_hovering_left = False
+        self.is_hovering_right = False
+        if self.card.rect.centerx > self.right_threshold:
+            self.swipe(True)
+        elif self.card.rect.centerx < self.left_threshold:
+            self.swipe(False)
+
+    def swipe(self, accept: bool) -> None:
+        """Accept or reject the current card"""
+        if self.run.ending is not None:
+            # the card is a placeholder, or the next run is on its way
+            return
+
+        if accept:
+            self.card.on_accept()
+        else:
+            self.card.on_reject()
+
+        self.run.swipe(accept)
+
+        if self.autosave is not None:
+            try:
+                self.autosave.save(self.run)
+            except OSError as err:
+                # the file is missing swipes now, so it cannot be resumed
+                self._stop_autosave(err)
+
+        if self.run.ending is not None:
+            # The reign is over, so start a new one
+            pygame.event.post(pygame.event.Event(CHANGE_MODE_EVENT, mode=PrototypeMode))
+        else:
+            self._get_next_card()
+
+    def get_replay_state(self) -> bytes:
+        run = self.run
+        return b"".join(
+            (
+                REPLAY_STATE.pack(
+                    run.card_index,
+                    len(run.history),
+                    *self.card.rect.center,
+                    self.card.rotation,
+                    self.card.dragged,
+                ),
+                (run.ending or "").encode("utf-8"),
+                run.state.values.tobytes(),
+            )
+        )
+
+    def get_dirty_rects(self) -> List[pygame.rect.Rect]:
+        self.all_cards.interpolation = self.context.interpolation
+        dirty_rects = self.all_cards.get_dirty_rects()
+
+        if (self.is_hovering_left, self.is_hovering_right) != self._drawn_hover_state:
+            dirty_rects.append(self._get_accept_rect())
+            dirty_rects.append(self._get_reject_rect())
+
+        return dirty_rects
+
+    def _get_accept_rect(self) -> pygame.rect.Rect:
+        """Get the area where the accept text is shown"""
+        return pygame.rect.Rect(
+            self.context.window.get_width() - self.context.window.get_width() // 4,
+            200,
+            self.context.window.get_width() // 4,
+            32,
+        )
+
+    def _get_reject_rect(self) -> pygame.rect.Rect:
+        """Get the area where the reject text is shown"""
+        return pygame.rect.Rect(0, 200, self.context.window.get_width() // 4, 32)
+
+    def _refresh_static_layer(self) -> None:
+        """Redraw the static layer if the card or window size changed"""
+        key = (self.card.prompt_text, self.context.window.get_size())
+
+        if key == self._static_layer_key:
+            return
+
+        with self.context.profile("prototype.static_layer"):
+            self._render_static_layer()
+        self._static_layer_key = key
+        self.context.mark_dirty()
+
+    def _render_static_layer(self) -> None:
+        """Draw everything that stays still between swipes to the background
+
+        The game blits the background at the start of every frame, so
+        drawing the bars and text there means they cost a single blit.
+        """
+        if self.context.background.get_size() != self.context.window.get_size():
+            self.context.background = pygame.Surface(
+                self.context.window.get_size()
+            ).convert()
+
+        surface = self.context.background
+        surface.fill((224, 197, 123))
 
         # Draw top and bottom bars
         pygame.draw.rect(
-            self.context.window,
+            surface,
             (54, 26, 19),
-            pygame.rect.Rect(0, 0, self.context.window.get_width(), 120),
+            pygame.rect.Rect(0, 0, surface.get_width(), 120),
         )
 
         pygame.draw.rect(
-            self.context.window,
+            surface,
             (54, 26, 19),
             pygame.rect.Rect(
                 0,
-                self.context.window.get_height() - 100,
-                self.context.window.get_width(),
+                surface.get_height() - 100,
+                surface.get_width(),
                 100,
             ),
         )
 
         draw_text(
-            self.context.window,
+            surface,
             "Character Name (Age: #)",
             color=pygame.Color(255, 255, 255),
             rect=pygame.rect.Rect(
                 10,
-                self.context.window.get_height() - 90,
-                self.context.window.get_width() - 10,
+                surface.get_height() - 90,
+                surface.get_width() - 10,
                 32,
             ),
             font=self.context.default_font,
+            fonts=self.context.fonts,
         )
 
         draw_text(
-            self.context.window,
+            surface,
             "February 10, 2023",
             color=pygame.Color(255, 255, 255),
             rect=pygame.rect.Rect(
                 10,
-                self.context.window.get_height() - 58,
-                self.context.window.get_width() - 10,
+                surface.get_height() - 58,
+                surface.get_width() - 10,
                 32,
             ),
             font=self.context.default_font,
+            fonts=self.context.fonts,
         )
 
-        if SHOW_DEBUG:
+        if SHOW_DEBUG or self.context.settings.show_debug:
             # Draw swipe thresholds
             pygame.draw.rect(
-                self.context.window,
+                surface,
                 (0, 255, 0, 20),
-                pygame.rect.Rect(
-                    0, 0, self.THRESHOLD_WIDTH, self.context.window.get_height()
-                ),
+                pygame.rect.Rect(0, 0, self.THRESHOLD_WIDTH, surface.get_height()),
             )
 
             pygame.draw.rect(
-                self.context.window,
+                surface,
                 (0, 255, 0, 20),
                 pygame.rect.Rect(
-                    self.context.window.get_width() - self.THRESHOLD_WIDTH,
+                    surface.get_width() - self.THRESHOLD_WIDTH,
                     0,
                     self.THRESHOLD_WIDTH,
-                    self.context.window.get_height(),
+                    surface.get_height(),
                 ),
             )
 
-        textRect = pygame.rect.Rect(0, 0, self.context.window.get_width() - 40, 64)
-        textRect.center = (self.context.window.get_width() // 2, textRect.centery)
-        textRect.y = 130
-
         draw_text(
-            self.context.window,
+            surface,
             self.card.prompt_text,
-            pygame.Color(0, 0, 0),
-            textRect,
+            PROMPT_COLOR,
+            self.get_prompt_rect(surface.get_size()),
             self.context.default_font,
+            fonts=self.context.fonts,
         )
 
-        # Draw card sprites
-        self.all_cards.draw(self.context.window)
+    @staticmethod
+    def get_prompt_rect(window_size: Tuple[int, int]) -> pygame.rect.Rect:
+        """Get the area where the prompt of the current card is shown"""
+        text_rect = pygame.rect.Rect(0, 0, window_size[0] - 40, 64)
+        text_rect.center = (window_size[0] // 2, text_rect.centery)
+        text_rect.y = 130
+        return text_rect
 
-        if self.is_hovering_right:
-            pygame.draw.rect(
-                self.context.window,
-                (0, 0, 0, 20),
-                pygame.rect.Rect(
-                    self.context.window.get_width()
-                    - self.context.window.get_width() // 4,
-                    200,
-                    self.context.window.get_width() // 4,
-                    32,
-                ),
-            )
+    @classmethod
+    def get_preparation_steps(cls, context: GameContext) -> List[GenerationStep]:
+        """Get the work that makes the first swipes of a run smooth
 
-            draw_text(
-                self.context.window,
-                self.card.accept_text,
-                pygame.Color(255, 255, 255),
-                pygame.rect.Rect(
-                    self.context.window.get_width()
-                    - self.context.window.get_width() // 4,
-                    200,
-                    self.context.window.get_width() // 4,
-                    32,
+        The steps load the card art, render the rotated frames of each
+        card and lay out the text of as many cards as the text cache can
+        hold. Their run functions only decode, scale, rotate and render
+        into new surfaces, so they can run on a GenerationPipeline's
+        worker thread while a loading screen is shown. Converting the
+        surfaces and adding them to the atlas and caches is left to the
+        finish callbacks, which the pipeline calls on the main thread.
+        """
+        deck = context.deck if context.deck is not None else PLACEHOLDER_DECK
+        image_names = sorted({card.image for card in deck.cards})
+        card_art: Dict[str, pygame.surface.Surface] = {}
+        card_frames: Dict[str, Dict[int, RotatedFrame]] = {}
+        # each card has a prompt and two choices, so leave room for all
+        # three without evicting text that is already on screen
+        text_count = min(len(deck), default_layout_cache.max_entries // 4)
+        card_texts: List[Tuple[TextLayoutKey, RenderedText]] = []
+        text_metrics = WordMetrics(context.default_font, fonts=context.fonts)
+        window_size = context.window.get_size()
+        # frames are blitted every frame, so they are converted to the
+        # display's format on the worker, by copying it from this surface
+        pixel_format: Optional[pygame.surface.Surface] = None
+        if pygame.display.get_surface() is not None:
+            pixel_format = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha()
+
+        def load_card_art(report: ProgressCallback) -> None:
+            for i, name in enumerate(image_names):
+                if context.assets is not None:
+                    card_art[name] = context.assets.decode(name, CARD_SIZE)
+                else:
+                    card_art[name] = scale_card_image(context.images[name])
+                report((i + 1) / len(image_names))
+
+        def add_card_art() -> None:
+            if context.assets is not None:
+                context.assets.pack_atlas(image_names, CARD_SIZE, decoded=card_art)
+            else:
+                for name, scaled in card_art.items():
+                    add_card_image(context.images[name], scaled)
+
+        def render_card_frames(report: ProgressCallback) -> None:
+            for i, name in enumerate(image_names):
+                card_frames[name] = default_rotation_cache.render_frames(
+                    card_art[name], Card.MAX_TILT, pixel_format
+                )
+                report((i + 1) / len(image_names))
+
+        def add_card_frames() -> None:
+            for name, frames in card_frames.items():
+                image = get_card_image(context.get_image(name, CARD_SIZE))
+                default_rotation_cache.add_frames(image, frames)
+
+        def layout_card_text(report: ProgressCallback) -> None:
+            for i, card in enumerate(deck.cards[:text_count]):
+                card_texts.extend(
+                    cls.render_card_text(context, card, window_size, text_metrics)
+                )
+                report((i + 1) / text_count)
+
+        def add_card_text() -> None:
+            cls.cache_card_text(context, card_texts, text_metrics)
+
+        return [
+            GenerationStep("Loading card art", load_card_art, 2.0, add_card_art),
+            GenerationStep(
+                "Rotating card art", render_card_frames, 2.0, add_card_frames
+            ),
+            GenerationStep("Writing letters", layout_card_text, finish=add_card_text),
+        ]
+
+    @classmethod
+    def render_card_text(
+        cls,
+        context: GameContext,
+        data: CardData,
+        window_size: Tuple[int, int],
+        metrics: WordMetrics,
+    ) -> List[Tuple[TextLayoutKey, RenderedText]]:
+        """Render the prompt and choices of a card without caching them
+
+        The text is rendered the way draw() and the static layer draw it.
+        Words are measured into metrics, a word width cache that is not
+        shared, and nothing is read from the layout cache. The font
+        manager holds its lock while it uses the font, so this can run
+        on a worker thread. The main thread adds the results to the
+        shared caches with cache_card_text().
+        """
+        font = context.default_font
+        prompt_width = cls.get_prompt_rect(window_size).width
+        choice_width = window_size[0] // 4
+
+        return [
+            (
+                make_layout_key(text, font, color, width, False, None, context.fonts),
+                render_text(
+                    text, font, color, width, fonts=context.fonts, metrics=metrics
                 ),
-                self.context.default_font,
             )
-
-        if self.is_hovering_left:
-            pygame.draw.rect(
-                self.context.window,
-                (0, 0, 0, 20),
-                pygame.rect.Rect(0, 200, self.context.window.get_width() // 4, 32),
+            for text, color, width in (
+                (data.prompt, PROMPT_COLOR, prompt_width),
+                (data.accept_text, CHOICE_COLOR, choice_width),
+                (data.reject_text, CHOICE_COLOR, choice_width),
             )
+        ]
 
-            draw_text(
-                self.context.window,
-                self.card.reject_text,
-                pygame.Color(255, 255, 255),
-                pygame.rect.Rect(0, 200, self.context.window.get_width() // 4, 32),
-                self.context.default_font,
-            )
+    @staticmethod
+    def cache_card_text(
+        context: GameContext,
+        texts: List[Tuple[TextLayoutKey, RenderedText]],
+        metrics: WordMetrics,
+    ) -> None:
+        """Add text and word widths from render_card_text() to the shared caches
+
+        Text that is already cached is kept, so it stays the same object
+        for as long as it is on screen.
+        """
+        get_word_metrics(metrics.font, context.fonts).merge(metrics)
+
+        for key, rendered in texts:
+            if key not in default_layout_cache:
+                default_layout_cache.put(key, rendered)
+
+    def draw(self) -> None:
+        self._drawn_hover_state = (self.is_hovering_left, self.is_hovering_right)
+        self.all_cards.interpolation = self.context.interpolation
+
+        # Draw card sprites
+        with self.context.profile("prototype.cards"):
+            self.all_cards.draw(self.context.window)
+
+        with self.context.profile("prototype.choice_text"):
+            if self.is_hovering_right:
+                pygame.draw.rect(
+                    self.context.window,
+                    (0, 0, 0, 20),
+                    self._get_accept_rect(),
+                )
+
+                draw_text(
+                    self.context.window,
+                    self.card.accept_text,
+                    CHOICE_COLOR,
+                    self._get_accept_rect(),
+                    self.context.default_font,
+                    fonts=self.context.fonts,
+                )
+
+            if self.is_hovering_left:
+                pygame.draw.rect(
+                    self.context.window,
+                    (0, 0, 0, 20),
+                    self._get_reject_rect(),
+                )
+
+                draw_text(
+                    self.context.window,
+                    self.card.reject_text,
+                    CHOICE_COLOR,
+                    self._get_reject_rect(),
+                    self.context.default_font,
+                    fonts=self.context.fonts,
+                )
+
+    def _start_run(self, deck: Deck) -> DeckRun:
+        """Resume the autosaved run, or start a new one if there is none"""
+        save_path = self.context.settings.save_path
+
+        if save_path is None:
+            return DeckRun(deck, random.Random(self.context.rng.getrandbits(64)))
+
+        reader = SaveReader(save_path)
+        try:
+            run = reader.restore(deck)
+        except (OSError, SaveError):
+            run = None
+
+        if run is not None and run.ending is None:
+            self.autosave = SaveWriter.resume(reader, run)
+            return run
+
+        run = DeckRun(deck, random.Random(self.context.rng.getrandbits(64)))
+        self.autosave = SaveWriter(save_path, run)
+        return run
+
+    def _reopen_autosave(self) -> Optional[SaveWriter]:
+        """Continue the autosave of the current run after it was closed"""
+        save_path = self.context.settings.save_path
+
+        if save_path is None:
+            return None
+
+        reader = SaveReader(save_path)
+        try:
+            saved = reader.restore(self.run.deck)
+        except (OSError, SaveError):
+            saved = None
+
+        if saved is None or saved.history != self.run.history:
+            # something else changed the file, so appending this run's
+            # swipes to it would corrupt it
+            return None
+
+        return SaveWriter.resume(reader, self.run)
+
+    def _stop_autosave(self, error: Optional[OSError] = None) -> None:
+        """Close the autosave, reporting any write that failed
+
+        A save file that is missing swipes no longer matches the run, so
+        _reopen_autosave() will not continue it and the run is no longer
+        saved.
+        """
+        assert self.autosave is not None
+        autosave, self.autosave = self.autosave, None
+
+        try:
+            autosave.close()
+        except OSError as err:
+            error = error or err
+
+        if error is not None:
+            print(f"Cannot autosave to {autosave.filepath}: {error}")
+
+    def _create_card(
+        self, data: CardData, image: Optional[pygame.surface.Surface] = None
+    ) -> Card:
+        """Create the sprite for a card from the deck"""
+        return Card(
+            image
+            if image is not None
+            else self.context.get_image(data.image, CARD_SIZE),
+            self.context.window.get_size(),
+            prompt_text=data.prompt,
+            accept_text=data.accept_text,
+            reject_text=data.reject_text,
+        )
+
+    def _prefetch_card(self, index: int) -> None:
+        """Start preparing a card that may be shown next
+
+        The card art and its scaled copy are looked up here, on the main
+        thread, so the worker only scales and rotates art that has not
+        been already. Art that is not loaded yet is decoded in the
+        background by the asset manager instead, and scaled and rotated
+        when the card is shown.
+        """
+        name = self.run.deck[index].image
+        assets = self.context.assets
+        source: Optional[pygame.surface.Surface] = None
+        scaled: Optional[pygame.surface.Surface] = None
+
+        if assets is None:
+            source = self.context.images.get(name)
+        elif (name, CARD_SIZE) in assets:
+            source = assets.get(name, CARD_SIZE)
+        else:
+            assets.preload([name], CARD_SIZE)
+
+        if source is not None:
+            scaled = find_card_image(source)
+
+        # frames are cached under the scaled image the card will be drawn with
+        needs_frames = source is not None and (
+            scaled is None or scaled not in self.all_cards.rotation_cache
+        )
+        self.prefetcher.prefetch(
+            index, source, scaled, needs_frames, self.context.window.get_size()
+        )
+
+    def _prepare_card(
+        self,
+        index: int,
+        source: Optional[pygame.surface.Surface],
+        scaled: Optional[pygame.surface.Surface],
+        needs_frames: bool,
+        window_size: Tuple[int, int],
+    ) -> PreparedCard:
+        """Scale, rotate and lay out a card on the prefetcher's thread
+
+        Only new surfaces are created here. The main thread adds them to
+        the shared caches in _get_next_card().
+        """
+        image: Optional[pygame.surface.Surface] = scaled
+        frames: Dict[int, RotatedFrame] = {}
+
+        if source is not None:
+            if image is None:
+                image = scale_card_image(source)
+            if needs_frames:
+                frames = self.all_cards.rotation_cache.render_frames(
+                    image, Card.MAX_TILT
+                )
+
+        metrics = WordMetrics(self.context.default_font, fonts=self.context.fonts)
+        texts = self.render_card_text(
+            self.context, self.run.deck[index], window_size, metrics
+        )
+        return PreparedCard(index, source, image, frames, texts, metrics)
 
     def _get_next_card(self) -> None:
-        """Get the next decision card for the player"""
-        raise NotImplementedError()
+        """Get the next decision card for the player
+
+        Uses the card prepared while the previous one was dragged if it
+        is ready, and otherwise prepares the card now.
+        """
+        prepared = self.prefetcher.take(self.run.card_index)
+        self.prefetcher.cancel()
+
+        image: Optional[pygame.surface.Surface] = None
+        if prepared is not None:
+            if prepared.source is not None and prepared.image is not None:
+                # keeps the copy that is already cached, if another card
+                # scaled the same art while this one was prepared
+                image = add_card_image(prepared.source, prepared.image)
+                self.all_cards.rotation_cache.add_frames(image, prepared.frames)
+            self.cache_card_text(self.context, prepared.texts, prepared.metrics)
+
+        self.all_cards.remove_card(self.card)
+        self.card = self._create_card(self.run.card, image)
+        self.all_cards.add_card(self.card)
+        self._refresh_static_layer()
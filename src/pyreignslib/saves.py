@@ -0,0 +1,461 @@
+"""
+Compact, append-only saves of a run through a deck
+
+A save file starts with a small header followed by a stream of records.
+Each swipe appends a five byte record holding the index of the card and
+the player's choice, so saving after a swipe never rewrites the file and
+a long reign only grows it by a few bytes per card.
+
+Every checkpoint_interval swipes, and when the run ends, a checkpoint
+record is appended as well. It holds everything needed to resume without
+replaying from the start: the values of the game state, the card being
+shown, any ending and the state of the random number generator. The
+payloads of checkpoints can be compressed with zlib.
+
+Loading is lazy. Reading a save only parses the headers of its records,
+decodes the last checkpoint and replays the swipes recorded after it.
+Records cut short by a crash while writing are ignored.
+
+A SaveWriter packs records on the main thread, which takes microseconds,
+and writes them to disk on a background thread, so autosaving after
+every swipe cannot cause a frame to hitch.
+"""
+import concurrent.futures
+import mmap
+import os
+import pathlib
+import random
+import struct
+import sys
+import zlib
+from typing import Any, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from .deck import Deck, DeckRun
+
+HEADER = struct.Struct("<4sHHI")
+"""Magic bytes, version, flags and the checksum of the deck's card IDs"""
+
+MAGIC = b"PRSV"
+VERSION = 1
+
+COMPRESSED = 0x1
+"""Header flag set when checkpoint payloads are compressed"""
+
+RECORD = struct.Struct("<BI")
+"""Record kind, then the swipe for swipes or the payload size for checkpoints"""
+
+SWIPE_RECORD = 1
+CHECKPOINT_RECORD = 2
+
+CHECKPOINT = struct.Struct("<IiIII")
+"""Swipe count, card index, and the sizes of the ending, names and values"""
+
+RNG_STATE = struct.Struct("<625I?d")
+"""The Mersenne Twister state and position, and any cached gaussian"""
+
+
+class SaveError(Exception):
+    """Raised when a save file is invalid or was made with a different deck"""
+
+
+class SaveHeader(NamedTuple):
+    """The information at the start of a save file"""
+
+    version: int
+    compressed: bool
+    deck_checksum: int
+
+
+class Checkpoint(NamedTuple):
+    """A full snapshot of a run after a number of swipes"""
+
+    swipes: int
+    """How many swipes the run had when the snapshot was taken"""
+
+    card_index: int
+    ending: Optional[str]
+    names: Tuple[str, ...]
+    """The names of the values in the game state"""
+
+    values: np.ndarray
+    rng_state: Tuple[Any, ...]
+    """The state of the run's random.Random, as given by getstate()"""
+
+    @classmethod
+    def capture(cls, run: DeckRun) -> "Checkpoint":
+        """Take a snapshot of a run that does not share any mutable data"""
+        names = tuple(run.state.symbols.names)
+        return cls(
+            swipes=len(run.history),
+            card_index=run.card_index,
+            ending=run.ending,
+            names=names,
+            values=run.state.values[: len(names)].copy(),
+            rng_state=run.rng.getstate(),
+        )
+
+    def pack(self) -> bytes:
+        """Encode the checkpoint without compression"""
+        ending = (self.ending or "").encode("utf-8")
+        names = "\0".join(self.names).encode("utf-8")
+        values = np.asarray(self.values, dtype="<f8").tobytes()
+        _, internal_state, gauss_next = self.rng_state
+
+        return b"".join(
+            (
+                CHECKPOINT.pack(
+                    self.swipes, self.card_index, len(ending), len(names), len(values)
+                ),
+                ending,
+                names,
+                values,
+                RNG_STATE.pack(
+                    *internal_state, gauss_next is not None, gauss_next or 0.0
+                ),
+            )
+        )
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "Checkpoint":
+        """Decode an uncompressed checkpoint"""
+        try:
+            (
+                swipes,
+                card_index,
+                ending_size,
+                names_size,
+                values_size,
+            ) = CHECKPOINT.unpack_from(data)
+            offset = CHECKPOINT.size
+            ending = data[offset : offset + ending_size].decode("utf-8")
+            offset += ending_size
+            names = data[offset : offset + names_size].decode("utf-8")
+            offset += names_size
+            values = np.frombuffer(
+                data, dtype="<f8", count=values_size // 8, offset=offset
+            )
+            offset += values_size
+            *internal_state, has_gauss, gauss_next = RNG_STATE.unpack_from(data, offset)
+        except (struct.error, UnicodeDecodeError, ValueError) as err:
+            raise SaveError("Invalid checkpoint") from err
+
+        return cls(
+            swipes=swipes,
+            card_index=card_index,
+            ending=ending or None,
+            names=tuple(names.split("\0")) if names else (),
+            values=values,
+            rng_state=(3, tuple(internal_state), gauss_next if has_gauss else None),
+        )
+
+
+def get_deck_checksum(deck: Deck) -> int:
+    """Get a checksum of the IDs of a deck's cards, in order"""
+    return zlib.crc32("\n".join(card.card_id for card in deck.cards).encode("utf-8"))
+
+
+class SaveReader:
+    """Reads a save file
+
+    Opening a reader does not read the file. The header is read when it
+    is first needed, and the records are only read by restore().
+
+    Parameters
+    ----------
+    filepath : str or pathlib.Path
+        The save file to read
+    """
+
+    __slots__ = "filepath", "valid_size", "checkpoint_swipes", "_header"
+
+    def __init__(self, filepath: Union[str, pathlib.Path]) -> None:
+        self.filepath: pathlib.Path = pathlib.Path(filepath)
+        self.valid_size: int = 0
+        """The size of the file up to the end of its last complete record"""
+        self.checkpoint_swipes: int = 0
+        """The swipe count of the last checkpoint read by restore()"""
+        self._header: Optional[SaveHeader] = None
+
+    @property
+    def header(self) -> SaveHeader:
+        """The header of the save file"""
+        if self._header is None:
+            with open(self.filepath, "rb") as save_file:
+                self._header = self._unpack_header(save_file.read(HEADER.size))
+
+        return self._header
+
+    def restore(self, deck: Deck) -> DeckRun:
+        """Rebuild the run stored in the save file
+
+        Parameters
+        ----------
+        deck : Deck
+            The deck the run was played with
+
+        Returns
+        -------
+        DeckRun
+            The run, in the state it was after its last saved swipe
+
+        Raises
+        ------
+        SaveError
+            If the file is invalid or was saved with a different deck
+        """
+        with open(self.filepath, "rb") as save_file:
+            try:
+                data = mmap.mmap(save_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as err:
+                raise SaveError("Save file is empty") from err
+
+        with data:
+            self._header = self._unpack_header(data[: HEADER.size])
+
+            if self._header.deck_checksum != get_deck_checksum(deck):
+                raise SaveError("Save file was made with a different deck")
+
+            history: List[Tuple[int, bool]] = []
+            checkpoint: Optional[Tuple[int, int]] = None
+
+            for kind, value, offset in self._scan(data):
+                if kind == SWIPE_RECORD:
+                    history.append((value >> 1, bool(value & 1)))
+                else:
+                    checkpoint = (offset, value)
+
+            if checkpoint is None:
+                raise SaveError("Save file has no checkpoint")
+
+            offset, size = checkpoint
+            payload = data[offset : offset + size]
+
+        if self._header.compressed:
+            try:
+                payload = zlib.decompress(payload)
+            except zlib.error as err:
+                raise SaveError("Invalid checkpoint") from err
+
+        snapshot = Checkpoint.unpack(payload)
+        self.checkpoint_swipes = snapshot.swipes
+
+        if snapshot.swipes > len(history):
+            raise SaveError("Checkpoint is ahead of the saved swipes")
+
+        run = _restore_checkpoint(deck, snapshot, history[: snapshot.swipes])
+
+        for card_index, accept in history[snapshot.swipes :]:
+            if run.ending is not None or run.card_index != card_index:
+                raise SaveError("Saved swipes do not match the deck")
+            run.swipe(accept)
+
+        return run
+
+    def _scan(self, data: mmap.mmap) -> Iterator[Tuple[int, int, int]]:
+        """Iterate over the kind, value and payload offset of each record
+
+        Sets valid_size to the end of the last complete record.
+        """
+        offset = HEADER.size
+        size = len(data)
+        self.valid_size = offset
+
+        while offset + RECORD.size <= size:
+            kind, value = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+
+            if kind == CHECKPOINT_RECORD:
+                if offset + value > size:
+                    break
+                yield kind, value, offset
+                offset += value
+            elif kind == SWIPE_RECORD:
+                yield kind, value, offset
+            else:
+                raise SaveError(f"Unknown record kind {kind}")
+
+            self.valid_size = offset
+
+    @staticmethod
+    def _unpack_header(data: bytes) -> SaveHeader:
+        if len(data) < HEADER.size:
+            raise SaveError("Save file is too short")
+
+        magic, version, flags, deck_checksum = HEADER.unpack_from(data)
+
+        if magic != MAGIC or version != VERSION:
+            raise SaveError("Not a save file, or saved by another version")
+
+        return SaveHeader(version, bool(flags & COMPRESSED), deck_checksum)
+
+
+def _restore_checkpoint(
+    deck: Deck, snapshot: Checkpoint, history: List[Tuple[int, bool]]
+) -> DeckRun:
+    """Create a run from a checkpoint without drawing a card"""
+    state = deck.create_state()
+    for name, value in zip(snapshot.names, snapshot.values):
+        state.set(name, float(value))
+
+    rng = random.Random()
+    rng.setstate(snapshot.rng_state)
+
+    run = DeckRun.__new__(DeckRun)
+    run.deck = deck
+    run.rng = rng
+    run.state = state
+    run.index = deck.create_index(state)
+    run.card_index = snapshot.card_index
+    run.ending = sys.intern(snapshot.ending) if snapshot.ending else None
+    run.history = history
+
+    if not -1 <= run.card_index < len(deck):
+        raise SaveError("Checkpoint card is not in the deck")
+
+    return run
+
+
+class SaveWriter:
+    """Appends the swipes of a run to a save file
+
+    Call save() after each swipe. Records are packed on the calling
+    thread and written on a background thread, in order.
+
+    Parameters
+    ----------
+    filepath : str or pathlib.Path
+        The save file. It is replaced if it exists, and its directory is
+        created if needed.
+    run : DeckRun
+        The run being saved. A checkpoint of it is written straight away.
+    compress : bool
+        Compress checkpoints with zlib
+    checkpoint_interval : int
+        The number of swipes between checkpoints. Loading replays at most
+        this many swipes, while each checkpoint costs a few kilobytes.
+    """
+
+    __slots__ = (
+        "filepath",
+        "compress",
+        "checkpoint_interval",
+        "saved_swipes",
+        "checkpoint_swipes",
+        "_executor",
+        "_pending",
+    )
+
+    def __init__(
+        self,
+        filepath: Union[str, pathlib.Path],
+        run: DeckRun,
+        compress: bool = True,
+        checkpoint_interval: int = 256,
+        _resume: Optional[SaveReader] = None,
+    ) -> None:
+        self.filepath: pathlib.Path = pathlib.Path(filepath)
+        self.compress: bool = compress
+        self.checkpoint_interval: int = checkpoint_interval
+        self.saved_swipes: int = len(run.history)
+        self.checkpoint_swipes: int = len(run.history)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="autosave"
+        )
+        self._pending: Optional["concurrent.futures.Future[None]"] = None
+
+        if _resume is not None:
+            os.truncate(self.filepath, _resume.valid_size)
+            self.checkpoint_swipes = _resume.checkpoint_swipes
+            return
+
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.filepath, "wb") as save_file:
+            save_file.write(
+                HEADER.pack(
+                    MAGIC,
+                    VERSION,
+                    COMPRESSED if compress else 0,
+                    get_deck_checksum(run.deck),
+                )
+            )
+        self._submit(b"", Checkpoint.capture(run))
+
+    @classmethod
+    def resume(
+        cls, reader: SaveReader, run: DeckRun, checkpoint_interval: int = 256
+    ) -> "SaveWriter":
+        """Continue appending to a save file that a run was restored from
+
+        Any incomplete record at the end of the file is discarded.
+        """
+        return cls(
+            reader.filepath,
+            run,
+            compress=reader.header.compressed,
+            checkpoint_interval=checkpoint_interval,
+            _resume=reader,
+        )
+
+    def save(self, run: DeckRun) -> None:
+        """Append the swipes made since the last save
+
+        A checkpoint is appended as well once enough swipes have been
+        made since the last one, or if the run has ended.
+        """
+        new_swipes = run.history[self.saved_swipes :]
+
+        if not new_swipes:
+            return
+
+        records = b"".join(
+            RECORD.pack(SWIPE_RECORD, card_index << 1 | accept)
+            for card_index, accept in new_swipes
+        )
+        self.saved_swipes = len(run.history)
+
+        checkpoint: Optional[Checkpoint] = None
+        if (
+            run.ending is not None
+            or self.saved_swipes - self.checkpoint_swipes >= self.checkpoint_interval
+        ):
+            checkpoint = Checkpoint.capture(run)
+            self.checkpoint_swipes = self.saved_swipes
+
+        self._submit(records, checkpoint)
+
+    def flush(self) -> None:
+        """Wait for every pending record to be written
+
+        Raises any error that occurred while writing.
+        """
+        if self._pending is not None:
+            self._pending.result()
+
+    def close(self) -> None:
+        """Write any pending records and stop the background thread"""
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def _submit(self, records: bytes, checkpoint: Optional[Checkpoint]) -> None:
+        # surface errors from earlier writes instead of dropping them
+        if self._pending is not None and self._pending.done():
+            self._pending.result()
+
+        self._pending = self._executor.submit(self._write, records, checkpoint)
+
+    def _write(self, records: bytes, checkpoint: Optional[Checkpoint]) -> None:
+        """Write records to the end of the file, on the background thread"""
+        if checkpoint is not None:
+            payload = checkpoint.pack()
+            if self.compress:
+                payload = zlib.compress(payload)
+            records += RECORD.pack(CHECKPOINT_RECORD, len(payload)) + payload
+
+        # the file is only open while writing, so a crash loses at most
+        # the records still waiting in the queue
+        with open(self.filepath, "ab") as save_file:
+            save_file.write(records)
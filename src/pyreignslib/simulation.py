@@ -0,0 +1,284 @@
+"""
+Monte Carlo simulation of playthroughs
+
+These helpers play runs of a deck and make accept/reject decisions for
+the player, as fast as possible. They are meant for balancing decks,
+where thousands of playthroughs are needed.
+
+The MonteCarloEngine runs Playthrough objects, which contain only the
+game logic, across a pool of worker processes. Workers import this
+module, so it does not import pygame or the game itself. To play a real
+game mode headlessly instead, see pyreignslib.batch.
+"""
+import collections
+import concurrent.futures
+import dataclasses
+import os
+import random
+from abc import ABC, abstractmethod
+from typing import Callable, Counter, Dict, List, Optional, Tuple
+
+from .deck import Deck, DeckRun
+
+
+class Playthrough(ABC):
+    """The game logic of a single run, without any rendering
+
+    Playthroughs are created and played inside worker processes, so
+    they must not touch the display or create pygame surfaces.
+    """
+
+    @abstractmethod
+    def current_card(self) -> str:
+        """Get the ID of the card being shown to the player"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def swipe(self, accept: bool) -> None:
+        """Accept or reject the current card"""
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def ending(self) -> Optional[str]:
+        """The name of the ending reached, or None if the run continues"""
+        raise NotImplementedError
+
+
+PlaythroughFactory = Callable[[random.Random], Playthrough]
+"""Creates a new playthrough that draws all its randomness from the given RNG"""
+
+PlaythroughPolicy = Callable[[Playthrough, random.Random], bool]
+"""Decides whether to accept (True) or reject (False) the current card"""
+
+MAX_SWIPES_ENDING = "max_swipes"
+"""Ending recorded when a run is cut off at the swipe limit"""
+
+
+def random_decision(playthrough: Playthrough, rng: random.Random) -> bool:
+    """Accept or reject the current card with equal probability"""
+    return rng.random() < 0.5
+
+
+@dataclasses.dataclass
+class PlaythroughStats:
+    """Aggregated outcomes of many playthroughs"""
+
+    runs: int = 0
+    total_swipes: int = 0
+    run_lengths: Counter[int] = dataclasses.field(default_factory=collections.Counter)
+    endings: Counter[str] = dataclasses.field(default_factory=collections.Counter)
+    card_visits: Counter[str] = dataclasses.field(default_factory=collections.Counter)
+
+    @property
+    def mean_run_length(self) -> float:
+        if self.runs == 0:
+            return 0.0
+        return self.total_swipes / self.runs
+
+    @property
+    def min_run_length(self) -> int:
+        return min(self.run_lengths, default=0)
+
+    @property
+    def max_run_length(self) -> int:
+        return max(self.run_lengths, default=0)
+
+    def ending_distribution(self) -> Dict[str, float]:
+        """Get the fraction of runs that reached each ending"""
+        return {
+            ending: count / self.runs for ending, count in self.endings.most_common()
+        }
+
+    def merge(self, other: "PlaythroughStats") -> None:
+        """Add the outcomes from another set of runs to these"""
+        self.runs += other.runs
+        self.total_swipes += other.total_swipes
+        self.run_lengths.update(other.run_lengths)
+        self.endings.update(other.endings)
+        self.card_visits.update(other.card_visits)
+
+
+def get_run_rng(seed: int, run_index: int) -> random.Random:
+    """Get the random number generator for a single run
+
+    Each run is seeded from the engine seed and its own index, so results
+    do not depend on the number of workers or how runs are split up.
+    """
+    return random.Random(f"{seed}:{run_index}")
+
+
+def play(
+    factory: PlaythroughFactory,
+    policy: PlaythroughPolicy,
+    rng: random.Random,
+    max_swipes: int,
+    stats: PlaythroughStats,
+) -> None:
+    """Play a single run to completion and record it in the given stats"""
+    playthrough = factory(rng)
+    swipes = 0
+
+    while playthrough.ending is None and swipes < max_swipes:
+        stats.card_visits[playthrough.current_card()] += 1
+        playthrough.swipe(policy(playthrough, rng))
+        swipes += 1
+
+    stats.runs += 1
+    stats.total_swipes += swipes
+    stats.run_lengths[swipes] += 1
+    stats.endings[playthrough.ending or MAX_SWIPES_ENDING] += 1
+
+
+def _play_chunk(
+    factory: PlaythroughFactory,
+    policy: PlaythroughPolicy,
+    seed: int,
+    first_run: int,
+    run_count: int,
+    max_swipes: int,
+) -> PlaythroughStats:
+    """Play a consecutive range of runs inside a worker process"""
+    stats = PlaythroughStats()
+
+    for run_index in range(first_run, first_run + run_count):
+        play(factory, policy, get_run_rng(seed, run_index), max_swipes, stats)
+
+    return stats
+
+
+# The factory and policy of the engine that started this worker process
+_worker_game: Optional[Tuple[PlaythroughFactory, PlaythroughPolicy]] = None
+
+
+def _init_worker(factory: PlaythroughFactory, policy: PlaythroughPolicy) -> None:
+    """Receive the factory and policy once, when a worker process starts
+
+    Unpickling a factory can be expensive, like compiling a deck, so it
+    is not sent again with every chunk.
+    """
+    global _worker_game
+    _worker_game = factory, policy
+
+
+def _play_worker_chunk(
+    seed: int, first_run: int, run_count: int, max_swipes: int
+) -> PlaythroughStats:
+    """Play a range of runs with the factory and policy given to the worker"""
+    assert _worker_game is not None, "Worker process was not initialized"
+    factory, policy = _worker_game
+    return _play_chunk(factory, policy, seed, first_run, run_count, max_swipes)
+
+
+class MonteCarloEngine:
+    """Plays many independent runs in parallel and aggregates the outcomes
+
+    Parameters
+    ----------
+    factory : PlaythroughFactory
+        Creates each playthrough. It must be picklable, so use a
+        module-level function or class.
+    policy : PlaythroughPolicy
+        Makes the decisions. It must be picklable.
+    seed : int
+        Base seed for all runs. The same seed always produces the same
+        statistics.
+    max_swipes : int
+        Runs that have not ended after this many swipes are cut off
+    workers : int, optional
+        The number of worker processes. Defaults to the number of CPUs.
+        Use 0 to play every run in the current process.
+    """
+
+    __slots__ = "factory", "policy", "seed", "max_swipes", "workers"
+
+    def __init__(
+        self,
+        factory: PlaythroughFactory,
+        policy: PlaythroughPolicy = random_decision,
+        seed: int = 0,
+        max_swipes: int = 1000,
+        workers: Optional[int] = None,
+    ) -> None:
+        self.factory: PlaythroughFactory = factory
+        self.policy: PlaythroughPolicy = policy
+        self.seed: int = seed
+        self.max_swipes: int = max_swipes
+        self.workers: Optional[int] = workers
+
+    def run(self, runs: int, chunk_size: Optional[int] = None) -> PlaythroughStats:
+        """Play the given number of runs
+
+        Parameters
+        ----------
+        runs : int
+            The number of independent runs to play
+        chunk_size : int, optional
+            The number of runs sent to a worker at a time. Defaults to
+            splitting the runs evenly with a few chunks per worker.
+        """
+        if self.workers == 0:
+            return _play_chunk(
+                self.factory, self.policy, self.seed, 0, runs, self.max_swipes
+            )
+
+        workers = self.workers or os.cpu_count() or 1
+
+        if chunk_size is None:
+            chunk_size = max(1, runs // (workers * 4))
+
+        stats = PlaythroughStats()
+
+        with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(self.factory, self.policy)
+        ) as executor:
+            futures: List["concurrent.futures.Future[PlaythroughStats]"] = [
+                executor.submit(
+                    _play_worker_chunk,
+                    self.seed,
+                    first_run,
+                    min(chunk_size, runs - first_run),
+                    self.max_swipes,
+                )
+                for first_run in range(0, runs, chunk_size)
+            ]
+
+            for future in concurrent.futures.as_completed(futures):
+                stats.merge(future.result())
+
+        return stats
+
+
+class DeckPlaythrough(Playthrough):
+    """A playthrough of a deck of cards"""
+
+    __slots__ = "run"
+
+    def __init__(self, deck: Deck, rng: random.Random) -> None:
+        self.run: DeckRun = DeckRun(deck, rng)
+
+    def current_card(self) -> str:
+        return self.run.card.card_id
+
+    def swipe(self, accept: bool) -> None:
+        self.run.swipe(accept)
+
+    @property
+    def ending(self) -> Optional[str]:
+        return self.run.ending
+
+
+class DeckPlaythroughFactory:
+    """Creates playthroughs of a deck for a MonteCarloEngine
+
+    Decks are compiled when they are unpickled, which the engine does
+    once per worker process rather than once per chunk.
+    """
+
+    __slots__ = "deck"
+
+    def __init__(self, deck: Deck) -> None:
+        self.deck: Deck = deck
+
+    def __call__(self, rng: random.Random) -> DeckPlaythrough:
+        return DeckPlaythrough(self.deck, rng)
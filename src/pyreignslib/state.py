@@ -0,0 +1,234 @@
+"""
+Compact game state for card conditions and effects
+
+Resources, flags and counters are all stored as numbers in a single
+NumPy array, indexed by integer IDs that are interned from their names
+when a deck is loaded. A flag is set when its value is non-zero.
+
+Conditions that compare a single value to a constant are stored as
+Condition records, so that the conditions of a whole deck can be checked
+against the state at once with a few vectorized comparisons. See
+pyreignslib.expressions for how cards describe their conditions and
+effects.
+"""
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+COMPARISONS: Dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+class SymbolTable:
+    """Interns names of resources, flags and counters to integer IDs"""
+
+    __slots__ = "names", "_ids"
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def intern(self, name: str) -> int:
+        """Get the ID of a name, assigning a new one if needed"""
+        symbol = self._ids.get(name)
+
+        if symbol is None:
+            symbol = len(self.names)
+            self.names.append(name)
+            self._ids[name] = symbol
+
+        return symbol
+
+    def get(self, name: str) -> Optional[int]:
+        """Get the ID of a name, or None if it has not been interned"""
+        return self._ids.get(name)
+
+
+class GameState:
+    """The values of all resources, flags and counters in a run
+
+    Parameters
+    ----------
+    symbols : SymbolTable
+        The names used by the deck being played. Names that are not in
+        the table yet are added when they are first set.
+    """
+
+    __slots__ = "symbols", "values"
+
+    def __init__(self, symbols: SymbolTable) -> None:
+        self.symbols: SymbolTable = symbols
+        self.values: np.ndarray = np.zeros(max(len(symbols), 8), dtype=np.float64)
+
+    def reserve(self, symbol: int) -> None:
+        """Make sure the values array has room for the given symbol"""
+        if symbol >= len(self.values):
+            values = np.zeros(max(symbol + 1, len(self.values) * 2), dtype=np.float64)
+            values[: len(self.values)] = self.values
+            self.values = values
+
+    def get(self, name: str, default: float = 0.0) -> float:
+        """Get the value of a resource, flag or counter"""
+        symbol = self.symbols.get(name)
+
+        if symbol is None or symbol >= len(self.values):
+            return default
+
+        return float(self.values[symbol])
+
+    def set(self, name: str, value: float) -> None:
+        """Set the value of a resource, flag or counter"""
+        symbol = self.symbols.intern(name)
+        self.reserve(symbol)
+        self.values[symbol] = value
+
+    def add(self, name: str, amount: float) -> None:
+        """Add to the value of a resource or counter"""
+        symbol = self.symbols.intern(name)
+        self.reserve(symbol)
+        self.values[symbol] += amount
+
+    def is_set(self, name: str) -> bool:
+        """Check if a flag is set"""
+        return self.get(name) != 0
+
+    def copy(self) -> "GameState":
+        """Create an independent copy of this state"""
+        state = GameState.__new__(GameState)
+        state.symbols = self.symbols
+        state.values = self.values.copy()
+        return state
+
+
+class Condition(NamedTuple):
+    """A comparison between a value in the state and a constant"""
+
+    symbol: int
+    op: str
+    value: float
+
+
+class ConditionTable:
+    """The conditions of many cards, stored for vectorized evaluation
+
+    Conditions are stored as flat arrays of symbols, operators and
+    constants, sorted by card. Evaluating the table compares conditions
+    to the state with one NumPy operation per operator, either for every
+    card or only for the cards given to evaluate_cards().
+
+    Parameters
+    ----------
+    conditions : Sequence[Sequence[Condition]]
+        The conditions of each card. A card is eligible when all of its
+        conditions hold.
+    """
+
+    __slots__ = (
+        "card_count",
+        "max_symbol",
+        "_comparisons",
+        "_offsets",
+        "_cards",
+        "_symbols",
+        "_ops",
+        "_values",
+    )
+
+    def __init__(self, conditions: Sequence[Sequence[Condition]]) -> None:
+        self.card_count: int = len(conditions)
+        self.max_symbol: int = max(
+            (c.symbol for card_conditions in conditions for c in card_conditions),
+            default=-1,
+        )
+
+        ops = sorted({c.op for card_conditions in conditions for c in card_conditions})
+        op_codes = {op: code for code, op in enumerate(ops)}
+        self._comparisons: List[Callable[[np.ndarray, np.ndarray], np.ndarray]] = [
+            COMPARISONS[op] for op in ops
+        ]
+
+        rows = [
+            (card_index, condition)
+            for card_index, card_conditions in enumerate(conditions)
+            for condition in card_conditions
+        ]
+        self._offsets: np.ndarray = np.zeros(self.card_count + 1, dtype=np.intp)
+        np.cumsum([len(c) for c in conditions], out=self._offsets[1:])
+        self._cards: np.ndarray = np.array([r[0] for r in rows], dtype=np.intp)
+        self._symbols: np.ndarray = np.array([r[1].symbol for r in rows], dtype=np.intp)
+        self._ops: np.ndarray = np.array(
+            [op_codes[r[1].op] for r in rows], dtype=np.uint8
+        )
+        self._values: np.ndarray = np.array(
+            [r[1].value for r in rows], dtype=np.float64
+        )
+
+    def evaluate(self, state: GameState) -> np.ndarray:
+        """Check which cards have all of their conditions met
+
+        Returns
+        -------
+        np.ndarray
+            A boolean array with one entry per card
+        """
+        return self._evaluate_rows(
+            state, slice(None), self._cards, np.ones(self.card_count, dtype=bool)
+        )
+
+    def evaluate_cards(self, state: GameState, cards: np.ndarray) -> np.ndarray:
+        """Check whether some of the cards have all of their conditions met
+
+        Only the conditions of the given cards are compared to the state.
+
+        Parameters
+        ----------
+        state : GameState
+            The state to check the conditions against
+        cards : np.ndarray
+            The indices of the cards to check
+
+        Returns
+        -------
+        np.ndarray
+            A boolean array with one entry per card in cards
+        """
+        starts = self._offsets[cards]
+        counts = self._offsets[cards + 1] - starts
+        owners = np.repeat(np.arange(len(cards)), counts)
+        # the rows of each card are contiguous, so each row is its card's
+        # first row plus its position among that card's rows
+        firsts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        rows = firsts + np.arange(len(owners))
+        return self._evaluate_rows(state, rows, owners, np.ones(len(cards), dtype=bool))
+
+    def _evaluate_rows(
+        self,
+        state: GameState,
+        rows: Union[slice, np.ndarray],
+        owners: np.ndarray,
+        eligible: np.ndarray,
+    ) -> np.ndarray:
+        """Clear the entry of eligible for each failed row's owner"""
+        state.reserve(self.max_symbol)
+        ops = self._ops[rows]
+        values = state.values[self._symbols[rows]]
+        constants = self._values[rows]
+
+        for code, compare in enumerate(self._comparisons):
+            matching = ops == code
+            failed = ~compare(values[matching], constants[matching])
+            eligible[owners[matching][failed]] = False
+
+        return eligible
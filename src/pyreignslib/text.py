@@ -0,0 +1,406 @@
+"""
+Text layout and caching for wrapped, pre-rendered text
+
+Wrapping a string to a width and rendering each line with pygame.font
+is expensive, yet most of the text on screen is the same from one
+frame to the next. Layouts are computed by measuring whole words with
+a FontManager (see pyreignslib.fonts), and the results are kept around
+so that drawing previously seen text is just a handful of blits.
+"""
+import re
+import weakref
+from collections import OrderedDict
+from typing import (
+    Dict,
+    Hashable,
+    List,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+import pygame
+import pygame.color
+import pygame.font
+import pygame.surface
+
+from .fonts import FontManager, FontMetrics, default_font_manager
+
+TextLayoutKey = Tuple[
+    str,
+    FontManager,
+    pygame.font.Font,
+    Tuple[int, int, int, int],
+    int,
+    bool,
+    Optional[Tuple[int, int, int, int]],
+]
+
+_WORD_PATTERN = re.compile(r"\S+\s*")
+
+
+class WordMetrics:
+    """Caches the rendered widths of words for a single font
+
+    Words are measured by a FontManager, which holds its lock while it
+    asks the font.
+
+    Parameters
+    ----------
+    font : pygame.font.Font
+        The font to measure with
+    max_words : int
+        The number of widths kept before the cache is cleared
+    fonts : FontManager, optional
+        The font manager that measures the words. Defaults to the shared
+        default_font_manager.
+    """
+
+    __slots__ = "font", "max_words", "glyphs", "space_width", "_widths"
+
+    def __init__(
+        self,
+        font: pygame.font.Font,
+        max_words: int = 4096,
+        fonts: Optional[FontManager] = None,
+    ) -> None:
+        self.font: pygame.font.Font = font
+        self.max_words: int = max_words
+        self.glyphs: FontMetrics = (fonts or default_font_manager).get_metrics(font)
+        self.space_width: int = self.glyphs.width(" ")
+        self._widths: Dict[str, int] = {}
+
+    def width(self, word: str) -> int:
+        """Get the width of a word in pixels"""
+        width = self._widths.get(word)
+
+        if width is None:
+            if len(self._widths) >= self.max_words:
+                self._widths.clear()
+            width = self.glyphs.width(word)
+            self._widths[word] = width
+
+        return width
+
+    def merge(self, other: "WordMetrics") -> None:
+        """Add the widths measured by another cache for the same font
+
+        Lets a worker thread measure words into a cache of its own,
+        which the main thread then merges into the shared one.
+        """
+        if len(self._widths) + len(other._widths) > self.max_words:
+            self._widths.clear()
+        self._widths.update(other._widths)
+
+
+_FontWordMetrics = MutableMapping[pygame.font.Font, WordMetrics]
+
+_font_metrics: "weakref.WeakKeyDictionary[FontManager, _FontWordMetrics]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_word_metrics(
+    font: pygame.font.Font, fonts: Optional[FontManager] = None
+) -> WordMetrics:
+    """Get the shared word width cache for a font
+
+    Each font manager has its own caches, since they measure with their
+    own fonts. Defaults to the default_font_manager.
+    """
+    fonts = fonts or default_font_manager
+    manager_metrics: Optional[_FontWordMetrics] = _font_metrics.get(fonts)
+
+    if manager_metrics is None:
+        manager_metrics = weakref.WeakKeyDictionary()
+        _font_metrics[fonts] = manager_metrics
+
+    metrics = manager_metrics.get(font)
+
+    if metrics is None:
+        metrics = WordMetrics(font, fonts=fonts)
+        manager_metrics[font] = metrics
+
+    return metrics
+
+
+class LaidOutLine(NamedTuple):
+    """A single wrapped line of text"""
+
+    start: int
+    """Index of the first character of this line within the source text"""
+
+    text: str
+    """The characters on this line"""
+
+    position: Tuple[int, int]
+    """Offset of the line from the top-left corner of the layout area"""
+
+
+class TextLayout:
+    """Wrapped lines of text that can be computed once and drawn many times
+
+    Parameters
+    ----------
+    text : str
+        The source text
+    lines : List[LaidOutLine]
+        The lines that fit in the layout area
+    leftover : str
+        Text that did not fit in the layout area
+    line_height : int
+        The height of a single line in pixels
+    """
+
+    __slots__ = "text", "lines", "leftover", "line_height"
+
+    def __init__(
+        self, text: str, lines: List[LaidOutLine], leftover: str, line_height: int
+    ) -> None:
+        self.text: str = text
+        self.lines: List[LaidOutLine] = lines
+        self.leftover: str = leftover
+        self.line_height: int = line_height
+
+    def render(
+        self,
+        font: pygame.font.Font,
+        color: pygame.color.Color,
+        antialias: bool = False,
+        background: Optional[pygame.color.Color] = None,
+        fonts: Optional[FontManager] = None,
+    ) -> List[pygame.surface.Surface]:
+        """Render each line to its own surface
+
+        Lines are rendered by fonts, or by the default font manager.
+        """
+        fonts = fonts or default_font_manager
+
+        return [
+            fonts.render_line(line.text, font, color, antialias, background)
+            for line in self.lines
+        ]
+
+
+def wrap_text(
+    text: str,
+    font: pygame.font.Font,
+    width: int,
+    metrics: Optional[WordMetrics] = None,
+    fonts: Optional[FontManager] = None,
+) -> List[Tuple[int, str]]:
+    """Break text into lines that fit within a width
+
+    Lines are measured a word at a time using cached word widths. Words
+    that are wider than the area are broken at the last character that
+    fits.
+
+    Words are measured with metrics if given, and otherwise with the
+    shared word widths of fonts, or of the default font manager.
+
+    Returns
+    -------
+    List[Tuple[int, str]]
+        The index of the first character and the text of each line
+    """
+    if metrics is None:
+        metrics = get_word_metrics(font, fonts)
+
+    lines: List[Tuple[int, str]] = []
+    line_start = 0
+    line_width = 0
+    line_words = 0
+
+    for match in _WORD_PATTERN.finditer(text):
+        token = match.group()
+        word = token.rstrip()
+        trailing = len(token) - len(word)
+        word_start = match.start()
+        word_width = metrics.width(word)
+
+        if word_start > line_start:
+            # summed word widths can be off by a pixel per word because of
+            # sub-pixel advances and kerning, so measure the whole line
+            # near the edge
+            estimate = line_width + word_width
+            if width > estimate >= width - 2 * line_words:
+                estimate = metrics.glyphs.width(text[line_start:word_start] + word)
+
+            # wrap before this word if it would reach the edge of the area
+            if estimate >= width:
+                lines.append((line_start, text[line_start:word_start]))
+                line_start = word_start
+                line_width = 0
+                line_words = 0
+
+        # break words that are too wide to fit on a line by themselves
+        while word_width >= width and len(word) > 1:
+            count = metrics.glyphs.fit(word, width)
+            lines.append((line_start, text[line_start : word_start + count]))
+            word_start += count
+            line_start = word_start
+            word = word[count:]
+            word_width = metrics.width(word)
+
+        line_width += word_width + trailing * metrics.space_width
+        line_words += 1
+
+    if line_start < len(text):
+        lines.append((line_start, text[line_start:]))
+
+    return lines
+
+
+def layout_text(
+    text: str,
+    font: pygame.font.Font,
+    width: int,
+    height: Optional[int] = None,
+    line_spacing: int = -2,
+    metrics: Optional[WordMetrics] = None,
+    fonts: Optional[FontManager] = None,
+) -> TextLayout:
+    """Wrap text and position its lines within an area
+
+    Parameters
+    ----------
+    text : str
+        The text to lay out
+    font : pygame.font.Font
+        The font used to measure the text
+    width : int
+        The width of the area in pixels
+    height : int, optional
+        The height of the area in pixels. Lines that do not fit are
+        returned as leftover text. If None, all lines are kept.
+    line_spacing : int
+        Extra space between lines in pixels
+    metrics : WordMetrics, optional
+        The word width cache to use for measuring
+    fonts : FontManager, optional
+        The font manager whose word widths are used if metrics is not
+        given. Defaults to the default_font_manager.
+    """
+    if metrics is None:
+        metrics = get_word_metrics(font, fonts)
+
+    line_height = metrics.glyphs.line_height
+    lines: List[LaidOutLine] = []
+    y = 0
+
+    for start, line in wrap_text(text, font, width, metrics):
+        if height is not None and y + line_height > height:
+            return TextLayout(text, lines, text[start:], line_height)
+
+        lines.append(LaidOutLine(start, line, (0, y)))
+        y += line_height + line_spacing
+
+    return TextLayout(text, lines, "", line_height)
+
+
+class RenderedText(NamedTuple):
+    """A text layout and the rendered image of each of its lines"""
+
+    layout: TextLayout
+    images: List[pygame.surface.Surface]
+
+
+class TextLayoutCache:
+    """Least-recently-used cache of wrapped and rendered text
+
+    Parameters
+    ----------
+    max_entries : int
+        The maximum number of text blocks kept before the least recently
+        used one is evicted
+    """
+
+    __slots__ = "max_entries", "hits", "misses", "_entries"
+
+    def __init__(self, max_entries: int = 128) -> None:
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: "OrderedDict[Hashable, RenderedText]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[RenderedText]:
+        """Get a cached entry and mark it as recently used"""
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, entry: RenderedText) -> None:
+        """Add an entry, evicting the least recently used ones if full"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def make_layout_key(
+    text: str,
+    font: pygame.font.Font,
+    color: pygame.color.Color,
+    width: int,
+    antialias: bool,
+    background: Optional[pygame.color.Color],
+    fonts: Optional[FontManager] = None,
+) -> TextLayoutKey:
+    """Create the key used to look up text in a TextLayoutCache
+
+    Text is measured and rendered by a font manager, so the manager is
+    part of the key. Defaults to the default_font_manager.
+    """
+    return (
+        text,
+        fonts or default_font_manager,
+        font,
+        tuple(pygame.Color(color)),
+        width,
+        antialias,
+        tuple(pygame.Color(background)) if background else None,
+    )
+
+
+def render_text(
+    text: str,
+    font: pygame.font.Font,
+    color: pygame.color.Color,
+    width: int,
+    antialias: bool = False,
+    background: Optional[pygame.color.Color] = None,
+    fonts: Optional[FontManager] = None,
+    metrics: Optional[WordMetrics] = None,
+) -> RenderedText:
+    """Wrap text to the given width and render every line
+
+    Words are measured with metrics if given, and otherwise with the
+    shared word widths of fonts.
+    """
+    layout = layout_text(text, font, width, metrics=metrics, fonts=fonts)
+    return RenderedText(
+        layout, layout.render(font, color, antialias, background, fonts)
+    )
+
+
+default_layout_cache = TextLayoutCache()
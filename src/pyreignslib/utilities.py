@@ -13,6 +13,9 @@ import pygame.image
 import pygame.surface
 import pygame.transform
 
+from .fonts import FontManager
+from .text import TextLayoutCache, default_layout_cache, make_layout_key, render_text
+
 
 def load_png(
     filepath: Union[str, pathlib.Path], scale: int = 1
@@ -52,45 +55,38 @@ def draw_text(
     font: pygame.font.Font,
     antialias: bool = False,
     background: Optional[pygame.color.Color] = None,
+    cache: Optional[TextLayoutCache] = default_layout_cache,
+    fonts: Optional[FontManager] = None,
 ) -> str:
     """Draws some text to an area of a Surface
 
     This function automatically wraps words and returns any text
-    that did not get blitted to the surface
+    that did not get blitted to the surface. Wrapped and rendered lines
+    are kept in the given cache so redrawing the same text is cheap.
+    Pass None as the cache to always re-render. Lines are measured and
+    rendered by fonts, or by the default font manager.
     """
     rect = pygame.rect.Rect(rect)
-    y = rect.top
-    lineSpacing = -2
-
-    # get the height of the font
-    fontHeight = font.size("Tg")[1]
-
-    while text:
-        i = 1
 
-        # determine if the row of text will be outside our area
-        if y + fontHeight > rect.bottom:
-            break
+    key = make_layout_key(text, font, color, rect.width, antialias, background, fonts)
+    rendered = cache.get(key) if cache is not None else None
 
-        # determine maximum width of line
-        while font.size(text[:i])[0] < rect.width and i < len(text):
-            i += 1
+    if rendered is None:
+        rendered = render_text(
+            text, font, color, rect.width, antialias, background, fonts
+        )
+        if cache is not None:
+            cache.put(key, rendered)
 
-        # if we've wrapped the text, then adjust the wrap to the last word
-        if i < len(text):
-            i = text.rfind(" ", 0, i) + 1
+    layout = rendered.layout
 
-        # render the line and blit it to the surface
-        if background:
-            image = font.render(text[:i], True, color, background)
-            image.set_colorkey(background)
-        else:
-            image = font.render(text[:i], antialias, color)
+    for line, image in zip(layout.lines, rendered.images):
+        y = rect.top + line.position[1]
 
-        surface.blit(image, (rect.left, y))
-        y += fontHeight + lineSpacing
+        # determine if the row of text will be outside our area
+        if y + layout.line_height > rect.bottom:
+            return text[line.start :]
 
-        # remove the text we just blitted
-        text = text[i:]
+        surface.blit(image, (rect.left + line.position[0], y))
 
-    return text
+    return ""
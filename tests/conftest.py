@@ -0,0 +1,29 @@
+import os
+
+import pygame
+import pytest
+
+from pyreignslib.core import Game, GameMode, GameSettings
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+
+class IdleMode(GameMode):
+    """A mode that draws nothing, for tests that set up their own"""
+
+    def update(self, elapsed_time: float) -> None:
+        pass
+
+    def draw(self) -> None:
+        pass
+
+
+@pytest.fixture
+def game():
+    pygame.init()
+    game = Game(
+        GameSettings((480, 720), 60, "test", "test", headless=True, seed=1),
+        IdleMode,
+    )
+    yield game
+    game.quit()
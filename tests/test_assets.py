@@ -0,0 +1,104 @@
+import pygame
+import pytest
+
+from pyreignslib.assets import AssetManager, AssetManifest, RawImageCache
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    image = pygame.Surface((4, 3), pygame.SRCALPHA)
+    image.fill((10, 20, 30, 128))
+    image.set_at((1, 2), (200, 100, 50, 255))
+    pygame.image.save(image, str(tmp_path / "art.png"))
+    pygame.image.save(pygame.Surface((2, 2)), str(tmp_path / "icon.png"))
+
+    return AssetManifest.from_dict(
+        {"images": {"art": "art.png", "icon": {"path": "icon.png", "scale": 2}}},
+        tmp_path,
+    )
+
+
+def _pixels(image):
+    return pygame.image.tobytes(image, "RGBA")
+
+
+def test_built_images_load_unchanged(tmp_path, manifest):
+    cache = RawImageCache(tmp_path / "cache")
+    sizes = {"art": [None, (8, 6)], "icon": [None]}
+
+    assert cache.build(manifest, sizes) == 3
+    assert cache.build(manifest, sizes) == 0
+
+    art = pygame.image.load(str(tmp_path / "art.png"))
+    assert _pixels(cache.load(manifest["art"], None)) == _pixels(art)
+    assert _pixels(cache.load(manifest["art"], (8, 6))) == _pixels(
+        pygame.transform.scale(art, (8, 6))
+    )
+    assert cache.load(manifest["icon"], None).get_size() == (4, 4)
+    assert cache.load(manifest["icon"], (1, 1)) is None
+
+
+def test_corrupt_files_are_not_loaded(tmp_path, manifest):
+    cache = RawImageCache(tmp_path / "cache")
+    cache.build(manifest, {"art": [None]})
+    path = cache.get_path(manifest["art"], None)
+    data = path.read_bytes()
+
+    path.write_bytes(data[:-1])
+    assert cache.load(manifest["art"], None) is None
+
+    path.write_bytes(b"XXXX" + data[4:])
+    assert cache.load(manifest["art"], None) is None
+
+    path.write_bytes(data[:5])
+    assert cache.load(manifest["art"], None) is None
+
+    # rebuilding only fills in missing files
+    path.unlink()
+    assert cache.build(manifest, {"art": [None]}) == 1
+    assert cache.load(manifest["art"], None) is not None
+
+
+def test_edited_source_is_not_served_stale_pixels(tmp_path, manifest):
+    cache = RawImageCache(tmp_path / "cache")
+    cache.build(manifest, {"art": [None]})
+
+    pygame.image.save(pygame.Surface((5, 5)), str(tmp_path / "art.png"))
+
+    assert cache.load(manifest["art"], None) is None
+
+
+def test_manifest_entries_need_a_path(tmp_path):
+    with pytest.raises(ValueError):
+        AssetManifest.from_dict({"images": {"art": {"scale": 2}}}, tmp_path)
+
+
+def test_images_are_decoded_when_first_requested(tmp_path, manifest):
+    assets = AssetManager(manifest)
+    assert ("art", None) not in assets
+
+    art = assets.get("art")
+    assert ("art", None) in assets
+    assert assets.get("art") is art
+    assert assets.get("icon").get_size() == (4, 4)
+
+    assets.preload(["art"], (8, 6))
+    assert assets.get("art", (8, 6)).get_size() == (8, 6)
+    assets.close()
+
+    with pytest.raises(KeyError):
+        assets.get("missing")
+
+
+def test_least_recently_used_images_are_evicted(tmp_path, manifest):
+    assets = AssetManager(manifest)
+    assets.get("art", (4, 4))
+    assets.get("icon", (4, 4))
+    assets.get("art", (4, 4))
+
+    assets.memory_budget = assets.memory_used
+    assets.get("art", (2, 2))
+
+    assert ("art", (4, 4)) in assets
+    assert ("icon", (4, 4)) not in assets
+    assert assets.memory_used <= assets.memory_budget
@@ -0,0 +1,54 @@
+import itertools
+
+import pygame
+import pytest
+
+from pyreignslib.atlas import TextureAtlas
+
+
+def _image(size, color):
+    image = pygame.Surface(size, pygame.SRCALPHA)
+    image.fill(color)
+    return image
+
+
+def test_pack_overflows_into_new_pages():
+    atlas = TextureAtlas((32, 32))
+    colors = [(i * 20, 255 - i * 20, 7, 255) for i in range(10)]
+    atlas.pack((i, _image((15, 15), color)) for i, color in enumerate(colors))
+
+    # four 15x15 images fit on a 32x32 page with padding
+    assert len(atlas.pages) == 3
+    assert [atlas.get_region(i).page for i in range(10)] == [0] * 4 + [1] * 4 + [2] * 2
+
+    for i, color in enumerate(colors):
+        image = atlas.get(i)
+        assert image.get_size() == (15, 15)
+        assert image.get_at((0, 0)) == color
+        assert image.get_at((14, 14)) == color
+
+    for page in range(3):
+        rects = [
+            region.rect for region in atlas.regions.values() if region.page == page
+        ]
+        for a, b in itertools.combinations(rects, 2):
+            assert not a.colliderect(b)
+
+
+def test_images_larger_than_a_page_get_their_own():
+    atlas = TextureAtlas((32, 32))
+    atlas.pack([("small", _image((8, 8), (1, 2, 3, 255)))])
+    atlas.add("large", _image((40, 10), (4, 5, 6, 255)))
+    atlas.add("after", _image((8, 8), (7, 8, 9, 255)))
+
+    assert atlas.get_region("large").page == 1
+    assert atlas.pages[1].get_size() == (40, 10)
+    assert atlas.get_region("after").page == 0
+
+
+def test_keys_are_only_packed_once():
+    atlas = TextureAtlas((32, 32))
+    atlas.add("a", _image((8, 8), (1, 2, 3, 255)))
+
+    with pytest.raises(KeyError):
+        atlas.add("a", _image((8, 8), (1, 2, 3, 255)))
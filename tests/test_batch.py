@@ -0,0 +1,41 @@
+import pygame
+
+from pyreignslib.batch import BatchRunner, scripted_policy
+from pyreignslib.core import GameSettings
+from pyreignslib.deck import CardData, Deck
+from pyreignslib.prototype_mode import PrototypeMode
+
+DECK = Deck(
+    [
+        CardData("tax", "?", accept_effects=("gold += 1",)),
+        CardData("feast", "?", reject_effects=("gold -= 1",)),
+    ]
+)
+
+
+def _setup(game):
+    game.context.deck = DECK
+    game.context.images["card-bg"] = pygame.Surface((10, 10))
+
+
+def test_scripted_run_makes_each_decision_in_order():
+    pygame.init()
+    decisions = [True, False, False, True, True]
+    runner = BatchRunner(
+        GameSettings((480, 720), 60, "test", "test", seed=1),
+        PrototypeMode,
+        scripted_policy(decisions),
+        setup=_setup,
+    )
+
+    try:
+        result = runner.run(10)
+        history = runner.game.mode.run.history
+    finally:
+        runner.close()
+
+    # the policy runs out of decisions before the requested swipes
+    assert result.swipes == 5
+    assert result.accepted == 3
+    assert result.rejected == 2
+    assert [accept for _, accept in history] == decisions
@@ -0,0 +1,64 @@
+import random
+
+import pygame
+
+from pyreignslib.card import Card, CardSpriteGroup, RotationCache
+
+WINDOW_SIZE = (480, 720)
+
+
+def _create_groups(count: int):
+    rng = random.Random(1)
+    image = pygame.Surface((20, 20))
+    groups = []
+
+    for batched in (True, False):
+        cards = [Card(image, WINDOW_SIZE, "?") for _ in range(count)]
+        for i, card in enumerate(cards):
+            card.reset_speed = 4.0 + i % 5
+        groups.append(
+            CardSpriteGroup(cards, rotation_cache=RotationCache(), batched=batched)
+        )
+
+    return rng, groups
+
+
+def test_batched_update_matches_card_update():
+    rng, (batched, unbatched) = _create_groups(12)
+
+    for step in range(120):
+        if step % 20 == 0:
+            # throw some cards, and drag or let go of others
+            for i in range(len(batched.cards)):
+                center = (rng.randint(-100, 580), rng.randint(-100, 820))
+                dragged = rng.random() < 0.3
+                for group in (batched, unbatched):
+                    group.move_card(group.cards[i], center)
+                    group.set_dragged(group.cards[i], dragged)
+
+        if step == 50:
+            for group in (batched, unbatched):
+                group.set_target(group.cards[0], (100, 100))
+
+        elapsed_time = rng.choice((1 / 60, 1 / 30, 0.1))
+        batched.update(elapsed_time=elapsed_time)
+        unbatched.update(elapsed_time=elapsed_time)
+
+        for card, expected in zip(batched.cards, unbatched.cards):
+            assert card.rect.center == expected.rect.center
+            assert card.rotation == expected.rotation
+            assert card.previous_center == expected.previous_center
+            assert card.previous_rotation == expected.previous_rotation
+
+
+def test_batched_update_only_touches_moving_cards():
+    _, (group, _) = _create_groups(3)
+    group.update(elapsed_time=1 / 60)
+    group.update(elapsed_time=1 / 60)
+    resting = group.cards[0]
+    resting.rect.center = (0, 0)
+
+    group.update(elapsed_time=1 / 60)
+
+    # the card was not moved through the group, so the batch skips it
+    assert resting.rect.center == (0, 0)
@@ -0,0 +1,177 @@
+import random
+
+import pygame
+import pytest
+
+from pyreignslib.deck import NO_CARDS_ENDING, CardData, Deck, DeckRun
+from pyreignslib.prototype_mode import NO_CARDS_CARD, PrototypeMode
+
+
+def _draw_excluding(deck: Deck, exclude: int, draws: int = 2000):
+    state = deck.create_state()
+    rng = random.Random(1)
+    return [deck.draw(state, rng, exclude=exclude) for _ in range(draws)]
+
+
+def test_draw_excluding_heavy_card_always_finds_another():
+    deck = Deck([CardData("heavy", "?", weight=10.0), CardData("light", "?")])
+
+    assert set(_draw_excluding(deck, 0)) == {1}
+
+
+def test_draw_excluding_heavy_conditional_card_always_finds_another():
+    deck = Deck(
+        [
+            CardData("heavy", "?", conditions=("!ended",), weight=10.0),
+            CardData("light", "?", conditions=("!ended",)),
+            CardData("other", "?", conditions=("ended",), weight=50.0),
+        ]
+    )
+
+    assert set(_draw_excluding(deck, 0)) == {1}
+
+
+def test_draw_excluding_keeps_relative_odds():
+    deck = Deck(
+        [
+            CardData("a", "?", weight=3.0),
+            CardData("b", "?", weight=1.0),
+            CardData("c", "?", conditions=("!ended",), weight=100.0),
+            CardData("d", "?", conditions=("!ended",), weight=1.0),
+        ]
+    )
+
+    draws = _draw_excluding(deck, 2, draws=10000)
+
+    assert 2 not in draws
+    assert draws.count(0) / draws.count(1) == pytest.approx(3.0, rel=0.15)
+    assert draws.count(0) / draws.count(3) == pytest.approx(3.0, rel=0.15)
+
+
+def test_draw_returns_none_when_only_the_excluded_card_has_weight():
+    deck = Deck([CardData("only", "?"), CardData("never", "?", weight=0.0)])
+
+    assert set(_draw_excluding(deck, 0, draws=100)) == {None}
+
+
+def test_run_does_not_end_while_other_cards_are_eligible():
+    deck = Deck([CardData("heavy", "?", weight=10.0), CardData("light", "?")])
+    run = DeckRun(deck, random.Random(1))
+
+    for _ in range(500):
+        run.swipe(True)
+
+    assert run.ending is None
+
+
+def test_run_ends_when_no_card_is_eligible():
+    deck = Deck(
+        [CardData("once", "?", conditions=("!seen",), accept_effects=("seen",))]
+    )
+    run = DeckRun(deck, random.Random(1))
+
+    run.swipe(True)
+
+    assert run.ending == NO_CARDS_ENDING
+
+
+def _create_conditional_deck(count: int) -> Deck:
+    rng = random.Random(0)
+    cards = []
+    for i in range(count):
+        conditions = [f"stat{rng.randrange(20)} < {rng.randrange(1, 4)}"]
+        if i % 7 == 0:
+            conditions.append(f"max(stat{rng.randrange(20)}, flag{i % 5}) < 2")
+        cards.append(
+            CardData(
+                f"card{i}",
+                "?",
+                conditions=tuple(conditions),
+                accept_effects=(f"stat{rng.randrange(20)} += 1",),
+                reject_effects=(f"flag{rng.randrange(5)}", "stat0 -= 1"),
+                weight=rng.choice((0.5, 1.0, 2.0)),
+            )
+        )
+    return Deck(cards)
+
+
+def test_draw_index_matches_checking_every_card():
+    deck = _create_conditional_deck(600)
+    run = DeckRun(deck, random.Random(1))
+    choices = random.Random(2)
+
+    for _ in range(200):
+        if run.ending is not None:
+            break
+        run.swipe(choices.random() < 0.5)
+
+        assert (run.index.eligible == deck._evaluate_conditional(run.state)).all()
+
+    assert len(run.history) > 20
+
+
+def test_draw_index_sees_changes_made_outside_effects():
+    deck = Deck(
+        [
+            CardData("always", "?"),
+            CardData("rich", "?", conditions=("gold >= 5",), weight=1000.0),
+        ]
+    )
+    state = deck.create_state()
+    index = deck.create_index(state)
+    rng = random.Random(1)
+
+    assert {index.draw(state, rng) for _ in range(50)} == {0}
+
+    state.set("gold", 5)
+
+    assert index.draw(state, rng, exclude=0) == 1
+
+
+def test_peek_does_not_change_the_run():
+    deck = _create_conditional_deck(300)
+    run = DeckRun(deck, random.Random(1))
+    eligible = run.index.eligible.copy()
+
+    next_card = run.peek(True)
+
+    assert (run.index.eligible == eligible).all()
+    run.swipe(True)
+    assert run.card_index == next_card
+
+
+def test_run_with_no_eligible_card_has_no_card():
+    deck = Deck(
+        [
+            CardData("a", "?", conditions=("gold > 5",)),
+            CardData("b", "?", conditions=("gold > 5",)),
+        ]
+    )
+    run = DeckRun(deck, random.Random(1))
+
+    assert run.ending == NO_CARDS_ENDING
+    with pytest.raises(RuntimeError):
+        run.card
+    assert run.peek(True) is None
+
+
+def test_prototype_mode_ignores_swipes_when_no_card_is_eligible(game):
+    game.context.deck = Deck([CardData("a", "?", conditions=("gold > 5",))])
+    game.context.images["card-bg"] = pygame.Surface((10, 10))
+    game.set_mode(PrototypeMode)
+    mode = game.mode
+
+    assert mode.card.prompt_text == NO_CARDS_CARD.prompt
+
+    start = mode.card.rect.center
+    end = (game.context.window.get_width() - 10, start[1])
+    for event_type, attributes in (
+        (pygame.MOUSEBUTTONDOWN, {"button": 1, "pos": start}),
+        (pygame.MOUSEMOTION, {"pos": end, "rel": (0, 0), "buttons": (1, 0, 0)}),
+        (pygame.MOUSEBUTTONUP, {"button": 1, "pos": end}),
+    ):
+        pygame.event.post(pygame.event.Event(event_type, attributes))
+    game.handle_events()
+
+    assert game.mode is mode
+    assert mode.run.history == []
@@ -0,0 +1,111 @@
+import pygame
+
+from pyreignslib.core import GameMode
+from pyreignslib.core.events import coalesce_motion, handles
+
+
+def _motion(pos, rel, buttons=(0, 0, 0)):
+    return pygame.event.Event(
+        pygame.MOUSEMOTION, pos=pos, rel=rel, buttons=buttons, touch=False
+    )
+
+
+def _click(pos):
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)
+
+
+def test_coalesce_merges_runs_of_motion():
+    events = [
+        _motion((1, 1), (1, 1)),
+        _motion((3, 2), (2, 1)),
+        _motion((6, 2), (3, 0), buttons=(1, 0, 0)),
+        _click((6, 2)),
+        _motion((7, 2), (1, 0)),
+        _motion((9, 5), (2, 3)),
+    ]
+
+    merged = coalesce_motion(events)
+
+    assert [event.type for event in merged] == [
+        pygame.MOUSEMOTION,
+        pygame.MOUSEBUTTONDOWN,
+        pygame.MOUSEMOTION,
+    ]
+    assert merged[0].pos == (6, 2)
+    assert merged[0].rel == (6, 2)
+    assert merged[0].buttons == (1, 0, 0)
+    assert merged[1] is events[3]
+    assert merged[2].pos == (9, 5)
+    assert merged[2].rel == (3, 3)
+
+
+def test_coalesce_keeps_single_events():
+    events = [_motion((1, 1), (1, 1)), _click((1, 1))]
+
+    assert coalesce_motion(events) == events
+    assert coalesce_motion([]) == []
+
+
+class ClickMode(GameMode):
+    filter_events = True
+
+    def __init__(self, context) -> None:
+        super().__init__(context)
+        self.handled = []
+
+    def update(self, elapsed_time: float) -> None:
+        pass
+
+    def draw(self) -> None:
+        pass
+
+    @handles(pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+    def on_click(self, event: pygame.event.Event) -> None:
+        self.handled.append(("click", event.type))
+
+    @handles(pygame.KEYDOWN)
+    def on_key(self, event: pygame.event.Event) -> None:
+        self.handled.append(("key", event.type))
+
+
+class KeyMode(ClickMode):
+    @handles(pygame.KEYDOWN)
+    def on_any_key(self, event: pygame.event.Event) -> None:
+        self.handled.append(("any key", event.type))
+
+
+def test_handlers_are_looked_up_by_event_type(game):
+    mode = ClickMode(game.context)
+
+    for event_type in (pygame.MOUSEBUTTONUP, pygame.KEYDOWN, pygame.KEYUP):
+        mode.handle_event(pygame.event.Event(event_type))
+
+    assert mode.handled == [
+        ("click", pygame.MOUSEBUTTONUP),
+        ("key", pygame.KEYDOWN),
+    ]
+    assert mode.get_allowed_events() == {
+        pygame.MOUSEBUTTONDOWN,
+        pygame.MOUSEBUTTONUP,
+        pygame.KEYDOWN,
+    }
+
+
+def test_subclass_handlers_replace_inherited_ones(game):
+    mode = KeyMode(game.context)
+
+    mode.handle_event(pygame.event.Event(pygame.KEYDOWN))
+    mode.handle_event(pygame.event.Event(pygame.MOUSEBUTTONDOWN))
+
+    assert mode.handled == [
+        ("any key", pygame.KEYDOWN),
+        ("click", pygame.MOUSEBUTTONDOWN),
+    ]
+
+
+def test_filtering_modes_only_receive_their_events(game):
+    game.set_mode(ClickMode)
+
+    assert pygame.event.get_blocked(pygame.MOUSEMOTION)
+    assert not pygame.event.get_blocked(pygame.MOUSEBUTTONDOWN)
+    assert not pygame.event.get_blocked(pygame.QUIT)
@@ -0,0 +1,132 @@
+import pytest
+
+from pyreignslib.expressions import (
+    Binary,
+    Call,
+    ExpressionCompiler,
+    ExpressionError,
+    Name,
+    Number,
+    Unary,
+    fold_constants,
+    parse_expression,
+    parse_statement,
+)
+from pyreignslib.state import Condition, GameState, SymbolTable
+
+
+def _evaluate(source, **values):
+    symbols = SymbolTable()
+    state = GameState(symbols)
+    for name, value in values.items():
+        state.set(name, value)
+    return ExpressionCompiler(symbols).compile_expression(source)(state.values)
+
+
+def _apply(source, **values):
+    symbols = SymbolTable()
+    state = GameState(symbols)
+    for name, value in values.items():
+        state.set(name, value)
+    ExpressionCompiler(symbols).compile_effect(source)(state)
+    return state
+
+
+def test_precedence():
+    assert parse_expression("a + b * 2 > 3 and not c") == Binary(
+        "and",
+        Binary(
+            ">",
+            Binary("+", Name("a"), Binary("*", Name("b"), Number(2.0))),
+            Number(3.0),
+        ),
+        Unary("not", Name("c")),
+    )
+
+
+def test_aliases_and_literals():
+    assert parse_expression("!a && b || true") == parse_expression("not a and b or 1")
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "",
+        "a +",
+        "(a",
+        "a b",
+        "1 < a < 2",
+        "gold $ 2",
+        "unknown(a)",
+        "min()",
+        "max()",
+        "abs()",
+        "abs(a, b)",
+    ],
+)
+def test_invalid_expressions(source):
+    with pytest.raises(ExpressionError):
+        ExpressionCompiler(SymbolTable()).compile_expression(source)
+
+
+@pytest.mark.parametrize(
+    "source",
+    ["", "10", "gold +", "gold == 1", "!gold extra", "gold += 1 2"],
+)
+def test_invalid_statements(source):
+    with pytest.raises(ExpressionError):
+        parse_statement(source)
+
+
+def test_constants_are_folded():
+    assert fold_constants(parse_expression("max(1, 4) * 2 - abs(-3)")) == Number(5.0)
+    assert fold_constants(parse_expression("a and true")) == Name("a")
+    assert fold_constants(parse_expression("a or true")) == Number(1.0)
+    assert fold_constants(parse_expression("min(a, 2 + 1)")) == Call(
+        "min", (Name("a"), Number(3.0))
+    )
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ("gold * 2 + 1", 21.0),
+        ("max(gold, food)", 10.0),
+        ("min(gold)", 10.0),
+        ("max(food, 1, gold)", 10.0),
+        ("abs(food - gold)", 7.0),
+        ("gold % 4", 2.0),
+        ("gold >= 10 and (food > 5 or not at_war)", True),
+        ("missing == 0", True),
+    ],
+)
+def test_evaluation(source, expected):
+    assert _evaluate(source, gold=10, food=3) == expected
+
+
+@pytest.mark.parametrize("source", ["gold / 0", "gold / empty", "gold % empty"])
+def test_division_by_zero_is_zero(source):
+    assert _evaluate(source, gold=10) == 0.0
+
+
+def test_effects():
+    assert _apply("met_king").get("met_king") == 1.0
+    assert _apply("!met_king", met_king=1).get("met_king") == 0.0
+    assert _apply("gold += 5", gold=10).get("gold") == 15.0
+    assert _apply("gold /= 4", gold=10).get("gold") == 2.5
+    assert _apply("gold = gold / population", gold=10).get("gold") == 0.0
+    assert _apply("gold = max(gold, food) * 2", gold=1, food=4).get("gold") == 8.0
+
+
+def test_conditions_are_lowered_to_clauses():
+    symbols = SymbolTable()
+    compiled = ExpressionCompiler(symbols).compile_condition(
+        "met_king and 5 < gold and not at_war and gold * 2 > food"
+    )
+
+    assert compiled.clauses == (
+        Condition(symbols.get("met_king"), "!=", 0.0),
+        Condition(symbols.get("gold"), ">", 5.0),
+        Condition(symbols.get("at_war"), "==", 0.0),
+    )
+    assert compiled.residual is not None
@@ -0,0 +1,195 @@
+import pygame
+import pygame_gui
+import pytest
+
+from pyreignslib.core import GameMode
+from pyreignslib.prototype_mode import PrototypeMode
+
+
+class CountingMode(GameMode):
+    """Records the time step of every update"""
+
+    __slots__ = ("steps",)
+
+    def __init__(self, context) -> None:
+        super().__init__(context)
+        self.steps = []
+
+    def update(self, elapsed_time: float) -> None:
+        self.steps.append(elapsed_time)
+
+    def draw(self) -> None:
+        pass
+
+
+@pytest.fixture
+def fixed_game(game):
+    game.context.settings.update_rate = 50
+    game.set_mode(CountingMode)
+    return game
+
+
+def test_advance_carries_leftover_time_to_the_next_frame(fixed_game):
+    mode = fixed_game.mode
+
+    fixed_game.advance(0.05)
+    assert mode.steps == [pytest.approx(0.02)] * 2
+    assert fixed_game.accumulator == pytest.approx(0.01)
+
+    fixed_game.advance(0.01)
+    assert len(mode.steps) == 3
+    assert fixed_game.accumulator == pytest.approx(0.0)
+
+
+def test_advance_clamps_updates_per_frame(fixed_game):
+    fixed_game.context.settings.max_updates_per_frame = 3
+
+    fixed_game.advance(1.0)
+
+    assert len(fixed_game.mode.steps) == 3
+    assert fixed_game.accumulator == pytest.approx(0.0)
+
+
+def test_advance_sets_interpolation_between_steps(fixed_game):
+    fixed_game.advance(0.01)
+    assert fixed_game.mode.steps == []
+    assert fixed_game.context.interpolation == pytest.approx(0.5)
+
+    fixed_game.advance(0.025)
+    assert len(fixed_game.mode.steps) == 1
+    assert fixed_game.context.interpolation == pytest.approx(0.75)
+
+
+def test_dirty_drawing_updates_moved_cards_and_changed_ui(game, monkeypatch):
+    game.context.settings.dirty_rects = True
+    game.context.images["card-bg"] = pygame.Surface((10, 10))
+    game.set_mode(PrototypeMode)
+    button = pygame_gui.elements.UIButton(
+        pygame.Rect(10, 600, 100, 40), "before", game.context.ui_manager
+    )
+    game.draw()
+    game.draw()
+
+    updated = []
+    monkeypatch.setattr(pygame.display, "update", updated.extend)
+    game.context.settings.headless = False
+    game.draw()
+    assert updated == []
+
+    card = game.mode.card
+    old_rect = card.rect.copy()
+    game.mode.all_cards.move_card(card, (old_rect.centerx + 60, old_rect.centery))
+    button.set_text("after")
+    game.context.ui_manager.update(1 / 60)
+    game.draw()
+
+    def covered(rect):
+        return any(dirty.contains(rect) for dirty in updated)
+
+    assert covered(old_rect)
+    assert covered(card.rect)
+    assert covered(button.rect)
+    # the untouched top of the window is left alone
+    # the untouched top of the window is left alone
+    assert not any(dirty.colliderect((0, 0, 480, 100)) for dirty in updated)
+
+
+class ButtonMode(GameMode):
+    """Records the order its hooks are called in, and owns a button"""
+
+    __slots__ = ("calls", "button")
+
+    def __init__(self, context) -> None:
+        super().__init__(context)
+        self.calls = ["init"]
+        self.button = pygame_gui.elements.UIButton(
+            pygame.Rect(0, 0, 50, 20), type(self).__name__, context.ui_manager
+        )
+
+    def on_enter(self) -> None:
+        self.calls.append("enter")
+
+    def on_exit(self) -> None:
+        self.calls.append("exit")
+
+    def update(self, elapsed_time: float) -> None:
+        pass
+
+    def draw(self) -> None:
+        pass
+
+
+class PersistentMode(ButtonMode):
+    persistent = True
+
+
+class PauseMode(ButtonMode):
+    pass
+
+
+def test_persistent_modes_are_resumed(game):
+    game.set_mode(PersistentMode)
+    persistent = game.mode
+    game.set_mode(PauseMode)
+
+    assert persistent.calls == ["init", "enter", "exit"]
+    assert not persistent.button.visible
+    assert persistent.button.alive()
+
+    game.set_mode(PersistentMode)
+
+    assert game.mode is persistent
+    assert persistent.calls == ["init", "enter", "exit", "enter"]
+    assert persistent.button.visible
+
+
+def test_other_modes_are_rebuilt(game):
+    game.set_mode(PauseMode)
+    first = game.mode
+    game.set_mode(PersistentMode)
+
+    assert not first.button.alive()
+
+    game.set_mode(PauseMode)
+    assert game.mode is not first
+
+
+def test_push_and_pop_suspend_the_mode_below(game):
+    game.set_mode(PersistentMode)
+    below = game.mode
+    game.push_mode(PauseMode)
+    pause = game.mode
+
+    assert game.mode_stack == [below, pause]
+    assert below.calls == ["init", "enter", "exit"]
+    assert not below.button.visible
+
+    game.pop_mode()
+
+    assert game.mode is below
+    assert below.calls == ["init", "enter", "exit", "enter"]
+    assert below.button.visible
+    assert not pause.button.alive()
+
+    with pytest.raises(RuntimeError):
+        game.pop_mode()
+
+
+def test_preloaded_modes_are_built_once_and_hidden(game):
+    game.set_mode(PauseMode)
+    game.preload_mode(PersistentMode)
+    game.preload_mode(PersistentMode)
+    preloaded = game._preloaded_modes[PersistentMode]
+
+    assert preloaded.calls == ["init"]
+    assert not preloaded.button.visible
+
+    game.set_mode(PersistentMode)
+
+    assert game.mode is preloaded
+    assert preloaded.calls == ["init", "enter"]
+    assert preloaded.button.visible
+
+    # the active mode is never preloaded again
+    game.preload_mode(PersistentMode)
+    assert PersistentMode not in game._preloaded_modes
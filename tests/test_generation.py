@@ -0,0 +1,80 @@
+import threading
+
+import pygame
+import pytest
+
+from pyreignslib.core import CHANGE_MODE_EVENT
+from pyreignslib.generation import GenerationPipeline, GenerationStep
+from pyreignslib.main_menu import GeneratingTownMode
+
+
+def test_finish_runs_on_polling_thread_in_order():
+    finished = []
+
+    def make_step(name):
+        return GenerationStep(
+            name,
+            lambda report: None,
+            finish=lambda: finished.append((name, threading.current_thread())),
+        )
+
+    pipeline = GenerationPipeline([make_step("first"), make_step("second")])
+    pipeline.start()
+    assert pipeline.wait(5)
+
+    assert finished == []
+    assert not pipeline.done
+
+    label, progress = pipeline.poll()
+    assert pipeline.done
+    assert (label, progress) == ("second", 1.0)
+    assert finished == [
+        ("first", threading.current_thread()),
+        ("second", threading.current_thread()),
+    ]
+
+
+def test_steps_before_a_failure_are_finished():
+    finished = []
+
+    def fail(report):
+        raise ValueError("broken")
+
+    pipeline = GenerationPipeline(
+        [
+            GenerationStep(
+                "works", lambda report: None, finish=lambda: finished.append(1)
+            ),
+            GenerationStep("fails", fail, finish=lambda: finished.append(2)),
+        ]
+    )
+    pipeline.start()
+    assert pipeline.wait(5)
+
+    with pytest.raises(ValueError):
+        pipeline.poll()
+    assert finished == [1]
+    assert pipeline.done
+
+
+def test_run_finishes_every_step():
+    finished = []
+    pipeline = GenerationPipeline(
+        [GenerationStep("only", lambda report: None, finish=lambda: finished.append(1))]
+    )
+
+    pipeline.run()
+    assert finished == [1]
+    assert pipeline.done
+
+
+def test_generating_town_starts_the_game_once(game):
+    game.context.images["card-bg"] = pygame.Surface((10, 10))
+    game.set_mode(GeneratingTownMode)
+    assert game.mode.pipeline.wait(5)
+    pygame.event.clear()
+
+    for _ in range(5):
+        game.update(1 / 60)
+
+    assert len(pygame.event.get(CHANGE_MODE_EVENT)) == 1
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pygame
+
+from pyreignslib.card import (
+    Card,
+    add_card_image,
+    find_card_image,
+    get_card_image,
+    scale_card_image,
+)
+from pyreignslib.deck import CardData, Deck
+from pyreignslib.prefetch import Prefetcher
+from pyreignslib.prototype_mode import PrototypeMode
+from pyreignslib.text import get_word_metrics
+
+
+def _wait_until_done(prefetcher, key):
+    prefetcher._pending[key].exception(timeout=5)
+
+
+def test_take_returns_prepared_value():
+    prefetcher = Prefetcher(lambda key, offset: key + offset)
+    prefetcher.prefetch(1, 10)
+    _wait_until_done(prefetcher, 1)
+
+    assert prefetcher.take(1) == 11
+    assert prefetcher.take(1) is None
+    prefetcher.close()
+
+
+def test_take_does_not_wait_for_running_work():
+    release = threading.Event()
+    prefetcher = Prefetcher(lambda key: release.wait(5) and key)
+    prefetcher.prefetch(1)
+
+    start = time.monotonic()
+    assert prefetcher.take(1) is None
+    assert time.monotonic() - start < 1
+
+    release.set()
+    prefetcher.close()
+
+
+def test_close_waits_for_running_work():
+    started = threading.Event()
+    finished = threading.Event()
+
+    def prepare(key):
+        started.set()
+        time.sleep(0.05)
+        finished.set()
+
+    prefetcher = Prefetcher(prepare)
+    prefetcher.prefetch(1)
+    started.wait(5)
+    prefetcher.close()
+
+    assert finished.is_set()
+
+
+def test_failed_preparation_is_not_returned():
+    def prepare(key):
+        raise RuntimeError("broken")
+
+    prefetcher = Prefetcher(prepare)
+    prefetcher.prefetch(1)
+    _wait_until_done(prefetcher, 1)
+
+    assert prefetcher.take(1) is None
+    prefetcher.close()
+
+
+def test_prefetched_card_reuses_cached_art_and_word_widths(game):
+    game.context.deck = Deck([CardData("a", "first"), CardData("b", "second")])
+    game.context.images["card-bg"] = pygame.Surface((10, 10))
+    game.set_mode(PrototypeMode)
+    mode = game.mode
+    scaled = mode.card.image
+    mode.all_cards.rotation_cache.prerender(scaled, Card.MAX_TILT)
+
+    index = 1 - mode.run.card_index
+    mode._prefetch_card(index)
+    _wait_until_done(mode.prefetcher, index)
+    prepared = mode.prefetcher.take(index)
+
+    assert prepared.image is scaled
+    assert prepared.frames == {}
+    assert "second" in prepared.metrics._widths
+    assert (
+        "second"
+        not in get_word_metrics(game.context.default_font, game.context.fonts)._widths
+    )
+
+    mode.cache_card_text(game.context, prepared.texts, prepared.metrics)
+
+    assert (
+        "second"
+        in get_word_metrics(game.context.default_font, game.context.fonts)._widths
+    )
+
+
+def test_add_card_image_keeps_the_cached_copy():
+    image = pygame.Surface((10, 10))
+    scaled = get_card_image(image)
+
+    assert find_card_image(image) is scaled
+    assert add_card_image(image, scale_card_image(image)) is scaled
+    assert get_card_image(image) is scaled
+    assert find_card_image(pygame.Surface((10, 10))) is None
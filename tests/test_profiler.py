@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from pyreignslib.profiler import FRAME_SECTION, FrameProfiler
+
+
+def _profile(times, window=600):
+    profiler = FrameProfiler(window)
+
+    for milliseconds in times:
+        profiler.begin_frame()
+        profiler.record("update", milliseconds, allocations=2)
+        profiler.end_frame()
+
+    return profiler
+
+
+def test_percentiles_cover_the_window():
+    stats = _profile([float(i) for i in range(1, 101)]).get_stats("update")
+
+    assert stats.count == 100
+    assert stats.mean == pytest.approx(50.5)
+    assert stats.p50 == pytest.approx(50.5)
+    assert stats.p95 == pytest.approx(95.05)
+    assert stats.p99 == pytest.approx(99.01)
+    assert stats.max == 100.0
+    assert stats.allocations == 2.0
+
+
+def test_old_frames_leave_the_window():
+    profiler = _profile([1000.0] * 10 + [1.0] * 20, window=20)
+    stats = profiler.get_stats("update")
+
+    assert stats.count == 20
+    assert stats.max == 1.0
+    assert profiler.frame_count == 30
+
+
+def test_sections_add_up_within_a_frame():
+    profiler = FrameProfiler()
+    profiler.begin_frame()
+    profiler.record("draw", 2.0)
+    profiler.record("draw", 3.0)
+    profiler.end_frame()
+
+    assert profiler.get_stats("draw").max == 5.0
+    assert profiler.get_stats("missing") is None
+    # the whole frame is timed as a section of its own
+    assert profiler.get_section_names() == ["draw", FRAME_SECTION]
+    assert profiler.summary()[FRAME_SECTION].count == 1
+
+
+def test_dump_writes_the_summary(tmp_path):
+    path = tmp_path / "frames.json"
+    _profile([1.0, 3.0]).dump(path)
+
+    data = json.loads(path.read_text())
+    assert data["summary"]["update"]["p50"] == pytest.approx(2.0)
+    assert len(data["frames"]) == 2
@@ -0,0 +1,83 @@
+import gzip
+import sys
+
+import pytest
+
+from pyreignslib.core import GameMode, ReplayError, ReplayPlayer
+from pyreignslib.core.mode import get_mode_class, get_mode_name
+from pyreignslib.core.replay import (
+    HEADER,
+    MAGIC,
+    VERSION,
+    ReplayFrame,
+    decode_frame,
+    encode_frame,
+)
+
+
+class RecordedMode(GameMode):
+    def update(self, elapsed_time: float) -> None:
+        pass
+
+    def draw(self) -> None:
+        pass
+
+
+def test_frame_round_trip():
+    frame = ReplayFrame(
+        1 / 60,
+        [(1025, {"pos": (3, 4), "button": 1}, {"mode": "a:B"}, {"ui_element": "#x"})],
+        2**63 + 5,
+    )
+
+    decoded = decode_frame(encode_frame(frame))
+
+    assert decoded == frame
+    assert decoded.events[0][1]["pos"] == (3, 4)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"\xff\xfe",
+        b"not json",
+        b"[1, []]",
+        b'["fast", [], null]',
+        b"[0.1, [], 1.5]",
+        b"[0.1, [[1, {}, {}]], null]",
+        b'[0.1, [[1, {}, {"mode": 3}, {}]], null]',
+        b"[" * 100000,
+    ],
+)
+def test_corrupt_frames_raise_replay_error(data):
+    with pytest.raises(ReplayError):
+        decode_frame(data)
+
+
+def test_modes_are_found_by_name_without_importing():
+    assert get_mode_class(get_mode_name(RecordedMode)) is RecordedMode
+    assert get_mode_class("os:system") is None
+    assert get_mode_class("pyreignslib_not_a_module:Mode") is None
+    assert "pyreignslib_not_a_module" not in sys.modules
+
+
+def test_non_replay_files_raise_replay_error(tmp_path):
+    not_gzip = tmp_path / "not_gzip.prr"
+    not_gzip.write_bytes(b"hello")
+    wrong_magic = tmp_path / "wrong_magic.prr"
+    with gzip.open(wrong_magic, "wb") as replay_file:
+        replay_file.write(HEADER.pack(b"NOPE", VERSION, 1, 60, 480, 720))
+
+    for path in (not_gzip, wrong_magic):
+        with pytest.raises(ReplayError):
+            ReplayPlayer(path).header
+
+
+def test_valid_header_is_read(tmp_path):
+    path = tmp_path / "replay.prr"
+    with gzip.open(path, "wb") as replay_file:
+        replay_file.write(HEADER.pack(MAGIC, VERSION, 7, 60, 480, 720))
+
+    header = ReplayPlayer(path).header
+
+    assert (header.seed, header.update_rate, header.window_size) == (7, 60, (480, 720))
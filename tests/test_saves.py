@@ -0,0 +1,164 @@
+import os
+import random
+
+import pygame
+import pytest
+
+from pyreignslib.deck import CardData, Deck, DeckRun
+from pyreignslib.prototype_mode import PrototypeMode
+from pyreignslib.saves import SaveError, SaveReader, SaveWriter
+
+DECK = Deck(
+    [
+        CardData(
+            "tax", "?", accept_effects=("gold += 10",), reject_effects=("mood += 1",)
+        ),
+        CardData("feast", "?", accept_effects=("gold -= 5", "mood += 2")),
+        CardData("war", "?", accept_effects=("at_war",), reject_effects=("gold -= 1",)),
+    ]
+)
+
+
+def _play(run: DeckRun, writer: SaveWriter, swipes: int, seed: int = 2) -> None:
+    rng = random.Random(seed)
+    for _ in range(swipes):
+        run.swipe(rng.random() < 0.5)
+        writer.save(run)
+
+
+def _assert_same_run(restored: DeckRun, run: DeckRun) -> None:
+    assert restored.history == run.history
+    assert restored.card_index == run.card_index
+    assert restored.ending == run.ending
+    assert restored.rng.getstate() == run.rng.getstate()
+    for name in run.state.symbols.names:
+        assert restored.state.get(name) == run.state.get(name)
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_round_trip(tmp_path, compress):
+    path = tmp_path / "run.prs"
+    run = DeckRun(DECK, random.Random(1))
+    writer = SaveWriter(path, run, compress=compress, checkpoint_interval=4)
+    _play(run, writer, 10)
+    writer.close()
+
+    reader = SaveReader(path)
+    restored = reader.restore(DECK)
+
+    _assert_same_run(restored, run)
+    assert reader.checkpoint_swipes == 8
+    assert reader.valid_size == os.path.getsize(path)
+
+
+def test_torn_record_is_ignored(tmp_path):
+    path = tmp_path / "run.prs"
+    run = DeckRun(DECK, random.Random(1))
+    writer = SaveWriter(path, run, checkpoint_interval=100)
+    _play(run, writer, 5)
+    writer.close()
+
+    size = os.path.getsize(path)
+    os.truncate(path, size - 2)
+
+    restored = SaveReader(path).restore(DECK)
+
+    assert restored.history == run.history[:4]
+
+
+def test_truncated_checkpoint_falls_back_to_earlier_one(tmp_path):
+    path = tmp_path / "run.prs"
+    run = DeckRun(DECK, random.Random(1))
+    writer = SaveWriter(path, run, checkpoint_interval=3)
+    _play(run, writer, 3)
+    writer.flush()
+    size = os.path.getsize(path)
+    writer.close()
+
+    # cut the checkpoint written after the third swipe short
+    os.truncate(path, size - 1)
+    reader = SaveReader(path)
+    restored = reader.restore(DECK)
+
+    assert reader.checkpoint_swipes == 0
+    assert restored.history == run.history
+
+
+def test_resume_appends_after_torn_tail(tmp_path):
+    path = tmp_path / "run.prs"
+    run = DeckRun(DECK, random.Random(1))
+    writer = SaveWriter(path, run, checkpoint_interval=4)
+    _play(run, writer, 6)
+    writer.close()
+    with open(path, "ab") as save_file:
+        save_file.write(b"\x01\x02")
+
+    reader = SaveReader(path)
+    resumed = reader.restore(DECK)
+    writer = SaveWriter.resume(reader, resumed, checkpoint_interval=4)
+    _play(resumed, writer, 5, seed=3)
+    writer.close()
+
+    _assert_same_run(SaveReader(path).restore(DECK), resumed)
+    assert len(resumed.history) == 11
+
+
+def test_reopening_an_open_save_keeps_every_swipe(tmp_path):
+    path = tmp_path / "run.prs"
+    run = DeckRun(DECK, random.Random(1))
+
+    for seed in range(3):
+        if seed == 0:
+            writer = SaveWriter(path, run, checkpoint_interval=4)
+        else:
+            reader = SaveReader(path)
+            reader.restore(DECK)
+            writer = SaveWriter.resume(reader, run, checkpoint_interval=4)
+        _play(run, writer, 3, seed=seed)
+        writer.close()
+
+    _assert_same_run(SaveReader(path).restore(DECK), run)
+
+
+def test_different_deck_is_rejected(tmp_path):
+    path = tmp_path / "run.prs"
+    run = DeckRun(DECK, random.Random(1))
+    SaveWriter(path, run).close()
+
+    with pytest.raises(SaveError):
+        SaveReader(path).restore(Deck([CardData("other", "?")]))
+
+
+def test_not_a_save_is_rejected(tmp_path):
+    path = tmp_path / "run.prs"
+    path.write_bytes(b"not a save file at all")
+
+    with pytest.raises(SaveError):
+        SaveReader(path).restore(DECK)
+
+
+def test_failed_autosave_stops_saving_the_run(game, tmp_path, monkeypatch, capsys):
+    game.context.settings.save_path = str(tmp_path / "save.prs")
+    game.context.deck = DECK
+    game.context.images["card-bg"] = pygame.Surface((10, 10))
+    game.set_mode(PrototypeMode)
+    mode = game.mode
+    mode.autosave.flush()
+
+    def fail(self, records, checkpoint):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(SaveWriter, "_write", fail)
+    mode.swipe(True)
+    mode.autosave._pending.exception(timeout=5)
+    mode.swipe(False)
+
+    assert mode.autosave is None
+    assert len(mode.run.history) == 2
+    assert "disk full" in capsys.readouterr().out
+
+    # the save file is missing a swipe, so it is not continued
+    monkeypatch.undo()
+    mode.on_exit()
+    mode.on_enter()
+    assert mode.autosave is None
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+from pyreignslib.deck import CardData, Deck
+from pyreignslib.simulation import DeckPlaythroughFactory, MonteCarloEngine
+
+DECK = Deck(
+    [
+        CardData("tax", "?", accept_effects=("gold += 10",)),
+        CardData("feast", "?", accept_effects=("gold -= 5",)),
+        CardData("riot", "?", tags=("ending",), conditions=("gold < 0",)),
+        CardData("war", "?", tags=("ending",), weight=0.2),
+    ]
+)
+
+
+def test_workers_do_not_change_the_stats():
+    factory = DeckPlaythroughFactory(DECK)
+
+    local = MonteCarloEngine(factory, seed=7, max_swipes=50, workers=0).run(40)
+    pooled = MonteCarloEngine(factory, seed=7, max_swipes=50, workers=2).run(
+        40, chunk_size=3
+    )
+
+    assert pooled == local
+    assert local.runs == 40
+    assert local.endings["war"] > 0
+
+
+def test_simulation_does_not_import_pygame():
+    code = "import sys, pyreignslib.simulation; print('pygame' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == "False"
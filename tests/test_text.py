@@ -0,0 +1,93 @@
+import pygame
+import pytest
+
+from pyreignslib.fonts import FontManager
+from pyreignslib.text import (
+    get_word_metrics,
+    layout_text,
+    make_layout_key,
+    render_text,
+)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def fonts_initialized():
+    pygame.font.init()
+    yield
+
+
+def test_word_metrics_belong_to_their_manager():
+    fonts = FontManager()
+    font = fonts.get_font(None, 24)
+
+    metrics = get_word_metrics(font, fonts)
+
+    assert metrics.glyphs is fonts.get_metrics(font)
+    assert get_word_metrics(font, fonts) is metrics
+    assert get_word_metrics(font) is not metrics
+
+
+def test_layout_measures_with_the_given_manager():
+    fonts = FontManager()
+    font = fonts.get_font(None, 24)
+
+    layout_text("measured by this manager", font, 400, fonts=fonts)
+
+    assert "measured" in get_word_metrics(font, fonts)._widths
+    assert "measured" not in get_word_metrics(font)._widths
+
+
+def test_layout_keys_differ_between_managers():
+    first, second = FontManager(), FontManager()
+    font = first.get_font(None, 24)
+    color = pygame.Color(0, 0, 0)
+
+    assert make_layout_key("a", font, color, 100, False, None, first) != (
+        make_layout_key("a", font, color, 100, False, None, second)
+    )
+
+
+def test_glyph_atlas_is_capped():
+    fonts = FontManager(glyph_page_size=(64, 64), max_glyph_pages=2)
+    font = fonts.get_font(None, 24)
+
+    for shade in range(0, 250, 10):
+        for char in "abcdefghij":
+            fonts.get_glyph(font, char, pygame.Color(shade, 0, 0))
+        assert len(fonts.atlas.pages) <= 2
+
+    assert fonts.get_glyph(font, "a", pygame.Color(0, 0, 0)) is not None
+
+
+def test_rendered_lines_match_font_render():
+    fonts = FontManager()
+    font = fonts.get_font(None, 24)
+    color = pygame.Color(0, 0, 0)
+
+    for line in ("AVAWAY To Ty", "Will you help me eliminate the enemy?"):
+        expected = font.render(line, False, color)
+        rendered = fonts.render_line(line, font, color)
+
+        assert rendered.get_size() == expected.get_size()
+        assert fonts.measure(line, font)[0] == expected.get_width()
+
+
+def test_wrapped_lines_fit_their_width():
+    fonts = FontManager()
+    font = fonts.get_font(None, 24)
+    text = " ".join(
+        [
+            "AVAWAY To Ty WAVE. The harvest failed in the northern valleys and",
+            "the granaries are nearly empty, Your Majesty. Unbreakablewordsthat",
+            "arelongerthananylineneedtobesplit.",
+        ]
+    )
+
+    for width in (60, 97, 150, 233, 400):
+        rendered = render_text(text, font, pygame.Color(0, 0, 0), width, fonts=fonts)
+
+        assert "".join(line.text for line in rendered.layout.lines) == text
+        for line, image in zip(rendered.layout.lines, rendered.images):
+            assert image.get_width() == font.size(line.text)[0]
+            # a line only reaches the edge if it is a single character
+            assert font.size(line.text.rstrip())[0] < width or len(line.text) == 1